@@ -11,11 +11,20 @@ logger.add(sys.stdout, format="<green>{time:HH:mm:ss}</green> | <level>{level}</
 
 try:
     import streamlit as st
-    from config import ARQUIVO_PADRAO_TXT, CAMINHO_ENTRADA, CAMINHO_SAIDA, DELIMITADOR_PAGINA_PADRAO
-    from src.leitor_txt import carregar_blocos, carregar_texto_completo
+    from config import (
+        ARQUIVO_PADRAO_TXT, CAMINHO_ENTRADA, CAMINHO_SAIDA, DELIMITADOR_PAGINA_PADRAO,
+        MAX_BLOCOS_CONCORRENTES, USAR_STREAMING, USAR_WORKER, EMPACOTAR_POR_TOKENS,
+    )
+    from src.leitor_txt import carregar_blocos_arquivo
+    from src.limitador import CHARS_POR_TOKEN_ESTIMADO
     from src.controlador import processar_blocos_run
-    from src.planilha import get_caminho_excel, ler_evidencias_df
+    from src.gemini_api import calibrar_estimador_tokens
+    from src.planilha import (
+        get_caminho_excel, evidencias_df, exportar_excel, exportar_formatos, caminhos_exportacao_existentes,
+    )
     from src import persistence
+    from src.worker import enfileirar_run, caminho_entrada_run
+    from src.entradas import armazenar_entrada, caminho_entrada, caminho_indice, contar_paginas
     from src.mailer import enviar_resultado, smtp_configurado
     logger.success("Imports carregados com sucesso.")
 except Exception as e:
@@ -84,11 +93,14 @@ def garantir_diretorios():
         os.makedirs(p, exist_ok=True)
 
 
-def processar_arquivo_upload(uploaded_file):
-    arquivo_path = os.path.join(CAMINHO_ENTRADA, ARQUIVO_PADRAO_TXT)
-    with open(arquivo_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return arquivo_path
+def processar_arquivo_upload(uploaded_file) -> str:
+    """Armazena o upload pelo hash do conteúdo (sem sobrescrever outras sessões). Retorna o sha256."""
+    return armazenar_entrada(uploaded_file.getbuffer())
+
+
+def _ler_txt(caminho: str) -> str:
+    with open(caminho, "r", encoding="utf-8") as f:
+        return f.read()
 
 
 def _fmt_eta(segundos: float) -> str:
@@ -106,6 +118,92 @@ def _status_label(status: str) -> str:
     return icons.get(status, "⏳")
 
 
+_ROTULOS_FORMATO = {
+    "parquet": ("Parquet", "application/vnd.apache.parquet"),
+    "csv": ("CSV (gzip)", "application/gzip"),
+    "jsonl": ("JSONL", "application/x-ndjson"),
+}
+
+
+def _downloads_formatos(run_id: str, prefixo_arquivo: str, chave: str) -> None:
+    """Botões de download dos exports Parquet/CSV.gz/JSONL existentes da run."""
+    caminhos = caminhos_exportacao_existentes(run_id)
+    if not caminhos:
+        return
+    colunas = st.columns(len(caminhos))
+    for coluna, (formato, caminho) in zip(colunas, caminhos.items()):
+        rotulo, mime = _ROTULOS_FORMATO[formato]
+        extensao = os.path.basename(caminho).split(".", 1)[1]
+        with open(caminho, "rb") as f:
+            coluna.download_button(
+                label=f"⬇️ {rotulo}",
+                data=f,
+                file_name=f"{prefixo_arquivo}.{extensao}",
+                mime=mime,
+                key=f"{chave}_{formato}",
+                use_container_width=True,
+            )
+
+
+def _enfileirar_execucao(retomar_run, nome_run: str, arquivo_origem: str, email_destino: str,
+                         arquivo_txt: str, novo_upload: bool, **parametros) -> None:
+    """Modo USAR_WORKER: cria (ou retoma) a run e a coloca na fila do worker."""
+    if retomar_run:
+        run_id = retomar_run["run_id"]
+        # Retomada sem novo upload mantém a entrada registrada na run
+        if not novo_upload and os.path.exists(caminho_entrada_run(run_id, retomar_run)):
+            arquivo_txt = None
+    else:
+        run_id = persistence.criar_run(
+            nome=nome_run.strip(),
+            arquivo_origem=arquivo_origem,
+            email_destino=email_destino.strip() or None,
+        )
+    st.session_state["job_id"] = enfileirar_run(run_id, arquivo_txt, **parametros)
+    st.session_state["run_id"] = run_id
+    st.session_state["processamento_concluido"] = False
+    st.session_state["email_status"] = None
+
+
+def _painel_job(job_id: str) -> None:
+    """Acompanha pelo banco o job enfileirado (atualizado enquanto estiver ativo)."""
+    job = persistence.get_job(job_id)
+    if job is None:
+        return
+    run = persistence.get_run(job["run_id"]) or {}
+    total = run.get("total_blocos") or 0
+    processados = run.get("blocos_processados") or 0
+    evidencias = run.get("total_evidencias") or 0
+
+    st.markdown("---")
+    st.markdown(f"**Execução:** {run.get('nome', '—')}")
+    if job["status"] == persistence.JOB_QUEUED:
+        st.info("📥 Na fila — aguardando um worker (`python -m src.worker`).")
+    elif job["status"] == persistence.JOB_RUNNING:
+        st.progress(min(processados / total, 1.0) if total else 0.0)
+        st.markdown(
+            f"🛠️ Processando no worker **{job['worker']}** &nbsp;|&nbsp; "
+            f"**{processados}/{total or '?'}** bloco(s) &nbsp;|&nbsp; **{evidencias}** evidência(s)"
+        )
+    elif job["status"] == persistence.JOB_DONE:
+        if not st.session_state.get("processamento_concluido"):
+            # Rerun completo uma única vez para atualizar a aba Resultados
+            st.session_state["processamento_concluido"] = True
+            st.session_state["total_evidencias"] = evidencias
+            st.rerun()
+        st.markdown(
+            f'<div class="success-box">🎉 <b>Concluído!</b> &nbsp; '
+            f'{evidencias} evidência(s) extraída(s) &nbsp;|&nbsp; {processados} bloco(s)</div>',
+            unsafe_allow_html=True,
+        )
+    else:
+        st.error(f"Processamento interrompido: {job.get('erro_msg') or 'erro desconhecido'}")
+
+
+if hasattr(st, "fragment"):
+    _painel_job = st.fragment(run_every=3)(_painel_job)
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -177,6 +275,26 @@ def main():
                 help="Gera um resumo do processo antes da extração para melhorar a classificação das evidências.",
             )
 
+            blocos_paralelos = st.number_input(
+                "Blocos em paralelo",
+                min_value=1,
+                max_value=32,
+                value=MAX_BLOCOS_CONCORRENTES,
+                help="Quantidade de blocos enviados simultaneamente à API. 1 = sequencial.",
+            )
+
+            usar_streaming = st.checkbox(
+                "📡 Streaming de evidências",
+                value=USAR_STREAMING,
+                help="Grava cada evidência assim que a IA termina de escrevê-la, sem esperar a resposta completa do bloco.",
+            )
+
+            ignorar_cache = st.checkbox(
+                "♻️ Ignorar cache de respostas",
+                value=False,
+                help="Força o reenvio de todos os blocos à API, mesmo os já respondidos em execuções anteriores.",
+            )
+
             delimitador_pagina = st.text_input(
                 "Delimitador de página",
                 value=DELIMITADOR_PAGINA_PADRAO,
@@ -212,24 +330,61 @@ def main():
                 st.error("Informe um nome para a execução.")
                 st.stop()
 
+            delimitador = (delimitador_pagina or "").strip()
             if uploaded_file:
                 with st.spinner("Salvando arquivo..."):
-                    processar_arquivo_upload(uploaded_file)
+                    entrada_sha256 = processar_arquivo_upload(uploaded_file)
+                    total_paginas = contar_paginas(entrada_sha256, delimitador)
                 arquivo_origem = uploaded_file.name
-                # T21: Carregar texto completo para SAC
-                texto_completo = carregar_texto_completo(ARQUIVO_PADRAO_TXT)
-                st.session_state["texto_completo"] = texto_completo
+                arquivo_txt = caminho_entrada(entrada_sha256)
+                anteriores = [r for r in persistence.buscar_runs_por_entrada(entrada_sha256)
+                              if not retomar_run or r["run_id"] != retomar_run["run_id"]]
+                if anteriores:
+                    st.info(
+                        f"♻️ Arquivo idêntico ao da execução **{anteriores[0]['nome']}** "
+                        f"({total_paginas} página(s)) — índice de páginas reaproveitado."
+                    )
+                # T21: Carregar texto completo para SAC (só quando o resumo será gerado)
+                st.session_state["texto_completo"] = _ler_txt(arquivo_txt) if usar_sac else ""
             else:
                 arquivo_origem = retomar_run.get("arquivo_origem", "")
                 st.session_state["texto_completo"] = ""
+                entrada_sha256 = retomar_run.get("entrada_sha256")
+                total_paginas = retomar_run.get("total_paginas")
+                arquivo_txt = caminho_entrada_run(retomar_run["run_id"], retomar_run)
+                if not entrada_sha256 and not os.path.exists(arquivo_txt):
+                    # Runs anteriores ao armazenamento por hash
+                    arquivo_txt = os.path.join(CAMINHO_ENTRADA, ARQUIVO_PADRAO_TXT)
 
-            arquivo_txt = os.path.join(CAMINHO_ENTRADA, ARQUIVO_PADRAO_TXT)
             if not os.path.exists(arquivo_txt):
                 st.error(f"Arquivo TXT não encontrado. Faça o upload novamente.")
                 st.stop()
 
+            if USAR_WORKER:
+                _enfileirar_execucao(
+                    retomar_run, nome_run, arquivo_origem, email_destino, arquivo_txt,
+                    novo_upload=uploaded_file is not None,
+                    delimitador=delimitador,
+                    usar_sac=usar_sac,
+                    concorrencia=int(blocos_paralelos),
+                    usar_cache=not ignorar_cache,
+                    streaming=usar_streaming,
+                )
+                st.rerun()
+
             with st.spinner("Analisando e dividindo documento em blocos..."):
-                blocos = carregar_blocos(ARQUIVO_PADRAO_TXT, (delimitador_pagina or "").strip())
+                # Razão chars/token do documento: a gravada na run (retomada) ou calibrada agora.
+                # Sem empacotamento por tokens ela não entra na divisão: nada de count_tokens
+                if EMPACOTAR_POR_TOKENS:
+                    razao = None if uploaded_file else (retomar_run or {}).get("chars_por_token")
+                    razao = razao or calibrar_estimador_tokens(arquivo_txt)
+                else:
+                    razao = CHARS_POR_TOKEN_ESTIMADO
+                blocos = carregar_blocos_arquivo(
+                    arquivo_txt, delimitador,
+                    caminho_indice(entrada_sha256) if entrada_sha256 else None,
+                    chars_por_token=razao,
+                )
             total_blocos = len(blocos)
 
             if total_blocos == 0:
@@ -237,16 +392,27 @@ def main():
                 st.stop()
 
             st.info(f"📚 Documento dividido em **{total_blocos} bloco(s)** para análise.")
+            paginas_ignoradas = getattr(blocos, "paginas_ignoradas", [])
+            if paginas_ignoradas:
+                st.caption(
+                    f"🔎 Pré-triagem: {len(paginas_ignoradas)} página(s) sem sinais documentais não serão "
+                    f"enviadas (relatório em paginas_ignoradas.csv na pasta da execução)."
+                )
 
             # Criar ou retomar run
+            resumo_existente = ""
             if retomar_run:
                 run_id = retomar_run["run_id"]
-                skip_ids = persistence.get_processed_block_ids(run_id)
-                blocos_pendentes = total_blocos - len(skip_ids)
+                if uploaded_file:
+                    persistence.registrar_entrada_run(run_id, entrada_sha256, total_paginas)
+                # Os blocos já OK são casados pela fingerprint dentro de processar_blocos_run
+                # Reaproveita o resumo SAC já pago em vez de perdê-lo na retomada
+                resumo_existente = (persistence.get_run(run_id) or {}).get("resumo_processo") or ""
                 nome_run = retomar_run["nome"]
                 st.markdown(
                     f'<div class="info-box">▶️ Retomando <b>{nome_run}</b> — '
-                    f'{len(skip_ids)} bloco(s) já OK, {blocos_pendentes} pendente(s).</div>',
+                    f'blocos já OK serão pulados.'
+                    f'{" Contexto SAC reaproveitado." if resumo_existente else ""}</div>',
                     unsafe_allow_html=True,
                 )
             else:
@@ -254,9 +420,12 @@ def main():
                     nome=nome_run.strip(),
                     arquivo_origem=arquivo_origem,
                     email_destino=email_destino.strip() or None,
+                    entrada_sha256=entrada_sha256,
+                    total_paginas=total_paginas,
                 )
-                skip_ids = set()
 
+            if EMPACOTAR_POR_TOKENS:
+                persistence.registrar_chars_por_token(run_id, razao)
             st.session_state["run_id"] = run_id
             st.session_state["processamento_concluido"] = False
 
@@ -269,6 +438,7 @@ def main():
 
             t0 = time.monotonic()
             blocos_processados_count = [0]
+            blocos_pulados_count = [0]
             erros_count = [0]
 
             # T23–T26: Callback com suporte para 2 fases (SAC)
@@ -282,18 +452,27 @@ def main():
                     return
 
                 if status_bloco == "pulado":
+                    blocos_pulados_count[0] += 1
+                    status_text.markdown(f"**{blocos_pulados_count[0]}** bloco(s) já OK — pulado(s)")
+                    return
+                if status_bloco == "parcial":
+                    # Streaming: evidências chegando antes do fim do bloco
+                    status_text.markdown(
+                        f"**Bloco {bloco_id + 1} de {total}** recebendo... &nbsp;|&nbsp; "
+                        f"**{evidencias_acum}** evidência(s)"
+                    )
                     return
                 blocos_processados_count[0] += 1
                 if status_bloco == "erro":
                     erros_count[0] += 1
 
                 processados = blocos_processados_count[0]
-                pct = min(processados / max(total - len(skip_ids), 1), 1.0)
+                pct = min(processados / max(total - blocos_pulados_count[0], 1), 1.0)
                 progress_bar.progress(pct)
 
                 # T25: ETA apenas para blocos reais (bloco_id >= 0)
                 elapsed = time.monotonic() - t0
-                pendentes = max(total - len(skip_ids) - processados, 0)
+                pendentes = max(total - blocos_pulados_count[0] - processados, 0)
                 eta = (elapsed / processados) * pendentes if processados > 0 else 0
 
                 # T24: Status para Fase 2
@@ -326,10 +505,14 @@ def main():
                     run_id=run_id,
                     blocos=blocos,
                     arquivo_origem=arquivo_origem,
-                    skip_ids=skip_ids,
                     progress_cb=progress_cb,
                     texto_completo=st.session_state.get("texto_completo", ""),
                     usar_sac=usar_sac,
+                    concorrencia=int(blocos_paralelos),
+                    usar_cache=not ignorar_cache,
+                    resumo_existente=resumo_existente,
+                    delimitador=delimitador,
+                    streaming=usar_streaming,
                 )
                 persistence.finalizar_run(run_id, persistence.RUN_COMPLETED)
                 st.session_state["processamento_concluido"] = True
@@ -391,6 +574,9 @@ def main():
                 if not smtp_configurado():
                     st.info("💡 Configure SMTP_* no .env para receber resultados por email.")
 
+        if USAR_WORKER and st.session_state.get("job_id"):
+            _painel_job(st.session_state["job_id"])
+
     # -----------------------------------------------------------------------
     # TAB 2 — RESULTADOS
     # -----------------------------------------------------------------------
@@ -420,7 +606,7 @@ def main():
 
             xlsx_path = get_caminho_excel(run_id_atual)
             if os.path.exists(xlsx_path):
-                df = ler_evidencias_df(xlsx_path)
+                df = evidencias_df(run_id_atual)
                 if not df.empty:
                     col1, col2, col3 = st.columns(3)
                     col1.metric("Total de Evidências", len(df))
@@ -438,6 +624,7 @@ def main():
                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                             use_container_width=True,
                         )
+                    _downloads_formatos(run_id_atual, f"evidencias_{run_id_atual[:8]}", "res")
 
                     if "Tipo de Evidência" in df.columns:
                         st.markdown("**Distribuição por Tipo de Evidência**")
@@ -489,6 +676,29 @@ def main():
                                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                 key=f"dl_{run['run_id']}",
                             )
+                        _downloads_formatos(
+                            run["run_id"], f"evidencias_{run['nome'][:30].replace(' ', '_')}", f"dl_{run['run_id']}",
+                        )
+                    elif evidencias and st.button("📊 Gerar arquivos com as evidências já extraídas",
+                                                  key=f"exp_{run['run_id']}"):
+                        # Run não concluída: a planilha é gerada sob demanda a partir do banco
+                        with st.spinner("Gerando arquivos..."):
+                            exportar_excel(run["run_id"], run.get("resumo_processo") or "")
+                            # Com um worker na run, Parquet/CSV/JSONL são escritos por ele incrementalmente
+                            if run.get("job_status") != persistence.JOB_RUNNING:
+                                exportar_formatos(run["run_id"])
+                        with open(xlsx_path, "rb") as f:
+                            st.download_button(
+                                label="⬇️ Baixar Excel parcial",
+                                data=f,
+                                file_name=f"evidencias_parcial_{run['nome'][:30].replace(' ', '_')}.xlsx",
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                key=f"dl_parcial_{run['run_id']}",
+                            )
+                        _downloads_formatos(
+                            run["run_id"], f"evidencias_parcial_{run['nome'][:30].replace(' ', '_')}",
+                            f"dl_parcial_{run['run_id']}",
+                        )
 
                     if status in ("INCOMPLETA", "FAILED", "RUNNING"):
                         st.markdown(
@@ -0,0 +1 @@
+"""Micro-benchmarks dos caminhos quentes (execução: python -m benchmarks.executar)."""
@@ -0,0 +1,34 @@
+"""Divisão de TXT de OCR em blocos (`leitor_txt.carregar_blocos` e o fallback
+por caracteres `dividir_em_blocos`)."""
+
+import os
+
+from benchmarks.dados import documento_ocr
+from benchmarks.medicao import Caso
+from src import leitor_txt
+
+
+def casos(diretorio: str) -> list[Caso]:
+    resultado = []
+    for paginas, repeticoes in ((1_000, 7), (10_000, 3)):
+        nome_arquivo = f"ocr_{paginas}p.txt"
+        with open(os.path.join(diretorio, nome_arquivo), "w", encoding="utf-8") as f:
+            f.write(documento_ocr(paginas))
+        resultado.append(Caso(
+            nome=f"leitor.carregar_blocos[{paginas}p]",
+            # list(): mede também a materialização dos blocos lidos sob demanda
+            funcao=lambda nome_arquivo=nome_arquivo: list(leitor_txt.carregar_blocos(nome_arquivo)),
+            repeticoes=repeticoes,
+            unidade="páginas",
+            unidades=paginas,
+        ))
+
+    # Fallback sem delimitador: texto limpo de vários MB cortado por caracteres
+    texto = " ".join(documento_ocr(4_000).split())
+    resultado.append(Caso(
+        nome=f"leitor.dividir_em_blocos[{len(texto) // 1_000_000}MB]",
+        funcao=lambda: leitor_txt.dividir_em_blocos(texto),
+        unidade="MB",
+        unidades=max(1, len(texto) // 1_000_000),
+    ))
+    return resultado
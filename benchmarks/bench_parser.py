@@ -0,0 +1,23 @@
+"""Parse das respostas do modelo (`controlador.extrair_campos` / `_recuperar_objetos_json`)."""
+
+from benchmarks.dados import resposta_json, truncar
+from benchmarks.medicao import Caso
+from src import controlador
+
+
+def casos(diretorio: str) -> list[Caso]:
+    resultado = []
+    for quantidade, numero in ((20, 200), (500, 10)):
+        completa = resposta_json(quantidade)
+        truncada = truncar(completa)
+        resultado += [
+            Caso(f"parser.extrair_campos[{quantidade}]", lambda t=completa: controlador.extrair_campos(t),
+                 numero=numero, unidade="evidências", unidades=quantidade),
+            Caso(f"parser.extrair_campos_truncado[{quantidade}]",
+                 lambda t=truncada: controlador.extrair_campos(t),
+                 numero=numero, unidade="KB", unidades=len(truncada) // 1024 or 1),
+            Caso(f"parser.recuperar_objetos_json[{quantidade}]",
+                 lambda t=truncada: controlador._recuperar_objetos_json(t),
+                 numero=numero, unidade="KB", unidades=len(truncada) // 1024 or 1),
+        ]
+    return resultado
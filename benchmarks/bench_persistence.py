@@ -0,0 +1,38 @@
+"""Vazão do checkpoint por bloco (evidências + run_item + progresso em uma transação)."""
+
+import itertools
+
+from benchmarks.dados import resposta_json
+from benchmarks.medicao import Caso
+from src import controlador, persistence
+
+EVIDENCIAS_POR_BLOCO = 10
+TOTAL_BLOCOS = 100_000
+CHAMADAS_POR_AMOSTRA = 50
+RESPOSTAS_PREPARADAS = 1 + Caso.repeticoes * CHAMADAS_POR_AMOSTRA  # aquecimento + amostras, geradas fora da medição
+
+
+def casos(diretorio: str) -> list[Caso]:
+    respostas = [resposta_json(EVIDENCIAS_POR_BLOCO, semente=i, prefixo=f"bloco {i} ")
+                 for i in range(RESPOSTAS_PREPARADAS)]
+    resultado = []
+    for totais_do_banco in (False, True):
+        run_id = persistence.criar_run(nome="bench checkpoint", arquivo_origem="bench.txt")
+        blocos = itertools.count()
+
+        def _checkpoint(run_id=run_id, blocos=blocos, totais_do_banco=totais_do_banco):
+            bloco_id = next(blocos)
+            controlador._checkpoint_bloco(
+                run_id, bloco_id, respostas[bloco_id], "bench.txt", TOTAL_BLOCOS, bloco_id,
+                bloco_id * EVIDENCIAS_POR_BLOCO, totais_do_banco=totais_do_banco,
+            )
+
+        sufixo = "leases" if totais_do_banco else "dono_unico"
+        resultado.append(Caso(
+            nome=f"persistence.checkpoint_bloco[{sufixo}]",
+            funcao=_checkpoint,
+            numero=CHAMADAS_POR_AMOSTRA,
+            unidade="blocos",
+            unidades=1,
+        ))
+    return resultado
@@ -0,0 +1,44 @@
+"""Curva de crescimento de `planilha.adicionar_linhas_excel`: custo de acrescentar
+um lote de evidências a runs que já têm 0, 5 mil e 20 mil linhas."""
+
+import itertools
+
+from benchmarks.dados import evidencias
+from benchmarks.medicao import Caso
+from src import persistence, planilha
+
+LINHAS_POR_LOTE = 50
+CHAMADAS_POR_AMOSTRA = 20
+LOTES_PREPARADOS = 1 + Caso.repeticoes * CHAMADAS_POR_AMOSTRA  # aquecimento + amostras, gerados fora da medição
+
+
+def _run_com_linhas(existentes: int) -> str:
+    run_id = persistence.criar_run(nome=f"bench {existentes}", arquivo_origem="bench.txt")
+    linhas = [
+        {**e, "Run ID": run_id, "Arquivo Origem": "bench.txt", "Data Processamento": "2026-01-01 00:00:00"}
+        for e in evidencias(existentes, semente=1, prefixo="existente ")
+    ]
+    for i in range(0, len(linhas), 1000):
+        persistence.inserir_evidencias(run_id, i // 1000, linhas[i:i + 1000])
+    return run_id
+
+
+def casos(diretorio: str) -> list[Caso]:
+    lotes_preparados = [evidencias(LINHAS_POR_LOTE, semente=k, prefixo=f"lote {k} ")
+                        for k in range(LOTES_PREPARADOS)]
+    resultado = []
+    for existentes in (0, 5_000, 20_000):
+        run_id = _run_com_linhas(existentes)
+        lotes = itertools.count()
+
+        def _adicionar(run_id=run_id, lotes=lotes):
+            planilha.adicionar_linhas_excel(lotes_preparados[next(lotes)], run_id, "bench.txt")
+
+        resultado.append(Caso(
+            nome=f"planilha.adicionar_linhas_excel[{existentes}+{LINHAS_POR_LOTE}]",
+            funcao=_adicionar,
+            numero=CHAMADAS_POR_AMOSTRA,
+            unidade="linhas",
+            unidades=LINHAS_POR_LOTE,
+        ))
+    return resultado
@@ -0,0 +1,57 @@
+"""Dados sintéticos determinísticos para os benchmarks."""
+
+import json
+import random
+
+from config import DELIMITADOR_PAGINA_PADRAO
+
+PALAVRAS = (
+    "contrato aditivo pagamento nota fiscal comprovante multa ordem serviço horas despesa "
+    "reembolso viagem perícia laudo autor réu juízo valor cláusula prazo sentença recurso"
+).split()
+
+
+def documento_ocr(paginas: int, chars_por_pagina: int = 2500, semente: int = 0,
+                  delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> str:
+    """TXT no formato do OCR: delimitador numerado, linhas curtas, rodapés e hifenização."""
+    rng = random.Random(semente)
+    partes = []
+    for n in range(1, paginas + 1):
+        linhas, tamanho = [f"{delimitador} {n}", f"fls. {n}"], 0
+        while tamanho < chars_por_pagina:
+            linha = " ".join(rng.choices(PALAVRAS, k=rng.randint(6, 12)))
+            if rng.random() < 0.1:
+                linha += " docu-"  # palavra quebrada no fim da linha
+            elif rng.random() < 0.5:
+                linha = linha.capitalize() + "."
+            linhas.append(linha)
+            tamanho += len(linha) + 1
+        linhas.append(f"Página {n} de {paginas}")
+        linhas.append("_" * 20)
+        partes.append("\n".join(linhas))
+    return "\n".join(partes)
+
+
+def evidencias(quantidade: int, semente: int = 0, prefixo: str = "") -> list[dict]:
+    rng = random.Random(semente)
+    return [
+        {
+            "Tipo de Evidência": rng.choice(["Contrato", "Nota Fiscal", "Comprovante de Pagamento"]),
+            "Trecho": f"{prefixo}{i} " + " ".join(rng.choices(PALAVRAS, k=25)),
+            "Conteúdo": " ".join(rng.choices(PALAVRAS, k=12)),
+            "Resumo": " ".join(rng.choices(PALAVRAS, k=8)),
+            "Referência": f"fls. {rng.randint(1, 5000)}",
+        }
+        for i in range(quantidade)
+    ]
+
+
+def resposta_json(quantidade: int, semente: int = 0, prefixo: str = "", cercas: bool = True) -> str:
+    """Resposta do modelo como array JSON (opcionalmente entre cercas ```json)."""
+    corpo = json.dumps(evidencias(quantidade, semente, prefixo), ensure_ascii=False, indent=2)
+    return f"```json\n{corpo}\n```" if cercas else corpo
+
+
+def truncar(texto: str, fracao: float = 0.7) -> str:
+    """Corta a resposta como faria o limite de tokens de saída."""
+    return texto[:int(len(texto) * fracao)]
@@ -0,0 +1,113 @@
+"""
+Executa os micro-benchmarks e compara com a baseline gravada.
+
+Uso:
+    python -m benchmarks.executar                    # mede tudo e compara com benchmarks/baseline.json
+    python -m benchmarks.executar --filtro parser    # só os casos cujo nome contém 'parser'
+    python -m benchmarks.executar --salvar           # grava as medições como nova baseline
+    python -m benchmarks.executar --json medicoes.json
+
+Cada módulo `benchmarks/bench_*.py` expõe `casos(diretorio) -> list[Caso]`.
+Tudo roda num diretório temporário (runs.db, runs/ e entrada/ isolados).
+Sai com código 1 se o mínimo de algum caso ficar mais de --tolerancia acima
+da baseline.
+
+A baseline é específica da máquina: grave-a (--salvar) no mesmo ambiente em
+que as comparações serão feitas, a cada release, e versione o arquivo.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import pkgutil
+import sys
+import tempfile
+
+from loguru import logger
+
+import benchmarks
+from benchmarks.medicao import TOLERANCIA_PADRAO, carregar_baseline, comparar, medir, salvar_baseline
+from src import leitor_txt, persistence, planilha
+
+CAMINHO_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def _isolar(diretorio: str) -> None:
+    persistence.fechar_conexao()
+    persistence.CAMINHO_DB = os.path.join(diretorio, "runs.db")
+    persistence.CAMINHO_SAIDA = diretorio
+    planilha.CAMINHO_RUNS = os.path.join(diretorio, "runs")
+    leitor_txt.CAMINHO_ENTRADA = diretorio
+    persistence.init_db(forcar=True)
+
+
+def modulos_benchmark() -> list[str]:
+    return sorted(m.name for m in pkgutil.iter_modules(benchmarks.__path__) if m.name.startswith("bench_"))
+
+
+def executar(filtro: str = "") -> dict:
+    """Mede os casos (filtrados por substring do nome). Retorna {nome: medição}."""
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="benchmarks_") as diretorio:
+        _isolar(diretorio)
+        try:
+            for nome_modulo in modulos_benchmark():
+                modulo = importlib.import_module(f"benchmarks.{nome_modulo}")
+                for caso in modulo.casos(diretorio):
+                    if filtro and filtro not in caso.nome:
+                        continue
+                    resultados[caso.nome] = medir(caso)
+                    logger.info(f"⏱️ {caso.nome}: {resultados[caso.nome]['mediana_s'] * 1000:.3f} ms")
+        finally:
+            persistence.fechar_conexao()
+    return resultados
+
+
+def _formatar(comparacao: list[dict], resultados: dict) -> str:
+    linhas = [f"{'caso':<52} {'mediana':>12} {'mínimo':>12} {'vazão':>22} {'baseline':>12} {'Δ':>8}"]
+    for c in comparacao:
+        r = resultados[c["nome"]]
+        vazao = f"{r['vazao']:,.0f} {r['unidade']}" if "vazao" in r else ""
+        base = f"{c['baseline_s'] * 1000:.3f} ms" if c["baseline_s"] else "—"
+        delta = f"{(c['razao'] - 1) * 100:+.0f}%" if c["razao"] is not None else "novo"
+        marca = "  ⚠️ REGRESSÃO" if c["regressao"] else ""
+        linhas.append(f"{c['nome']:<52} {r['mediana_s'] * 1000:>9.3f} ms {r['min_s'] * 1000:>9.3f} ms "
+                      f"{vazao:>22} {base:>12} {delta:>8}{marca}")
+    return "\n".join(linhas)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos caminhos quentes")
+    parser.add_argument("--filtro", default="", help="Substring do nome dos casos a medir")
+    parser.add_argument("--baseline", default=CAMINHO_BASELINE)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help=f"Fração acima da baseline tolerada (padrão: {TOLERANCIA_PADRAO})")
+    parser.add_argument("--salvar", action="store_true", help="Grava as medições como nova baseline")
+    parser.add_argument("--json", default=None, help="Grava as medições neste arquivo")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, format="{message}", level="INFO",
+               filter=lambda r: r["level"].no >= 40 or "benchmarks" in r["file"].path)
+
+    resultados = executar(args.filtro)
+    comparacao = comparar(resultados, carregar_baseline(args.baseline), args.tolerancia)
+    print(_formatar(comparacao, resultados))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    if args.salvar:
+        salvar_baseline(args.baseline, resultados)
+        print(f"\nBaseline gravada em {args.baseline}")
+        return 0
+    regressoes = [c["nome"] for c in comparacao if c["regressao"]]
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}: {', '.join(regressoes)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Medição e comparação com a baseline, no estilo asv: cada caso tem uma
+chamada de aquecimento fora da medição e `repeticoes` amostras de `numero`
+chamadas cada. A comparação usa o mínimo das amostras (menos sensível a ruído
+da máquina que a mediana, como recomenda o timeit); a mediana é reportada."""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+TOLERANCIA_PADRAO = 0.25  # mínimo até 25% acima da baseline não é regressão
+
+
+@dataclass
+class Caso:
+    nome: str                                   # ex.: "leitor.carregar_blocos[1000p]"
+    funcao: Callable[[], object]
+    preparar: Optional[Callable[[], None]] = None  # antes de cada amostra, fora da medição
+    numero: int = 1                             # chamadas por amostra (funções rápidas)
+    repeticoes: int = 7
+    unidade: str = ""                           # ex.: "páginas", "blocos"
+    unidades: int = 0                           # unidades processadas por chamada (vazão)
+
+
+def medir(caso: Caso) -> dict:
+    """Segundos por chamada: mediana, mínimo e máximo das amostras (+ vazão)."""
+    if caso.preparar:
+        caso.preparar()
+    caso.funcao()  # aquecimento: caches, índices em memória, imports tardios
+    amostras = []
+    for _ in range(caso.repeticoes):
+        if caso.preparar:
+            caso.preparar()
+        t0 = time.perf_counter()
+        for _ in range(caso.numero):
+            caso.funcao()
+        amostras.append((time.perf_counter() - t0) / caso.numero)
+    resultado = {
+        "mediana_s": statistics.median(amostras),
+        "min_s": min(amostras),
+        "max_s": max(amostras),
+    }
+    if caso.unidades:
+        resultado["vazao"] = caso.unidades / resultado["mediana_s"]
+        resultado["unidade"] = f"{caso.unidade}/s"
+    return resultado
+
+
+def comparar(resultados: dict, baseline: dict, tolerancia: float = TOLERANCIA_PADRAO) -> list[dict]:
+    """Razão atual/baseline dos mínimos; `regressao` acima de 1 + tolerancia."""
+    base = baseline.get("casos", {})
+    comparacao = []
+    for nome, atual in resultados.items():
+        anterior = base.get(nome)
+        razao = atual["min_s"] / anterior["min_s"] if anterior and anterior["min_s"] else None
+        comparacao.append({
+            "nome": nome,
+            "min_s": atual["min_s"],
+            "baseline_s": anterior["min_s"] if anterior else None,
+            "razao": razao,
+            "regressao": razao is not None and razao > 1 + tolerancia,
+        })
+    return comparacao
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def carregar_baseline(caminho: str) -> dict:
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_baseline(caminho: str, resultados: dict, mesclar: bool = True) -> None:
+    """Grava as medições como nova baseline (mantém casos não medidos nesta execução)."""
+    casos = carregar_baseline(caminho).get("casos", {}) if mesclar else {}
+    casos.update({nome: {k: v for k, v in r.items() if k != "unidade"} for nome, r in resultados.items()})
+    dados = {
+        "meta": {
+            "gravado_em": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "commit": _commit_atual(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+        },
+        "casos": dict(sorted(casos.items())),
+    }
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+        f.write("\n")
@@ -36,6 +36,64 @@ DELIMITADOR_PAGINA_PADRAO = "---Página---"
 # por caracteres para evitar blocos gigantes (e respostas truncadas do modelo).
 MAX_CHARS_BLOCO = 45000
 
+# === EMPACOTAMENTO POR TOKENS ===
+# Agrupa páginas consecutivas até um orçamento de tokens de entrada por bloco
+# (em vez de PAGINAS_POR_BLOCO fixo). O orçamento sai da folga de saída do
+# modelo: (MAX_OUTPUT_TOKENS_BLOCO - RESERVA_RACIOCINIO_TOKENS) * MARGEM_SAIDA
+# / RAZAO_SAIDA_ENTRADA — com os valores padrão, ~11k tokens (≈ MAX_CHARS_BLOCO).
+EMPACOTAR_POR_TOKENS = os.getenv("EMPACOTAR_POR_TOKENS", "true").lower() == "true"
+MAX_OUTPUT_TOKENS_BLOCO = 32768   # max_output_tokens pedido nos blocos
+RESERVA_RACIOCINIO_TOKENS = 8192  # thinking do 2.5 consome o mesmo orçamento de saída
+RAZAO_SAIDA_ENTRADA = float(os.getenv("RAZAO_SAIDA_ENTRADA", "2.0"))  # tokens de resposta por token de entrada
+MARGEM_SAIDA = 0.9
+TOKENS_ENTRADA_POR_BLOCO = int(os.getenv("TOKENS_ENTRADA_POR_BLOCO", "0"))  # 0 = derivar da folga de saída
+
+# === PRÉ-TRIAGEM LOCAL DE PÁGINAS ===
+# Pontua cada página por sinais de conteúdo documental (CNPJ/CPF, R$, chave de
+# NF-e, "nota fiscal", datas, valores, tabelas) e não envia ao modelo as que
+# ficarem abaixo do limiar (narrativa jurídica, jurisprudência). As páginas
+# ignoradas vão para paginas_ignoradas.csv na pasta da run.
+PREFILTRO_ATIVO = os.getenv("PREFILTRO_ATIVO", "false").lower() == "true"
+PREFILTRO_LIMIAR = float(os.getenv("PREFILTRO_LIMIAR", "2.0"))
+
+# === CONCORRÊNCIA DE EXTRAÇÃO ===
+# Quantidade máxima de blocos em voo simultaneamente na API Gemini.
+# 1 = processamento sequencial (comportamento original).
+MAX_BLOCOS_CONCORRENTES = int(os.getenv("MAX_BLOCOS_CONCORRENTES", "4"))
+
+# Saída JSON estruturada: envia response_mime_type=application/json + response_schema
+# (derivado de COLUNAS_EVIDENCIA) e usa parse direto, sem a cadeia de fallbacks.
+SAIDA_JSON_ESTRUTURADA = os.getenv("SAIDA_JSON_ESTRUTURADA", "true").lower() == "true"
+
+# Blocos truncados por MAX_TOKENS: divide ao meio e reenvia as metades em paralelo,
+# recursivamente até MIN_CHARS_SUBBLOCO / MAX_PROFUNDIDADE_SUBDIVISAO.
+SUBDIVIDIR_TRUNCADOS = os.getenv("SUBDIVIDIR_TRUNCADOS", "true").lower() == "true"
+MIN_CHARS_SUBBLOCO = int(os.getenv("MIN_CHARS_SUBBLOCO", "4000"))
+MAX_PROFUNDIDADE_SUBDIVISAO = int(os.getenv("MAX_PROFUNDIDADE_SUBDIVISAO", "3"))
+
+# Streaming: grava cada evidência assim que o objeto JSON termina de chegar.
+USAR_STREAMING = os.getenv("USAR_STREAMING", "false").lower() == "true"
+
+# Fila de execuções (tabela jobs em runs.db): com USAR_WORKER a interface só
+# enfileira e acompanha; o processamento roda em `python -m src.worker`.
+USAR_WORKER = os.getenv("USAR_WORKER", "false").lower() == "true"
+WORKER_INTERVALO_S = float(os.getenv("WORKER_INTERVALO_S", "2"))   # polling da fila vazia
+JOB_HEARTBEAT_S = 15                                                # batimento do job em execução
+JOB_TIMEOUT_HEARTBEAT_S = int(os.getenv("JOB_TIMEOUT_HEARTBEAT_S", "120"))  # sem batimento → job órfão
+JOB_MAX_TENTATIVAS = int(os.getenv("JOB_MAX_TENTATIVAS", "3"))      # reenfileiramentos de órfãos
+# Leases de bloco em run_items: vários workers dividem os blocos de uma mesma run.
+# Um lease não renovado (worker caiu) vence após LEASE_BLOCO_S e o bloco é refeito.
+LEASE_BLOCO_S = int(os.getenv("LEASE_BLOCO_S", "600"))
+
+# === LIMITADOR DE TAXA GLOBAL (todas as chamadas Gemini do processo) ===
+# Ajuste conforme a quota do projeto no Google AI Studio.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "1000"))                 # requisições/minuto
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))              # tokens de entrada/minuto
+GEMINI_MAX_CONCORRENCIA = int(os.getenv("GEMINI_MAX_CONCORRENCIA", "16"))  # teto AIMD de chamadas em voo
+# Endpoint alternativo da API — ex.: o backend simulado de `python -m src.gemini_fake`
+# para testes de carga offline. Vazio = API real do Google.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+
 # === CAMINHOS PADRÃO USANDO BASE ABSOLUTA ===
 CAMINHO_ENTRADA = os.path.join(BASE_DIR, "entrada")
 CAMINHO_SAIDA = os.path.join(BASE_DIR, "saida")
@@ -47,6 +105,30 @@ ARQUIVO_PADRAO_TXT = "processo.txt"
 # === CAMINHOS v2.0 ===
 CAMINHO_RUNS = os.path.join(CAMINHO_SAIDA, "runs")
 CAMINHO_DB   = os.path.join(CAMINHO_SAIDA, "runs.db")
+# TXT de entrada imutáveis, um por conteúdo (<sha256>.txt), no mesmo volume dos workers
+CAMINHO_ENTRADAS = os.path.join(CAMINHO_SAIDA, "entradas")
+
+# === CACHE DE RESPOSTAS DO LLM ===
+# Respostas completas (finish_reason=STOP) são reaproveitadas quando o mesmo
+# prompt é reenviado ao mesmo modelo com a mesma configuração.
+CACHE_LLM_ATIVO = os.getenv("CACHE_LLM_ATIVO", "true").lower() == "true"
+CAMINHO_CACHE_LLM = os.path.join(CAMINHO_SAIDA, "cache_llm.db")
+CACHE_LLM_MAX_MB = int(os.getenv("CACHE_LLM_MAX_MB", "512"))
+
+# === DEDUPLICAÇÃO DE EVIDÊNCIAS ===
+# Linhas iguais após normalização (caixa, espaços, pontuação final) são sempre
+# descartadas. Com DEDUP_MINHASH, trechos quase idênticos (similaridade de
+# Jaccard estimada ≥ DEDUP_MINHASH_LIMIAR) também são.
+DEDUP_MINHASH = os.getenv("DEDUP_MINHASH", "false").lower() == "true"
+DEDUP_MINHASH_LIMIAR = float(os.getenv("DEDUP_MINHASH_LIMIAR", "0.85"))
+
+# === TELEMETRIA DAS CHAMADAS À API ===
+# Cada tentativa (duração, tokens de usage_metadata, erro, finish_reason) é
+# gravada em runs.db (tabela tentativas_api). Preços em USD por 1M de tokens
+# (gemini-2.5-flash; raciocínio é cobrado como saída) para estimar custo.
+TELEMETRIA_ATIVA = os.getenv("TELEMETRIA_ATIVA", "true").lower() == "true"
+PRECO_ENTRADA_USD_MILHAO = float(os.getenv("PRECO_ENTRADA_USD_MILHAO", "0.30"))
+PRECO_SAIDA_USD_MILHAO = float(os.getenv("PRECO_SAIDA_USD_MILHAO", "2.50"))
 
 # === SMTP (email best-effort) ===
 SMTP_HOST = os.getenv("SMTP_HOST", "")
@@ -144,3 +226,34 @@ QUESITOS PERICIAIS: [liste, um por linha iniciado por "- ", os quesitos formulad
 REGRA IMPORTANTE: Se algum campo não puder ser identificado com certeza no texto, escreva:
 Não identificado. Não invente informações que não estejam no processo.
 """
+
+# === SAC — RESUMO HIERÁRQUICO (MAP-REDUCE) ===
+# Processos acima deste tamanho são resumidos por grupos de páginas em paralelo
+# (map) e os resumos parciais consolidados no formato de PROMPT_RESUMIDOR (reduce),
+# cobrindo o documento inteiro em vez de truncá-lo em MAX_CHARS_RESUMIDOR.
+RESUMO_MAPREDUCE_ACIMA_DE = int(os.getenv("RESUMO_MAPREDUCE_ACIMA_DE", str(MAX_CHARS_RESUMIDOR)))
+MAX_CHARS_RESUMO_PARCIAL = 400_000  # ~100k tokens por trecho na fase map
+MAX_RESUMOS_PARALELOS = int(os.getenv("MAX_RESUMOS_PARALELOS", "4"))
+
+PROMPT_RESUMO_PARCIAL = """
+Você é um assistente jurídico-pericial. O texto abaixo é APENAS UM TRECHO (grupo de páginas)
+de um processo judicial maior. Extraia, de forma fiel e objetiva, tudo o que for relevante para
+montar posteriormente o resumo do processo completo:
+
+- tipo de ação, partes (polo ativo e passivo), objeto e pedidos;
+- períodos e datas relevantes;
+- valores monetários em disputa;
+- documentos/provas citados (tipo, número, data e página [fls.] quando houver);
+- quesitos periciais formulados.
+
+Use tópicos curtos. Não invente informações; omita o que não constar no trecho.
+"""
+
+PROMPT_REDUTOR = """
+Você receberá RESUMOS PARCIAIS de trechos consecutivos de um mesmo processo judicial, na ordem
+das páginas. Consolide-os em um único resumo, eliminando repetições e mantendo todos os
+documentos-chave e quesitos citados em qualquer trecho.
+""" + PROMPT_RESUMIDOR.replace(
+    "Analise o processo judicial completo abaixo",
+    "Com base nos resumos parciais abaixo, analise o processo judicial completo",
+)
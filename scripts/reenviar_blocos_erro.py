@@ -28,6 +28,8 @@ except ImportError:
 
 from google.genai import types
 
+from src.limitador import limitador, classificar_erro, estimar_tokens
+
 MODELO_PADRAO = "gemini-2.5-flash"
 CAMINHO_LOGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
 
@@ -47,11 +49,21 @@ def enviar_bloco(prompt: str, modelo: str, bloco_id: int) -> dict:
     logger.info(f"Enviando bloco {bloco_id} → modelo={modelo}, max_output_tokens=16384")
     inicio = time.time()
 
-    response = client.models.generate_content(
-        model=modelo,
-        contents=prompt,
-        config=config,
-    )
+    # Mesmo limitador global da aplicação: respeita RPM/TPM e Retry-After
+    tokens = estimar_tokens(prompt)
+    limitador.adquirir(tokens)
+    try:
+        response = client.models.generate_content(
+            model=modelo,
+            contents=prompt,
+            config=config,
+        )
+    except Exception as e:
+        erro = classificar_erro(e)
+        limitador.liberar(sobrecarga=erro.sobrecarga, retry_after=erro.retry_after,
+                          tokens_estimados=tokens, tokens_reais=0)
+        raise
+    limitador.liberar(tokens_estimados=tokens)
 
     duracao = time.time() - inicio
 
@@ -0,0 +1,186 @@
+"""
+Teste de carga offline do pipeline de extração contra o backend Gemini simulado.
+
+Uso:
+    python scripts/teste_carga.py --paginas 3000 --cenario realista --concorrencia 16
+    python scripts/teste_carga.py --paginas 5000 --cenario instavel --http --streaming
+    python scripts/teste_carga.py --paginas 2000 --relatorio carga.json
+
+Gera um documento sintético de N páginas, executa `processar_blocos_run` de
+ponta a ponta (SQLite, Excel, limitador, retentativas, subdivisão) com o
+cliente Gemini trocado por `src.gemini_fake` — em processo ou, com --http, via
+SDK real contra o servidor fake local — e reporta blocos/s, latência por bloco
+e por tentativa (p50/p95/p99) e pico de memória (RSS).
+
+Nada é gravado em saida/ nem em logs/: a run vive num diretório temporário
+(ou em --diretorio). O cache de respostas é desligado.
+"""
+
+import sys
+import os
+import argparse
+import json
+import random
+import resource
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loguru import logger
+
+from config import DELIMITADOR_PAGINA_PADRAO, GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCORRENCIA
+from src import controlador, gemini_api, persistence, planilha, telemetria
+from src.gemini_fake import CENARIOS, BackendFake, CenarioFake, ClienteFake, ServidorFake, cliente_http, cliente_instalado
+from src.leitor_txt import dividir_texto_em_blocos
+from src.limitador import LimitadorAdaptativo
+
+PALAVRAS = (
+    "contrato autor réu prazo pagamento cláusula perícia laudo audiência testemunha valor "
+    "indenização sentença recurso petição juízo decisão prova documento notificação acordo"
+).split()
+
+
+def gerar_documento(paginas: int, chars_por_pagina: int = 2500, semente: int = 0,
+                    delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> str:
+    """Documento sintético: páginas numeradas (fls. N) com frases pseudoaleatórias."""
+    rng = random.Random(semente)
+    partes = []
+    for n in range(1, paginas + 1):
+        frases, tamanho = [f"fls. {n}"], 0
+        while tamanho < chars_por_pagina:
+            frase = " ".join(rng.choices(PALAVRAS, k=rng.randint(8, 20))).capitalize() + f" ({n}.{len(frases)})."
+            frases.append(frase)
+            tamanho += len(frase) + 1
+        partes.append(f"{delimitador} {n}\n" + " ".join(frases))
+    return "\n".join(partes)
+
+
+def pico_rss_mb() -> float:
+    """Pico de memória residente do processo (ru_maxrss: KB no Linux, bytes no macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _cronometrar(funcao, latencias: list, lock: threading.Lock):
+    def _envio(*args, **kwargs):
+        t0 = time.monotonic()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            with lock:
+                latencias.append(time.monotonic() - t0)
+    return _envio
+
+
+def _percentis(valores: list[float]) -> dict:
+    return {f"p{p}_s": round(telemetria.percentil(valores, p), 3) for p in (50, 95, 99)}
+
+
+def executar_carga(paginas: int, cenario: CenarioFake, concorrencia: int, http: bool = False,
+                   streaming: bool = False, usar_sac: bool = False, diretorio: str | None = None,
+                   rpm: int = GEMINI_RPM, tpm: int = GEMINI_TPM) -> dict:
+    """Executa uma run completa contra o backend fake e retorna o relatório."""
+    diretorio = diretorio or tempfile.mkdtemp(prefix="teste_carga_")
+    persistence.CAMINHO_DB = os.path.join(diretorio, "runs.db")
+    persistence.CAMINHO_SAIDA = diretorio
+    planilha.CAMINHO_RUNS = os.path.join(diretorio, "runs")
+    gemini_api.CAMINHO_LOGS = os.path.join(diretorio, "logs")
+    gemini_api.limitador = LimitadorAdaptativo(rpm, tpm, max(concorrencia, GEMINI_MAX_CONCORRENCIA))
+    persistence.init_db(forcar=True)
+
+    t0 = time.monotonic()
+    texto = gerar_documento(paginas)
+    blocos = dividir_texto_em_blocos(texto, DELIMITADOR_PAGINA_PADRAO)
+    preparo_s = time.monotonic() - t0
+    logger.info(f"📄 Documento sintético: {paginas} páginas, {len(texto):,} chars, {len(blocos)} blocos "
+                f"({preparo_s:.2f}s)")
+
+    latencias: list[float] = []
+    lock = threading.Lock()
+    controlador.enviar_bloco_para_gemini = _cronometrar(gemini_api.enviar_bloco_para_gemini, latencias, lock)
+    controlador.enviar_bloco_para_gemini_stream = _cronometrar(
+        gemini_api.enviar_bloco_para_gemini_stream, latencias, lock)
+
+    backend = BackendFake(cenario)
+    servidor = ServidorFake(backend).iniciar() if http else None
+    cliente = cliente_http(servidor.url) if http else ClienteFake(backend)
+    run_id = persistence.criar_run(nome=f"Carga {paginas}p", arquivo_origem="sintetico.txt")
+    try:
+        with cliente_instalado(cliente):
+            t0 = time.monotonic()
+            total_evidencias, _ = controlador.processar_blocos_run(
+                run_id=run_id, blocos=blocos, arquivo_origem="sintetico.txt", texto_completo=texto,
+                usar_sac=usar_sac, concorrencia=concorrencia, usar_cache=False,
+                delimitador=DELIMITADOR_PAGINA_PADRAO, streaming=streaming,
+            )
+            duracao_s = time.monotonic() - t0
+    finally:
+        if servidor:
+            servidor.parar()
+        controlador.enviar_bloco_para_gemini = gemini_api.enviar_bloco_para_gemini
+        controlador.enviar_bloco_para_gemini_stream = gemini_api.enviar_bloco_para_gemini_stream
+
+    tentativas = telemetria.tentativas(run_id)
+    return {
+        "paginas": paginas,
+        "blocos": len(blocos),
+        "modo": "http" if http else "em_processo",
+        "streaming": streaming,
+        "concorrencia": concorrencia,
+        "cenario": asdict(cenario),
+        "duracao_s": round(duracao_s, 3),
+        "blocos_por_s": round(len(blocos) / duracao_s, 3) if duracao_s else 0.0,
+        "blocos_ok": len(persistence.get_processed_block_ids(run_id)),
+        "evidencias": total_evidencias,
+        "latencia_bloco": _percentis(latencias),
+        "latencia_tentativa": _percentis([t["duracao_s"] for t in tentativas]),
+        "tentativas_api": len(tentativas),
+        "backend": backend.estatisticas(),
+        "limitador": gemini_api.limitador.estado(),
+        "pico_rss_mb": round(pico_rss_mb(), 1),
+        "diretorio": diretorio,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga offline contra o backend Gemini simulado")
+    parser.add_argument("--paginas", type=int, default=2000)
+    parser.add_argument("--cenario", choices=sorted(CENARIOS), default="realista")
+    parser.add_argument("--latencia", type=float, default=None, help="Sobrescreve a latência mediana (s)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--http", action="store_true", help="SDK real contra o servidor fake local")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--sac", action="store_true", help="Gera o resumo SAC antes dos blocos")
+    parser.add_argument("--rpm", type=int, default=GEMINI_RPM)
+    parser.add_argument("--tpm", type=int, default=GEMINI_TPM)
+    parser.add_argument("--diretorio", default=None, help="Onde gravar a run (padrão: diretório temporário)")
+    parser.add_argument("--relatorio", default=None, help="Grava o relatório em JSON neste caminho")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stderr, format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}",
+               level="WARNING")
+    logger.add(sys.stderr, format="{message}", level="INFO", filter=lambda r: r["level"].name == "INFO"
+               and r["name"] == "__main__")
+
+    cenario = CenarioFake(**{**asdict(CENARIOS[args.cenario]), "semente": args.semente})
+    if args.latencia is not None:
+        cenario.latencia_mediana_s = args.latencia
+
+    relatorio = executar_carga(
+        args.paginas, cenario, args.concorrencia, http=args.http, streaming=args.streaming,
+        usar_sac=args.sac, diretorio=args.diretorio, rpm=args.rpm, tpm=args.tpm,
+    )
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
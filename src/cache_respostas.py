@@ -0,0 +1,163 @@
+"""Cache persistente de respostas do LLM, endereçado por conteúdo.
+
+Chave = SHA-256 de (modelo, configuração de geração, prompt completo). Os
+valores ficam comprimidos (zlib) em um SQLite sob `saida/`, com despejo LRU
+quando o tamanho total ultrapassa CACHE_LLM_MAX_MB.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from loguru import logger
+from config import CAMINHO_CACHE_LLM, CACHE_LLM_MAX_MB
+
+_DDL = """
+PRAGMA journal_mode=WAL;
+
+CREATE TABLE IF NOT EXISTS respostas (
+    chave        TEXT PRIMARY KEY,
+    modelo       TEXT NOT NULL,
+    valor        BLOB NOT NULL,
+    tamanho      INTEGER NOT NULL,
+    criado_em    REAL NOT NULL,
+    acessado_em  REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas(acessado_em);
+"""
+
+# O total ocupado é estimado em memória a cada gravação; o SUM(tamanho) só é
+# refeito quando a estimativa passa do limite ou a cada N gravações (outros
+# processos também gravam no mesmo cache).
+RECONTAR_TOTAL_A_CADA = 100
+
+_local = threading.local()
+_lock = threading.Lock()
+_bancos_inicializados: set[str] = set()
+_totais: dict[str, list[int]] = {}  # caminho -> [bytes estimados, gravações desde a última contagem]
+
+
+def _conexao() -> sqlite3.Connection:
+    """Conexão da thread atual com CAMINHO_CACHE_LLM; o schema é criado uma vez por processo."""
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+    con = conexoes.get(CAMINHO_CACHE_LLM)
+    if con is None:
+        os.makedirs(os.path.dirname(CAMINHO_CACHE_LLM), exist_ok=True)
+        con = sqlite3.connect(CAMINHO_CACHE_LLM, timeout=10)
+        con.execute("PRAGMA synchronous=NORMAL")
+        with _lock:
+            if CAMINHO_CACHE_LLM not in _bancos_inicializados:
+                con.executescript(_DDL)
+                _bancos_inicializados.add(CAMINHO_CACHE_LLM)
+        conexoes[CAMINHO_CACHE_LLM] = con
+    return con
+
+
+@contextmanager
+def _conn():
+    con = _conexao()
+    try:
+        yield con
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def _serializar_config(config) -> dict:
+    if config is None:
+        return {}
+    if hasattr(config, "model_dump"):
+        return config.model_dump(mode="json", exclude_none=True)
+    return dict(config)
+
+
+def calcular_chave(modelo: str, config, prompt: str) -> str:
+    """SHA-256 estável de (modelo, config de geração, prompt)."""
+    payload = json.dumps(
+        {"modelo": modelo, "config": _serializar_config(config), "prompt": prompt},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def obter(chave: str) -> str | None:
+    """Retorna a resposta em cache (e marca o acesso para o LRU) ou None."""
+    try:
+        with _conn() as con:
+            row = con.execute("SELECT valor FROM respostas WHERE chave=?", (chave,)).fetchone()
+            if row is None:
+                return None
+            con.execute("UPDATE respostas SET acessado_em=? WHERE chave=?", (time.time(), chave))
+        return zlib.decompress(row[0]).decode("utf-8")
+    except Exception as exc:
+        logger.warning(f"Cache LLM indisponível na leitura (best-effort): {exc}")
+        return None
+
+
+def guardar(chave: str, modelo: str, texto: str) -> None:
+    """Grava a resposta comprimida e despeja as menos usadas se passar do limite."""
+    valor = zlib.compress(texto.encode("utf-8"), 6)
+    agora = time.time()
+    try:
+        with _conn() as con:
+            con.execute(
+                """INSERT OR REPLACE INTO respostas
+                   (chave, modelo, valor, tamanho, criado_em, acessado_em)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (chave, modelo, valor, len(valor), agora, agora),
+            )
+            _despejar_lru(con, CACHE_LLM_MAX_MB * 1024 * 1024, len(valor))
+    except Exception as exc:
+        logger.warning(f"Cache LLM indisponível na escrita (best-effort): {exc}")
+
+
+def _despejar_lru(con, limite_bytes: int, gravados: int) -> None:
+    with _lock:
+        total = _totais.get(CAMINHO_CACHE_LLM)
+        if total is not None:
+            total[0] += gravados
+            total[1] += 1
+            if total[0] <= limite_bytes and total[1] < RECONTAR_TOTAL_A_CADA:
+                return
+    total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+    if total > limite_bytes:
+        total = _remover_menos_usadas(con, total, limite_bytes)
+    with _lock:
+        _totais[CAMINHO_CACHE_LLM] = [total, 0]
+
+
+def _remover_menos_usadas(con, total: int, limite_bytes: int) -> int:
+    removidas = 0
+    for chave, tamanho in con.execute(
+        "SELECT chave, tamanho FROM respostas ORDER BY acessado_em ASC"
+    ).fetchall():
+        if total <= limite_bytes:
+            break
+        con.execute("DELETE FROM respostas WHERE chave=?", (chave,))
+        total -= tamanho
+        removidas += 1
+    logger.debug(f"Cache LLM: {removidas} resposta(s) despejada(s) (LRU)")
+    return total
+
+
+def estatisticas() -> dict:
+    with _conn() as con:
+        entradas, total = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+        ).fetchone()
+    return {"entradas": entradas, "bytes": total}
+
+
+def limpar() -> None:
+    with _conn() as con:
+        con.execute("DELETE FROM respostas")
+    with _lock:
+        _totais.pop(CAMINHO_CACHE_LLM, None)
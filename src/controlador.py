@@ -1,12 +1,27 @@
 import re
 import json
+import hashlib
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Optional
 from loguru import logger
 from src.leitor_txt import carregar_blocos, carregar_texto_completo
-from src.gemini_api import enviar_bloco_para_gemini, gerar_resumo_processo
-from src.planilha import inicializar_planilha, adicionar_linhas_excel, escrever_resumo_primeira_aba
-from src import persistence
-from config import ARQUIVO_PADRAO_TXT
+from src.gemini_api import (
+    enviar_bloco_para_gemini,
+    enviar_bloco_para_gemini_stream,
+    gerar_resumo_processo,
+)
+from src.planilha import (
+    inicializar_planilha, registrar_evidencias, exportar_excel, abrir_exportacoes, atualizar_exportacoes,
+    fechar_exportacoes, descartar_indice_dedup, get_caminho_relatorio_triagem,
+)
+from src.prefiltro import salvar_relatorio
+from src import persistence, telemetria
+from src.parser_json import ParserJSONIncremental
+from config import ARQUIVO_PADRAO_TXT, DELIMITADOR_PAGINA_PADRAO, SAIDA_JSON_ESTRUTURADA, LEASE_BLOCO_S
+
+ESPERA_LEASES_ALHEIOS_S = 5.0  # polling enquanto só restam blocos reservados por outros workers
 
 # ---------------------------------------------------------------------------
 # Limpeza e Normalização
@@ -80,36 +95,7 @@ def _recuperar_objetos_json(trecho: str) -> list:
     Tolera respostas cortadas pelo limite de tokens: percorre o texto e fecha
     cada objeto de nível superior, ignorando chaves dentro de strings.
     """
-    objetos = []
-    nivel = 0
-    inicio = None
-    em_string = False
-    escape = False
-    for i, ch in enumerate(trecho):
-        if em_string:
-            if escape:
-                escape = False
-            elif ch == "\\":
-                escape = True
-            elif ch == '"':
-                em_string = False
-            continue
-        if ch == '"':
-            em_string = True
-        elif ch == "{":
-            if nivel == 0:
-                inicio = i
-            nivel += 1
-        elif ch == "}":
-            if nivel > 0:
-                nivel -= 1
-                if nivel == 0 and inicio is not None:
-                    try:
-                        objetos.append(json.loads(trecho[inicio:i + 1]))
-                    except json.JSONDecodeError:
-                        pass
-                    inicio = None
-    return objetos
+    return ParserJSONIncremental().alimentar(trecho)
 
 
 def extrair_campos(texto: str) -> list:
@@ -138,6 +124,25 @@ def extrair_campos(texto: str) -> list:
     return []
 
 
+def extrair_campos_estruturado(texto: str) -> Optional[list]:
+    """Parse de passada única para respostas geradas com response_schema.
+
+    As chaves já vêm exatamente como COLUNAS_EVIDENCIA, então dispensa
+    normalizar_chaves. Retorna None se o texto não for um array JSON válido
+    (o chamador recorre a `extrair_campos`); [] é um resultado legítimo.
+    """
+    try:
+        data = json.loads(texto)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, list):
+        return None
+    return [
+        {chave: limpar_texto_bruto(valor) for chave, valor in item.items()}
+        for item in data if isinstance(item, dict)
+    ]
+
+
 def limpar_linha_vazia(evidencia: dict) -> dict:
     return {k: v for k, v in evidencia.items() if v not in ("", None, "null")}
 
@@ -146,6 +151,182 @@ def limpar_linha_vazia(evidencia: dict) -> dict:
 # Pipeline v2 — com run_id, skip_ids e progress_cb
 # ---------------------------------------------------------------------------
 
+def _gravar_evidencias(run_id: str, evidencias: list, arquivo_origem: str = "",
+                       bloco_id: Optional[int] = None) -> int:
+    limpas = [limpar_linha_vazia(e) for e in evidencias if limpar_linha_vazia(e)]
+    return len(registrar_evidencias(limpas, run_id=run_id, arquivo_origem=arquivo_origem, bloco_id=bloco_id))
+
+
+def _registrar_resultado_bloco(run_id: str, bloco_id: int, resposta: str, arquivo_origem: str = "",
+                               ja_gravadas: int = 0, completo: bool = True,
+                               parcial: bool = False) -> tuple[str, int]:
+    """Interpreta a resposta de um bloco, grava as evidências e o checkpoint em run_items.
+
+    `ja_gravadas` conta evidências do bloco já gravadas durante o streaming;
+    `completo=False` indica stream interrompido (o bloco fica como ERRO_LLM
+    para ser refeito na retomada, sem perder o que já foi gravado).
+    `parcial=True` indica subdivisão com parte sem resposta: as evidências das
+    demais partes são gravadas e o bloco fica PARCIAL (refeito na retomada).
+    Retorna (status_bloco, linhas_novas); status_bloco segue o contrato do progress_cb.
+    """
+    if not completo:
+        logger.error(f"Stream interrompido no bloco {bloco_id} após {ja_gravadas} evidência(s).")
+        persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_ERRO_LLM, ja_gravadas,
+                                    f"Stream interrompido após {ja_gravadas} evidência(s)")
+        return "erro", 0
+
+    if ja_gravadas:
+        if parcial:
+            return _registrar_parcial(run_id, bloco_id, ja_gravadas), 0
+        persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_OK, ja_gravadas)
+        logger.success(f"Bloco {bloco_id+1}: {ja_gravadas} evidência(s) salva(s).")
+        return "ok", 0
+
+    if not resposta:
+        logger.error(f"Sem retorno da Gemini no bloco {bloco_id}.")
+        persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_ERRO_LLM, 0, "Sem resposta da API")
+        return "erro", 0
+
+    evidencias = extrair_campos_estruturado(resposta) if SAIDA_JSON_ESTRUTURADA else None
+    if evidencias == [] and parcial:
+        return _registrar_parcial(run_id, bloco_id, 0), 0
+    if evidencias == []:
+        # Array vazio válido no modo estruturado: bloco sem evidências, não erro de parse
+        logger.info(f"Bloco {bloco_id+1}: nenhuma evidência no trecho.")
+        persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_OK, 0)
+        return "vazio", 0
+    if evidencias is None:
+        evidencias = extrair_campos(resposta)
+
+    if not evidencias:
+        logger.warning(f"Nenhuma evidência extraída do bloco {bloco_id}.")
+        persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_ERRO_PARSE, 0, "Nenhuma evidência")
+        return "vazio", 0
+
+    linhas_validas = _gravar_evidencias(run_id, evidencias, arquivo_origem, bloco_id)
+    if parcial:
+        return _registrar_parcial(run_id, bloco_id, linhas_validas), linhas_validas
+
+    persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_OK, linhas_validas)
+    logger.success(f"Bloco {bloco_id+1}: {linhas_validas} evidência(s) salva(s).")
+    return "ok", linhas_validas
+
+
+def _registrar_parcial(run_id: str, bloco_id: int, linhas: int) -> str:
+    logger.warning(f"Bloco {bloco_id+1}: parcial — {linhas} evidência(s) salva(s), parte da subdivisão sem resposta.")
+    persistence.salvar_run_item(run_id, bloco_id, persistence.ITEM_PARCIAL, linhas,
+                                "Parte da subdivisão sem resposta")
+    return "erro"
+
+
+def _checkpoint_bloco(run_id: str, bloco_id: int, resposta: str, arquivo_origem: str,
+                      total_blocos: int, blocos_processados: int, evidencias_acumuladas: int,
+                      ja_gravadas: int = 0, completo: bool = True, parcial: bool = False,
+                      totais_do_banco: bool = False) -> tuple[str, int]:
+    """Grava evidências, run_item e progresso da run do bloco em UMA transação.
+
+    `blocos_processados`/`evidencias_acumuladas` são os totais antes deste bloco.
+    Com `totais_do_banco` (vários workers na mesma run) o progresso gravado é
+    contado em run_items/evidencias dentro da própria transação.
+    """
+    try:
+        with persistence.transacao():
+            status_bloco, linhas_validas = _registrar_resultado_bloco(
+                run_id, bloco_id, resposta, arquivo_origem, ja_gravadas=ja_gravadas, completo=completo,
+                parcial=parcial,
+            )
+            if totais_do_banco:
+                persistence.atualizar_progresso_run(
+                    run_id, total_blocos, persistence.contar_blocos_finalizados(run_id),
+                    persistence.contar_evidencias(run_id),
+                )
+            else:
+                persistence.atualizar_progresso_run(
+                    run_id, total_blocos, blocos_processados + 1, evidencias_acumuladas + linhas_validas,
+                )
+    except Exception:
+        descartar_indice_dedup(run_id)  # linhas do ROLLBACK não podem ficar marcadas
+        raise
+    return status_bloco, linhas_validas
+
+
+def fingerprint_texto(texto: str) -> str:
+    """Identidade estável de um texto (bloco ou documento): sha256 do UTF-8."""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def blocos_ja_processados(run_id: str, blocos, lease_owner: Optional[str] = None) -> set:
+    """Grava fingerprint e páginas de cada bloco em run_items e retorna os já OK.
+
+    A retomada casa blocos pelo texto, não pela posição: se o delimitador,
+    PAGINAS_POR_BLOCO ou MAX_CHARS_BLOCO mudaram entre tentativas, um bloco
+    cujo texto já foi processado continua pulado onde quer que esteja agora,
+    e uma posição cujo texto mudou volta a ser enviada. Blocos reservados por
+    outro lease em vigor não são tocados. Linhas antigas sem fingerprint só
+    valem pela posição se a `divisao` dos blocos for a gravada na run.
+    """
+    paginas = getattr(blocos, "paginas", None)  # BlocosPaginados conhece as páginas de cada bloco
+    digitais = [
+        (fingerprint_texto(texto), *(paginas(i) if paginas else (None, None)))
+        for i, texto in enumerate(blocos)
+    ]
+    return persistence.sincronizar_fingerprints(run_id, digitais, lease_owner, getattr(blocos, "divisao", ""))
+
+
+def _texto_e_cortes(blocos, i: int) -> tuple[str, list[int]]:
+    """Texto do bloco `i` e os offsets de início de página nele (só `BlocosPaginados` os conhece)."""
+    texto_e_cortes = getattr(blocos, "texto_e_cortes", None)
+    return texto_e_cortes(i) if texto_e_cortes else (blocos[i], [])
+
+
+def _registrar_paginas_ignoradas(run_id: str, blocos) -> None:
+    """Grava o relatório da pré-triagem local, se algum bloco perdeu páginas nela."""
+    ignoradas = getattr(blocos, "paginas_ignoradas", None)
+    if ignoradas:
+        caminho = salvar_relatorio(get_caminho_relatorio_triagem(run_id), ignoradas)
+        logger.info(f"🔎 {len(ignoradas)} página(s) ignorada(s) pela pré-triagem — relatório em {caminho}")
+
+
+def _resumo_reaproveitado(run_id: str, texto_completo: str, usar_sac: bool,
+                          resumo_existente: str, usar_cache: bool) -> tuple[str, str]:
+    """Retorna (resumo, doc_hash) sem chamar o LLM; resumo "" se precisar ser gerado."""
+    if resumo_existente:
+        logger.info("♻️ Reaproveitando resumo SAC já persistido na run")
+        return resumo_existente, ""
+    if not (usar_sac and texto_completo):
+        return "", ""
+
+    doc_hash = fingerprint_texto(texto_completo)
+    resumo = persistence.get_resumo_documento(doc_hash) if usar_cache else None
+    if resumo:
+        logger.info("♻️ Resumo SAC reaproveitado (documento idêntico já resumido)")
+        persistence.salvar_resumo_run(run_id, resumo)
+        return resumo, doc_hash
+    return "", doc_hash
+
+
+def _registrar_resumo_gerado(run_id: str, doc_hash: str, resumo: str) -> None:
+    if not resumo:
+        logger.warning("⚠️ SAC desativado — falha ao gerar resumo")
+        return
+    persistence.salvar_resumo_run(run_id, resumo)
+    if doc_hash:
+        persistence.salvar_resumo_documento(doc_hash, resumo)
+
+
+def _separar_pendentes(total_blocos: int, skip_ids: set, progress_cb: Optional[Callable]) -> list:
+    """Retorna os índices a enviar, sinalizando 'pulado' para os já processados."""
+    pendentes = []
+    for i in range(total_blocos):
+        if i in skip_ids:
+            logger.debug(f"Bloco {i} já processado — pulando.")
+            if progress_cb:
+                progress_cb(i, total_blocos, 0, "pulado")
+            continue
+        pendentes.append(i)
+    return pendentes
+
+
 def processar_blocos_run(
     run_id: str,
     blocos: list,
@@ -154,84 +335,229 @@ def processar_blocos_run(
     progress_cb: Optional[Callable] = None,
     texto_completo: str = "",
     usar_sac: bool = False,
+    concorrencia: int = 1,
+    usar_cache: bool = True,
+    resumo_existente: str = "",
+    delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+    streaming: bool = False,
+    lease_owner: Optional[str] = None,
+    reconciliar: bool = True,
 ) -> int:
     """
     Processa blocos para uma run específica (v3.0 com SAC opcional).
 
     Fase 1 (se usar_sac=True): Gera resumo do processo completo.
-    Fase 2: Extrai evidências bloco a bloco com contexto global (se disponível).
+    Fase 2: Extrai evidências dos blocos com contexto global (se disponível),
+    mantendo até `concorrencia` blocos em voo na API ao mesmo tempo.
+    usar_cache=False ignora o cache local de respostas (força novas chamadas).
+
+    resumo_existente (ex.: runs.resumo_processo ao retomar) é usado como
+    contexto global sem nova chamada ao resumidor. Com usar_sac, um documento
+    cujo hash já tenha resumo salvo também reaproveita esse resumo.
+    delimitador é usado pelo resumo hierárquico para agrupar páginas. Blocos
+    truncados por MAX_TOKENS são reenviados em metades, com o resultado
+    mesclado registrado sob o bloco_id original; com `BlocosPaginados`, o
+    corte cai na divisa de páginas mais próxima do meio (`texto_e_cortes`).
+
+    Blocos já processados são reconhecidos pela fingerprint do texto
+    (`blocos_ja_processados`), somados aos `skip_ids` informados. Páginas
+    descartadas pela pré-triagem local (`blocos.paginas_ignoradas`) vão para
+    paginas_ignoradas.csv na pasta da run.
+
+    Com streaming=True cada evidência é gravada assim que seu objeto JSON
+    fecha na resposta (progress_cb recebe status 'parcial'); se a conexão cair,
+    só se perdem os objetos ainda incompletos.
+
+    Parquet, CSV.gz e JSONL da run são escritos incrementalmente durante a
+    Fase 2; o Excel é gerado uma vez no final.
+
+    As chamadas à API rodam em um pool de threads; a gravação das evidências,
+    o checkpoint em run_items e o progress_cb acontecem sempre na thread
+    chamadora, na ordem em que os blocos terminam (que pode diferir da ordem
+    dos blocos quando concorrencia > 1).
+
+    Com lease_owner, os blocos são reivindicados em run_items (leases de
+    LEASE_BLOCO_S, renovados enquanto em voo) em vez de percorridos da lista:
+    vários processos podem dividir a mesma run sem sobreposição, e blocos de
+    um worker que caiu voltam a ser reivindicáveis quando o lease vence. Para
+    o dono (reconciliar=True), a função só retorna quando nenhum bloco da run
+    está em aberto; um auxiliar retorna assim que não há o que reivindicar. Nesse modo
+    skip_ids só alimenta o progress_cb e os totais da run vêm do banco; os
+    exports Parquet/CSV/JSONL ficam com o dono, que acrescenta a eles também
+    as evidências gravadas pelos auxiliares.
+    Auxiliares só entram na run depois que o dono grava o resumo da Fase 1
+    (`persistence.liberar_auxilio`). Um worker auxiliar passa
+    reconciliar=False: run_items não é reconciliado com os blocos dele (isso
+    cabe ao dono do job), que já devem ter sido conferidos com
+    `persistence.conferir_fingerprints`, e o Excel da run não é criado nem
+    gerado (cabe ao dono).
 
     progress_cb(bloco_id, total, evidencias_acumuladas, status_bloco)
-      status_bloco: 'ok' | 'vazio' | 'erro' | 'resumindo'
+      status_bloco: 'ok' | 'vazio' | 'erro' | 'resumindo' | 'parcial'
       bloco_id=-1 sinaliza Fase 1 (resumindo)
 
     Retorna tupla (total_evidencias_extraidas, resumo_processo).
     resumo_processo é "" quando SAC não foi usado ou falhou.
     """
-    skip_ids = skip_ids or set()
     total_blocos = len(blocos)
     evidencias_acumuladas = 0
     blocos_processados = 0
-    contexto_global = ""
-
-    inicializar_planilha(run_id)
 
-    # Fase 1: SAC — Gerar resumo do processo
-    if usar_sac and texto_completo:
+    if reconciliar:
+        if lease_owner is not None:
+            persistence.liberar_auxilio(run_id, False)  # auxiliares esperam o contexto da Fase 1
+        inicializar_planilha(run_id)
+        skip_ids = set(skip_ids or ()) | blocos_ja_processados(run_id, blocos, lease_owner)
+        _registrar_paginas_ignoradas(run_id, blocos)
+    else:
+        skip_ids = set(skip_ids or ()) | persistence.get_processed_block_ids(run_id)
+
+    # Fase 1: SAC — reaproveita resumo existente ou gera o resumo do processo
+    contexto_global, doc_hash = _resumo_reaproveitado(run_id, texto_completo, usar_sac, resumo_existente, usar_cache)
+    if not contexto_global and usar_sac and texto_completo:
         if progress_cb:
             progress_cb(-1, total_blocos, 0, "resumindo")
-        contexto_global = gerar_resumo_processo(texto_completo)
-        if contexto_global:
-            persistence.salvar_resumo_run(run_id, contexto_global)
-        else:
-            logger.warning("⚠️ SAC desativado — falha ao gerar resumo")
-
-    for i, bloco in enumerate(blocos):
-        if i in skip_ids:
-            logger.debug(f"Bloco {i} já processado — pulando.")
-            if progress_cb:
-                progress_cb(i, total_blocos, evidencias_acumuladas, "pulado")
-            continue
-
+        with telemetria.contexto(run_id=run_id):
+            contexto_global = gerar_resumo_processo(texto_completo, usar_cache=usar_cache, delimitador=delimitador)
+        _registrar_resumo_gerado(run_id, doc_hash, contexto_global)
+    if lease_owner is not None and reconciliar:
+        persistence.liberar_auxilio(run_id)
+
+    pendentes = _separar_pendentes(total_blocos, skip_ids, progress_cb)
+
+    # Fase 2: extração concorrente (pool limitado a `concorrencia` blocos em voo).
+    # As threads só conversam com a API; tudo o que grava passa pela fila de
+    # eventos e é tratado aqui, na thread chamadora.
+    fila: queue.Queue = queue.Queue()
+
+    def _executar(i: int) -> None:
+        with telemetria.contexto(run_id=run_id):
+            _enviar_bloco(i)
+
+    def _enviar_bloco(i: int) -> None:
+        completo = True
+        parcial = []  # ao_parcial: subdivisão com parte sem resposta
+        try:
+            texto_bloco, cortes = _texto_e_cortes(blocos, i)
+            if streaming:
+                parser = ParserJSONIncremental()
+
+                def _ao_receber(trecho: str) -> None:
+                    objetos = parser.alimentar(trecho)
+                    if objetos:
+                        fila.put(("parcial", i, objetos))
+
+                def _ao_subdividir(mesclado: str) -> None:
+                    # Metades reenviadas após MAX_TOKENS: o parser do stream ficou
+                    # no meio de um objeto, então o array mesclado é lido à parte.
+                    objetos = ParserJSONIncremental().alimentar(mesclado)
+                    if objetos:
+                        fila.put(("parcial", i, objetos))
+
+                resposta, completo = enviar_bloco_para_gemini_stream(
+                    texto_bloco, bloco_id=i, contexto_global=contexto_global,
+                    usar_cache=usar_cache, ao_receber=_ao_receber,
+                    cortes_pagina=cortes, ao_subdividir=_ao_subdividir,
+                    ao_parcial=lambda: parcial.append(True),
+                )
+            else:
+                resposta = enviar_bloco_para_gemini(
+                    texto_bloco, bloco_id=i, contexto_global=contexto_global, usar_cache=usar_cache,
+                    cortes_pagina=cortes, ao_parcial=lambda: parcial.append(True),
+                )
+        except Exception as exc:
+            logger.error(f"Erro inesperado ao enviar bloco {i}: {exc}")
+            resposta = ""
+        fila.put(("fim", i, resposta, completo, bool(parcial)))
+
+    concorrencia = max(1, concorrencia)
+    if reconciliar:
+        abrir_exportacoes(run_id)
+    if lease_owner is not None:
+        persistence.semear_run_items(run_id, total_blocos)
+    pool = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix="bloco")
+    em_voo: set[int] = set()
+
+    def _disparar(i: int) -> None:
         logger.info(f"Bloco {i+1}/{total_blocos} enviado para Gemini...")
-        resposta = enviar_bloco_para_gemini(bloco, bloco_id=i, contexto_global=contexto_global)
+        em_voo.add(i)
+        pool.submit(_executar, i)
 
-        if not resposta:
-            logger.error(f"Sem retorno da Gemini no bloco {i}.")
-            persistence.salvar_run_item(run_id, i, persistence.ITEM_ERRO_LLM, 0, "Sem resposta da API")
+    try:
+        if lease_owner is None:
+            for i in pendentes:
+                _disparar(i)
+
+        gravadas_stream: dict[int, int] = {}
+        reivindicar = lease_owner is not None
+        proxima_renovacao = time.monotonic() + LEASE_BLOCO_S / 3
+        while True:
+            if reivindicar:
+                for i in persistence.reivindicar_blocos(run_id, lease_owner, concorrencia - len(em_voo), LEASE_BLOCO_S):
+                    _disparar(i)
+                reivindicar = False
+            if not em_voo:
+                # Um auxiliar sem nada a reivindicar volta à fila; esperar os
+                # leases alheios cabe ao dono do job
+                if lease_owner is None or not reconciliar or not persistence.blocos_em_aberto(run_id):
+                    break
+                # Só restam blocos reservados por outros workers: espera terminarem
+                # (ou o lease vencer, quando passam a ser reivindicáveis aqui)
+                atualizar_exportacoes(run_id)
+                time.sleep(ESPERA_LEASES_ALHEIOS_S)
+                reivindicar = True
+                continue
+
+            try:
+                evento = fila.get(timeout=LEASE_BLOCO_S / 3 if lease_owner else None)
+            except queue.Empty:
+                evento = None
+            if lease_owner is not None and time.monotonic() >= proxima_renovacao:
+                persistence.renovar_leases(run_id, lease_owner, LEASE_BLOCO_S)
+                proxima_renovacao = time.monotonic() + LEASE_BLOCO_S / 3
+            if evento is None:
+                continue
+
+            if evento[0] == "parcial":
+                _, i, objetos = evento
+                linhas = _gravar_evidencias(run_id, normalizar_chaves(objetos), arquivo_origem, i)
+                gravadas_stream[i] = gravadas_stream.get(i, 0) + linhas
+                evidencias_acumuladas += linhas
+                if progress_cb:
+                    progress_cb(i, total_blocos, evidencias_acumuladas, "parcial")
+                continue
+
+            _, i, resposta, completo, parcial = evento
+            em_voo.discard(i)
+            if lease_owner is not None:
+                # Outros processos também avançam a run: totais vêm do banco
+                blocos_processados = persistence.contar_blocos_finalizados(run_id)
+                evidencias_acumuladas = persistence.contar_evidencias(run_id)
+                reivindicar = True
+            status_bloco, linhas_validas = _checkpoint_bloco(
+                run_id, i, resposta, arquivo_origem, total_blocos, blocos_processados, evidencias_acumuladas,
+                ja_gravadas=gravadas_stream.pop(i, 0), completo=completo, parcial=parcial,
+                totais_do_banco=lease_owner is not None,
+            )
+            evidencias_acumuladas += linhas_validas
             blocos_processados += 1
-            persistence.atualizar_progresso_run(run_id, total_blocos, blocos_processados, evidencias_acumuladas)
-            if progress_cb:
-                progress_cb(i, total_blocos, evidencias_acumuladas, "erro")
-            continue
 
-        evidencias = extrair_campos(resposta)
-
-        if not evidencias:
-            logger.warning(f"Nenhuma evidência extraída do bloco {i}.")
-            persistence.salvar_run_item(run_id, i, persistence.ITEM_ERRO_PARSE, 0, "Nenhuma evidência")
-            blocos_processados += 1
-            persistence.atualizar_progresso_run(run_id, total_blocos, blocos_processados, evidencias_acumuladas)
             if progress_cb:
-                progress_cb(i, total_blocos, evidencias_acumuladas, "vazio")
-            continue
-
-        limpas = [limpar_linha_vazia(e) for e in evidencias if limpar_linha_vazia(e)]
-        linhas_validas = adicionar_linhas_excel(limpas, run_id=run_id, arquivo_origem=arquivo_origem)
-
-        evidencias_acumuladas += linhas_validas
-        blocos_processados += 1
-        persistence.salvar_run_item(run_id, i, persistence.ITEM_OK, linhas_validas)
-        persistence.atualizar_progresso_run(run_id, total_blocos, blocos_processados, evidencias_acumuladas)
-        logger.success(f"Bloco {i+1}: {linhas_validas} evidência(s) salva(s).")
-
-        if progress_cb:
-            progress_cb(i, total_blocos, evidencias_acumuladas, "ok")
-
-    # Grava o resumo como primeira aba do Excel APÓS todas as evidências
-    # (adicionar_linhas_excel reescreve o arquivo e apagaria abas extras).
-    if contexto_global:
-        escrever_resumo_primeira_aba(run_id, contexto_global)
+                progress_cb(i, total_blocos, evidencias_acumuladas, status_bloco)
+    finally:
+        # Em caso de erro na gravação, não dispara os blocos que ainda estavam na fila
+        pool.shutdown(wait=True, cancel_futures=True)
+        telemetria.descarregar()
+        if reconciliar:
+            fechar_exportacoes(run_id)
+        if lease_owner is not None:
+            persistence.liberar_leases(run_id, lease_owner)
+
+    # As evidências ficam na tabela `evidencias`; o Excel é gerado uma única
+    # vez aqui, já com o resumo como primeira aba. Um auxiliar não exporta: o
+    # Excel da run é do dono, que só chega aqui com todos os blocos finalizados.
+    if reconciliar:
+        exportar_excel(run_id, contexto_global)
 
     return evidencias_acumuladas, contexto_global
 
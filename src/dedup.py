@@ -0,0 +1,108 @@
+"""Deduplicação de evidências por hash normalizado e, opcionalmente, MinHash do Trecho.
+
+O índice de uma run vive em memória (checagem O(1) por linha) e é
+reconstruído a partir da tabela `evidencias` quando a run é retomada.
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+
+TAMANHO_SHINGLE = 5
+NUM_PERMUTACOES = 64
+LINHAS_POR_BANDA = 4          # 16 bandas: pares com Jaccard ≳ 0,5 viram candidatos
+_PRIMO = (1 << 61) - 1
+_rng = random.Random(20240611)  # coeficientes fixos: assinaturas estáveis entre processos
+_COEFICIENTES = [(_rng.randrange(1, _PRIMO), _rng.randrange(0, _PRIMO)) for _ in range(NUM_PERMUTACOES)]
+
+
+def normalizar_texto(valor) -> str:
+    """Forma canônica para comparação: NFKC, minúsculas, espaços colapsados,
+    sem aspas nas pontas nem pontuação final."""
+    if valor is None:
+        return ""
+    texto = unicodedata.normalize("NFKC", str(valor)).casefold()
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return texto.strip("\"'“”‘’").rstrip(".;:, ").strip()
+
+
+def hash_normalizado(linha: dict, campos) -> str:
+    """SHA-256 dos `campos` normalizados da linha."""
+    valores = (normalizar_texto(linha.get(c)) for c in campos)
+    return hashlib.sha256("\x1f".join(valores).encode("utf-8")).hexdigest()
+
+
+def _shingles(texto: str) -> set[int]:
+    t = normalizar_texto(texto)
+    if len(t) <= TAMANHO_SHINGLE:
+        return {zlib.crc32(t.encode("utf-8"))} if t else set()
+    return {zlib.crc32(t[i:i + TAMANHO_SHINGLE].encode("utf-8")) for i in range(len(t) - TAMANHO_SHINGLE + 1)}
+
+
+def assinatura_minhash(texto: str) -> tuple[int, ...] | None:
+    """Assinatura MinHash dos shingles de caracteres do texto (None se vazio)."""
+    shingles = _shingles(texto)
+    if not shingles:
+        return None
+    return tuple(min((a * x + b) % _PRIMO for x in shingles) for a, b in _COEFICIENTES)
+
+
+def similaridade(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Estimativa da similaridade de Jaccard entre duas assinaturas."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTACOES
+
+
+class IndiceDedup:
+    """Conjunto de hashes normalizados (+ LSH de assinaturas MinHash, se ativo)."""
+
+    def __init__(self, campos, usar_minhash: bool = False, limiar: float = 0.85,
+                 campo_minhash: str = "Trecho"):
+        self.campos = list(campos)
+        self.usar_minhash = usar_minhash
+        self.limiar = limiar
+        self.campo_minhash = campo_minhash
+        self._hashes: set[str] = set()
+        self._assinaturas: list[tuple[int, ...]] = []
+        self._baldes: dict[tuple, list[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _bandas(self, assinatura: tuple[int, ...]):
+        for inicio in range(0, NUM_PERMUTACOES, LINHAS_POR_BANDA):
+            yield (inicio, assinatura[inicio:inicio + LINHAS_POR_BANDA])
+
+    def _quase_duplicata(self, assinatura: tuple[int, ...]) -> bool:
+        vistos = set()
+        for banda in self._bandas(assinatura):
+            for idx in self._baldes.get(banda, ()):
+                if idx not in vistos:
+                    vistos.add(idx)
+                    if similaridade(assinatura, self._assinaturas[idx]) >= self.limiar:
+                        return True
+        return False
+
+    def adicionar_se_nova(self, linha: dict) -> bool:
+        """Registra a linha e retorna True, ou retorna False se for (quase) duplicata."""
+        chave = hash_normalizado(linha, self.campos)
+        if chave in self._hashes:
+            return False
+        assinatura = None
+        if self.usar_minhash:
+            assinatura = assinatura_minhash(linha.get(self.campo_minhash, ""))
+            if assinatura is not None and self._quase_duplicata(assinatura):
+                return False
+        self._hashes.add(chave)
+        if assinatura is not None:
+            idx = len(self._assinaturas)
+            self._assinaturas.append(assinatura)
+            for banda in self._bandas(assinatura):
+                self._baldes[banda].append(idx)
+        return True
+
+    def filtrar(self, linhas: list[dict]) -> list[dict]:
+        """Mantém só as linhas novas (inclusive contra repetições dentro do próprio lote)."""
+        return [linha for linha in linhas if self.adicionar_se_nova(linha)]
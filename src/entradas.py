@@ -0,0 +1,66 @@
+"""Armazenamento imutável dos TXT de entrada, endereçado pelo conteúdo.
+
+Cada upload é gravado uma única vez em CAMINHO_ENTRADAS/<sha256>.txt (ao lado
+do índice de páginas `<sha256>.paginas.json`). Runs guardam o hash e o total de
+páginas em `runs`, de modo que sessões concorrentes não sobrescrevem a entrada
+umas das outras, a retomada relê exatamente o arquivo original e um upload
+idêntico é reconhecido pelo hash sem reindexar o documento.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from config import CAMINHO_ENTRADAS, DELIMITADOR_PAGINA_PADRAO
+from src.leitor_txt import indice_paginas
+
+TAMANHO_LEITURA = 1 << 20  # bytes por leitura ao copiar/hashear
+
+
+def caminho_entrada(sha256: str) -> str:
+    return os.path.join(CAMINHO_ENTRADAS, f"{sha256}.txt")
+
+
+def caminho_indice(sha256: str) -> str:
+    return os.path.join(CAMINHO_ENTRADAS, f"{sha256}.paginas.json")
+
+
+def _pedacos(origem):
+    """Bytes da origem em pedaços: caminho de arquivo ou objeto bytes-like."""
+    if isinstance(origem, (str, os.PathLike)):
+        with open(origem, "rb") as f:
+            while pedaco := f.read(TAMANHO_LEITURA):
+                yield pedaco
+    else:
+        dados = memoryview(origem)
+        for ini in range(0, len(dados), TAMANHO_LEITURA):
+            yield dados[ini:ini + TAMANHO_LEITURA]
+
+
+def armazenar_entrada(origem) -> str:
+    """Grava a entrada (caminho ou bytes) em CAMINHO_ENTRADAS e retorna o sha256.
+
+    O conteúdo é copiado e hasheado numa só passada para um temporário, que só
+    vira `<sha256>.txt` se esse arquivo ainda não existir — uma entrada já
+    armazenada nunca é reescrita.
+    """
+    os.makedirs(CAMINHO_ENTRADAS, exist_ok=True)
+    h = hashlib.sha256()
+    fd, temporario = tempfile.mkstemp(dir=CAMINHO_ENTRADAS, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for pedaco in _pedacos(origem):
+                h.update(pedaco)
+                f.write(pedaco)
+        sha256 = h.hexdigest()
+        if not os.path.exists(caminho_entrada(sha256)):
+            os.replace(temporario, caminho_entrada(sha256))
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return sha256
+
+
+def contar_paginas(sha256: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> int:
+    """Páginas da entrada (0 sem o delimitador); o índice fica salvo para o chunking."""
+    return len(indice_paginas(caminho_entrada(sha256), delimitador, caminho_indice(sha256)))
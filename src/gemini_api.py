@@ -1,5 +1,10 @@
 import os
+import json
 import time
+import asyncio
+import contextvars
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
 # Importação robusta para evitar conflito de namespace 'google'
@@ -9,159 +14,810 @@ except ImportError:
     import google.genai as genai
 
 from google.genai import types
-from config import GOOGLE_API_KEY, PROMPT_PADRAO, PROMPT_RESUMIDOR, CAMINHO_LOGS, MAX_CHARS_RESUMIDOR, MAX_TOKENS_RESUMO
+from config import (
+    GOOGLE_API_KEY, PROMPT_PADRAO, PROMPT_RESUMIDOR, CAMINHO_LOGS, MAX_CHARS_RESUMIDOR, MAX_TOKENS_RESUMO,
+    CACHE_LLM_ATIVO, DELIMITADOR_PAGINA_PADRAO, RESUMO_MAPREDUCE_ACIMA_DE, MAX_CHARS_RESUMO_PARCIAL,
+    MAX_RESUMOS_PARALELOS, PROMPT_RESUMO_PARCIAL, PROMPT_REDUTOR, SAIDA_JSON_ESTRUTURADA,
+    SUBDIVIDIR_TRUNCADOS, MIN_CHARS_SUBBLOCO, MAX_PROFUNDIDADE_SUBDIVISAO, MAX_OUTPUT_TOKENS_BLOCO,
+    GEMINI_BASE_URL,
+)
+from src.leitor_txt import detectar_paginas, dividir_em_blocos, ler_amostras
+from src.planilha import COLUNAS_EVIDENCIA
+from src.limitador import limitador, classificar_erro, estimar_tokens, calibrar_estimativa, CHARS_POR_TOKEN_ESTIMADO
+from src.parser_json import ParserJSONIncremental
+from src import cache_respostas, telemetria
 
-# Inicializar cliente Gemini
-client = genai.Client(api_key=GOOGLE_API_KEY)
+# Inicializar cliente Gemini (GEMINI_BASE_URL aponta para um backend simulado, se definido)
+client = genai.Client(
+    api_key=GOOGLE_API_KEY,
+    http_options=types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None,
+)
 MODEL_ID = "gemini-2.5-flash"
 
-def enviar_bloco_para_gemini(texto_bloco: str, bloco_id: int = 0, contexto_global: str = "") -> str:
+def montar_prompt_bloco(texto_bloco: str, contexto_global: str = "") -> str:
+    """Monta o prompt final de um bloco (instruções + contexto SAC opcional + texto)."""
+    prompt_final = PROMPT_PADRAO
+    if contexto_global:
+        prompt_final += "\n\n[CONTEXTO DO PROCESSO]\n" + contexto_global + "\n[FIM DO CONTEXTO]\n\n"
+    prompt_final += texto_bloco
+    return prompt_final
+
+
+def schema_evidencias() -> types.Schema:
+    """Array de objetos com exatamente as colunas de COLUNAS_EVIDENCIA (todas string)."""
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=types.Schema(
+            type=types.Type.OBJECT,
+            properties={col: types.Schema(type=types.Type.STRING) for col in COLUNAS_EVIDENCIA},
+            required=list(COLUNAS_EVIDENCIA),
+            property_ordering=list(COLUNAS_EVIDENCIA),
+        ),
+    )
+
+
+def _config_bloco() -> types.GenerateContentConfig:
+    if SAIDA_JSON_ESTRUTURADA:
+        return types.GenerateContentConfig(
+            max_output_tokens=MAX_OUTPUT_TOKENS_BLOCO,
+            response_mime_type="application/json",
+            response_schema=schema_evidencias(),
+        )
+    return types.GenerateContentConfig(
+        max_output_tokens=MAX_OUTPUT_TOKENS_BLOCO,
+    )
+
+
+def _config_resumo() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        max_output_tokens=MAX_TOKENS_RESUMO,
+        # Desabilita "thinking" para não consumir o orçamento de saída
+        # (causa do resumo truncado em gemini-2.5-flash).
+        thinking_config=types.ThinkingConfig(thinking_budget=0),
+    )
+
+
+AMOSTRA_CALIBRACAO_CHARS = 20_000
+
+
+def calibrar_estimador_tokens(caminho: str) -> float:
+    """Razão chars/token do TXT em `caminho`, medida com count_tokens do modelo em uso.
+
+    Conta início, meio e fim do arquivo (até 3 × AMOSTRA_CALIBRACAO_CHARS,
+    lidos com seek — o documento não é carregado inteiro) em uma única
+    chamada. Best-effort: em caso de falha retorna CHARS_POR_TOKEN_ESTIMADO.
+    O chamador repassa a razão ao empacotamento e a grava na run.
     """
-    Envia um único bloco de texto para a API Gemini com Retentativa Exponencial.
+    try:
+        amostra = ler_amostras(caminho, AMOSTRA_CALIBRACAO_CHARS)
+        resultado = client.models.count_tokens(model=MODEL_ID, contents=amostra)
+        return calibrar_estimativa(len(amostra), resultado.total_tokens or 0)
+    except Exception as e:
+        logger.warning(f"⚠️ count_tokens indisponível — estimador de tokens não calibrado: {e}")
+        return CHARS_POR_TOKEN_ESTIMADO
+
+
+def _finish_reason(response):
+    candidate = response.candidates[0] if response.candidates else None
+    return candidate.finish_reason if candidate else "UNKNOWN"
+
+
+def _finalizou_normalmente(finish_reason) -> bool:
+    return str(finish_reason) in ("FinishReason.STOP", "STOP", "1")
+
+
+def _truncado_por_max_tokens(finish_reason) -> bool:
+    return str(finish_reason) in ("FinishReason.MAX_TOKENS", "MAX_TOKENS", "2")
+
+
+def _tokens_prompt(response) -> int | None:
+    uso = getattr(response, "usage_metadata", None)
+    return getattr(uso, "prompt_token_count", None) if uso else None
+
+
+def _gerar_com_retentativas(contents: str, config, rotulo: str, max_retries: int,
+                            log_tentativa, retry_delay: float = 3):
+    """Chama generate_content sob o limitador global, com backoff adaptativo.
+
+    Retorna a resposta, ou None após erro não-retriável / esgotar tentativas.
     """
-    max_retries = 5
-    retry_delay = 3
+    tokens = estimar_tokens(contents)
+    for attempt in range(max_retries):
+        log_tentativa(attempt, max_retries)
+        t_fila = time.monotonic()
+        limitador.adquirir(tokens)
+        t0, inicio = time.monotonic(), telemetria.agora_iso()
+        try:
+            response = client.models.generate_content(model=MODEL_ID, contents=contents, config=config)
+        except Exception as e:
+            erro = classificar_erro(e)
+            telemetria.registrar(rotulo, attempt + 1, inicio, time.monotonic() - t0, t0 - t_fila,
+                                 MODEL_ID, exc=e, codigo=erro.codigo)
+            limitador.liberar(sobrecarga=erro.sobrecarga, retry_after=erro.retry_after,
+                              tokens_estimados=tokens, tokens_reais=0)
+            if not erro.retriavel:
+                logger.error(f"❌ Erro na API Gemini ({rotulo}): {e}")
+                return None
+            if attempt == max_retries - 1:
+                logger.error(f"❌ Falha definitiva ({rotulo}) após {max_retries} tentativas.")
+                return None
+            wait_time = limitador.espera_retentativa(attempt, erro.retry_after, base=retry_delay)
+            logger.warning(f"⏳ API temporariamente indisponível ({erro.codigo}). Aguardando {wait_time:.1f}s...")
+            time.sleep(wait_time)
+            continue
+
+        telemetria.registrar(rotulo, attempt + 1, inicio, time.monotonic() - t0, t0 - t_fila,
+                             MODEL_ID, resposta=response)
+        limitador.liberar(tokens_estimados=tokens, tokens_reais=_tokens_prompt(response))
+        return response
+    return None
+
 
+async def _gerar_com_retentativas_async(contents: str, config, rotulo: str, max_retries: int,
+                                        log_tentativa, retry_delay: float = 3):
+    """Versão assíncrona de `_gerar_com_retentativas` (client.aio + asyncio.sleep).
+
+    A telemetria vai por `asyncio.to_thread`: um lote cheio é gravado no SQLite.
+    """
+    tokens = estimar_tokens(contents)
     for attempt in range(max_retries):
+        log_tentativa(attempt, max_retries)
+        t_fila = time.monotonic()
+        await limitador.adquirir_async(tokens)
+        t0, inicio = time.monotonic(), telemetria.agora_iso()
         try:
-            prompt_final = PROMPT_PADRAO
-            if contexto_global:
-                prompt_final += "\n\n[CONTEXTO DO PROCESSO]\n" + contexto_global + "\n[FIM DO CONTEXTO]\n\n"
-            prompt_final += texto_bloco
-            salvar_bloco_enviado(bloco_id, prompt_final)
-
-            if contexto_global:
-                logger.info(f"🚀 Enviando bloco {bloco_id} com contexto global ({len(contexto_global)} chars) (Tentativa {attempt + 1}/{max_retries} - Modelo: {MODEL_ID})...")
-            else:
-                logger.info(f"🚀 Enviando bloco {bloco_id} (Tentativa {attempt + 1}/{max_retries} - Modelo: {MODEL_ID})...")
-            
-            response = client.models.generate_content(
-                model=MODEL_ID,
-                contents=prompt_final,
-                config=types.GenerateContentConfig(
-                    max_output_tokens=32768,
-                ),
-            )
-
-            # Inspecionar finish_reason para diagnóstico de truncamentos silenciosos
-            candidate = response.candidates[0] if response.candidates else None
-            finish_reason = candidate.finish_reason if candidate else "UNKNOWN"
-            if str(finish_reason) not in ("FinishReason.STOP", "STOP", "1"):
-                logger.warning(
-                    f"⚠️ Bloco {bloco_id} encerrado com finish_reason={finish_reason}. "
-                    f"Resposta pode estar incompleta ou bloqueada."
-                )
-
-            if not response.text:
-                logger.warning(f"⚠️ Resposta vazia no bloco {bloco_id} (finish_reason={finish_reason})")
-                return ""
-
-            resposta_texto = response.text.strip()
-            salvar_resposta_em_log(bloco_id, resposta_texto)
-
-            return resposta_texto
+            response = await client.aio.models.generate_content(model=MODEL_ID, contents=contents, config=config)
+        except Exception as e:
+            erro = classificar_erro(e)
+            await asyncio.to_thread(telemetria.registrar, rotulo, attempt + 1, inicio, time.monotonic() - t0,
+                                    t0 - t_fila, MODEL_ID, exc=e, codigo=erro.codigo)
+            limitador.liberar(sobrecarga=erro.sobrecarga, retry_after=erro.retry_after,
+                              tokens_estimados=tokens, tokens_reais=0)
+            if not erro.retriavel:
+                logger.error(f"❌ Erro na API Gemini ({rotulo}): {e}")
+                return None
+            if attempt == max_retries - 1:
+                logger.error(f"❌ Falha definitiva ({rotulo}) após {max_retries} tentativas.")
+                return None
+            wait_time = limitador.espera_retentativa(attempt, erro.retry_after, base=retry_delay)
+            logger.warning(f"⏳ API temporariamente indisponível ({erro.codigo}). Aguardando {wait_time:.1f}s...")
+            await asyncio.sleep(wait_time)
+            continue
+
+        await asyncio.to_thread(telemetria.registrar, rotulo, attempt + 1, inicio, time.monotonic() - t0,
+                                t0 - t_fila, MODEL_ID, resposta=response)
+        limitador.liberar(tokens_estimados=tokens, tokens_reais=_tokens_prompt(response))
+        return response
+    return None
+
 
+def _gerar_stream_com_retentativas(contents: str, config, rotulo: str, max_retries: int,
+                                   log_tentativa, ao_receber, retry_delay: float = 3):
+    """Como `_gerar_com_retentativas`, mas via generate_content_stream.
+
+    Cada pedaço de texto é repassado a `ao_receber` assim que chega. Falhas
+    antes do primeiro pedaço são retentadas; uma queda no meio do stream não é
+    (o que já foi entregue foi consumido). Retorna (texto, finish_reason, completo).
+    """
+    tokens = estimar_tokens(contents)
+    for attempt in range(max_retries):
+        log_tentativa(attempt, max_retries)
+        t_fila = time.monotonic()
+        limitador.adquirir(tokens)
+        t0, inicio = time.monotonic(), telemetria.agora_iso()
+        partes: list[str] = []
+        finish_reason = "UNKNOWN"
+        tokens_reais = None
+        ultimo_uso = None  # usage_metadata do stream vem completa no último chunk
+        try:
+            for chunk in client.models.generate_content_stream(model=MODEL_ID, contents=contents, config=config):
+                if chunk.candidates and chunk.candidates[0].finish_reason:
+                    finish_reason = chunk.candidates[0].finish_reason
+                tokens_reais = _tokens_prompt(chunk) or tokens_reais
+                if getattr(chunk, "usage_metadata", None):
+                    ultimo_uso = chunk
+                if chunk.text:
+                    partes.append(chunk.text)
+                    ao_receber(chunk.text)
         except Exception as e:
-            error_msg = str(e).lower()
-            # 429 = cota esgotada | 503 = servidor sobrecarregado — ambos são retriáveis
-            is_retryable = (
-                "429" in error_msg or "exhausted" in error_msg or "too many requests" in error_msg
-                or "503" in error_msg or "unavailable" in error_msg or "high demand" in error_msg
-            )
-            if is_retryable:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    codigo = "429" if "429" in error_msg else "503"
-                    logger.warning(f"⏳ API temporariamente indisponível ({codigo}). Aguardando {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"❌ Falha definitiva no bloco {bloco_id} após {max_retries} tentativas.")
-            else:
-                logger.error(f"❌ Erro na API Gemini (Bloco {bloco_id}): {e}")
-                break
-    
-    return ""
-
-def salvar_resposta_em_log(bloco_id: int, conteudo: str):
+            erro = classificar_erro(e)
+            telemetria.registrar(rotulo, attempt + 1, inicio, time.monotonic() - t0, t0 - t_fila, MODEL_ID,
+                                 resposta=ultimo_uso, exc=e, codigo=erro.codigo, streaming=True)
+            limitador.liberar(sobrecarga=erro.sobrecarga, retry_after=erro.retry_after,
+                              tokens_estimados=tokens, tokens_reais=tokens_reais if partes else 0)
+            if partes:
+                logger.warning(f"⚠️ Stream interrompido ({rotulo}) após {sum(map(len, partes))} chars: {e}")
+                return "".join(partes), finish_reason, False
+            if not erro.retriavel:
+                logger.error(f"❌ Erro na API Gemini ({rotulo}): {e}")
+                return "", finish_reason, True
+            if attempt == max_retries - 1:
+                logger.error(f"❌ Falha definitiva ({rotulo}) após {max_retries} tentativas.")
+                return "", finish_reason, True
+            wait_time = limitador.espera_retentativa(attempt, erro.retry_after, base=retry_delay)
+            logger.warning(f"⏳ API temporariamente indisponível ({erro.codigo}). Aguardando {wait_time:.1f}s...")
+            time.sleep(wait_time)
+            continue
+
+        telemetria.registrar(rotulo, attempt + 1, inicio, time.monotonic() - t0, t0 - t_fila, MODEL_ID,
+                             resposta=ultimo_uso, finish_reason=finish_reason, streaming=True)
+        limitador.liberar(tokens_estimados=tokens, tokens_reais=tokens_reais)
+        return "".join(partes), finish_reason, True
+    return "", "UNKNOWN", True
+
+
+def _log_envio_bloco(bloco_id: int, contexto_global: str, attempt: int, max_retries: int,
+                     sufixo: str = "") -> None:
+    if contexto_global:
+        logger.info(f"🚀 Enviando bloco {bloco_id}{sufixo} com contexto global ({len(contexto_global)} chars) (Tentativa {attempt + 1}/{max_retries} - Modelo: {MODEL_ID})...")
+    else:
+        logger.info(f"🚀 Enviando bloco {bloco_id}{sufixo} (Tentativa {attempt + 1}/{max_retries} - Modelo: {MODEL_ID})...")
+
+
+def _avisar_finish_reason(finish_reason, rotulo: str) -> None:
+    # Inspecionar finish_reason para diagnóstico de truncamentos silenciosos
+    if not _finalizou_normalmente(finish_reason):
+        logger.warning(
+            f"⚠️ {rotulo} encerrado com finish_reason={finish_reason}. "
+            f"Resposta pode estar incompleta ou bloqueada."
+        )
+
+
+def _texto_resposta_bloco(response, bloco_id: int, sufixo: str = "") -> str:
+    """Diagnostica finish_reason, salva a resposta em log e retorna o texto ("" se vazia)."""
+    finish_reason = _finish_reason(response)
+    _avisar_finish_reason(finish_reason, f"Bloco {bloco_id}{sufixo}")
+
+    if not response.text:
+        logger.warning(f"⚠️ Resposta vazia no bloco {bloco_id}{sufixo} (finish_reason={finish_reason})")
+        return ""
+
+    resposta_texto = response.text.strip()
+    salvar_resposta_em_log(bloco_id, resposta_texto, sufixo)
+    return resposta_texto
+
+
+def _consultar_cache(prompt: str, config, usar_cache: bool) -> tuple[str | None, str | None]:
+    """Retorna (chave, resposta_em_cache); chave é None quando o cache está desligado."""
+    if not (usar_cache and CACHE_LLM_ATIVO):
+        return None, None
+    chave = cache_respostas.calcular_chave(MODEL_ID, config, prompt)
+    return chave, cache_respostas.obter(chave)
+
+
+def _guardar_no_cache(chave: str | None, response, texto: str) -> None:
+    # Só respostas completas: truncadas/bloqueadas devem ser refeitas
+    if chave and texto and _finalizou_normalmente(_finish_reason(response)):
+        cache_respostas.guardar(chave, MODEL_ID, texto)
+
+
+# ---------------------------------------------------------------------------
+# Subdivisão de blocos truncados (MAX_TOKENS)
+# ---------------------------------------------------------------------------
+
+def _dividir_ao_meio(texto: str, cortes_pagina: Sequence[int] = ()) -> list[tuple[str, list[int]]]:
+    """Divide o bloco em duas metades num limite natural próximo do meio.
+
+    `cortes_pagina` são os offsets, no texto, onde começa cada página (ver
+    `BlocosPaginados.texto_e_cortes`): com mais de uma página, o corte é a
+    divisa de páginas mais próxima do meio, e as evidências de cada metade
+    continuam atribuídas às suas páginas. Só um bloco de uma página (ou cujas
+    divisas deixariam uma metade pequena demais) cai para o fim de frase (como
+    `dividir_em_blocos`) e, por último, espaço.
+
+    Retorna [(metade, cortes_da_metade)], ou [] se alguma metade ficar abaixo
+    de MIN_CHARS_SUBBLOCO.
+    """
+    meio = len(texto) // 2
+    divisas = [c for c in cortes_pagina
+               if min(len(texto[:c].strip()), len(texto[c:].strip())) >= MIN_CHARS_SUBBLOCO]
+    if divisas:
+        corte = min(divisas, key=lambda c: abs(c - meio))
+    else:
+        corte = texto.rfind(".", 0, meio) + 1
+        if corte <= 0:
+            corte = texto.rfind(" ", 0, meio)
+        if corte <= 0:
+            corte = meio
+
+    metades = []
+    for inicio, fim in ((0, corte), (corte, len(texto))):
+        bruto = texto[inicio:fim]
+        metade = bruto.strip()
+        recuo = inicio + len(bruto) - len(bruto.lstrip())
+        metades.append((metade, [c - recuo for c in cortes_pagina if 0 < c - recuo < len(metade)]))
+    if min(len(m) for m, _ in metades) < MIN_CHARS_SUBBLOCO:
+        return []
+    return metades
+
+
+def _mesclar_respostas(partes: list[str]) -> str:
+    """Junta as respostas das metades em um único array JSON.
+
+    Respostas inválidas/truncadas contribuem com os objetos completos que
+    puderem ser recuperados.
+    """
+    objetos = []
+    for parte in partes:
+        try:
+            dados = json.loads(parte)
+        except json.JSONDecodeError:
+            dados = ParserJSONIncremental().alimentar(parte)
+        if isinstance(dados, dict):
+            dados = [dados]
+        if isinstance(dados, list):
+            objetos.extend(o for o in dados if isinstance(o, dict))
+    return json.dumps(objetos, ensure_ascii=False)
+
+
+def _pode_subdividir(subdividir: bool, finish_reason, texto_bloco: str, cortes_pagina: Sequence[int],
+                     profundidade: int, rotulo: str) -> list[tuple[str, list[int]]]:
+    """Metades (com seus cortes de página) a reenviar quando a resposta foi truncada por MAX_TOKENS.
+
+    [] se não couber subdividir.
+    """
+    if not (subdividir and _truncado_por_max_tokens(finish_reason)):
+        return []
+    if profundidade >= MAX_PROFUNDIDADE_SUBDIVISAO:
+        logger.warning(f"✂️ {rotulo}: truncado, mas atingiu a profundidade máxima de subdivisão.")
+        return []
+    metades = _dividir_ao_meio(texto_bloco, cortes_pagina)
+    if not metades:
+        logger.warning(f"✂️ {rotulo}: truncado, mas pequeno demais para subdividir.")
+        return []
+    logger.info(
+        f"✂️ {rotulo} truncado por MAX_TOKENS — reenviando em 2 partes "
+        f"({len(metades[0][0])} + {len(metades[1][0])} chars)"
+    )
+    return metades
+
+
+def _registrar_mescla(bloco_id: int, sufixo: str, chave: str | None,
+                      resultados: list) -> tuple[str, bool, bool]:
+    """Mescla as respostas das partes em (resposta, integra, parcial).
+
+    Parte sem resposta (erro da API ou resposta vazia) não descarta as demais:
+    o bloco fica parcial, com as evidências das partes boas, e sem cache para
+    ser refeito na retomada (as partes boas já estão no cache). Sem nenhuma
+    parte respondida, retorna ("", False, False).
+    """
+    boas = [r for r in resultados if r[0]]
+    if not boas:
+        logger.error(f"❌ Bloco {bloco_id}{sufixo}: nenhuma parte da subdivisão respondeu — bloco descartado.")
+        return "", False, False
+    parcial = len(boas) < len(resultados) or any(p for _, _, p in boas)
+    if parcial:
+        logger.warning(f"⚠️ Bloco {bloco_id}{sufixo}: parte da subdivisão sem resposta — "
+                       f"mantidas as evidências das demais partes (bloco parcial).")
+    mesclado = _mesclar_respostas([texto for texto, _, _ in boas])
+    integra = not parcial and all(ok for _, ok, _ in resultados)
+    salvar_resposta_em_log(bloco_id, mesclado, sufixo)
+    # A resposta mesclada vale para o prompt original: evita repetir a chamada truncada
+    if chave and integra:
+        cache_respostas.guardar(chave, MODEL_ID, mesclado)
+    return mesclado, integra, parcial
+
+
+def _enviar_bloco_adaptativo(texto_bloco: str, bloco_id: int, contexto_global: str, usar_cache: bool,
+                             subdividir: bool, cortes_pagina: Sequence[int], sufixo: str = "",
+                             profundidade: int = 0) -> tuple[str, bool, bool]:
+    """Envia o bloco e, se truncado por MAX_TOKENS, reenvia as metades em paralelo.
+
+    Retorna (resposta, integra, parcial); integra=False se alguma parte ficou
+    truncada, parcial=True se alguma metade falhou (a resposta traz só as
+    evidências das demais). Se a chamada falhar, retorna ("", False, False).
+    """
+    prompt_final = montar_prompt_bloco(texto_bloco, contexto_global)
+    salvar_bloco_enviado(bloco_id, prompt_final, sufixo)
+    config = _config_bloco()
+
+    chave, em_cache = _consultar_cache(prompt_final, config, usar_cache)
+    if em_cache is not None:
+        logger.info(f"💾 Bloco {bloco_id}{sufixo}: resposta reaproveitada do cache")
+        salvar_resposta_em_log(bloco_id, em_cache, sufixo)
+        return em_cache, True, False
+
+    response = _gerar_com_retentativas(
+        prompt_final, config, f"Bloco {bloco_id}{sufixo}", max_retries=5,
+        log_tentativa=lambda a, n: _log_envio_bloco(bloco_id, contexto_global, a, n, sufixo),
+    )
+    if response is None:
+        return "", False, False
+    texto = _texto_resposta_bloco(response, bloco_id, sufixo)
+    finish_reason = _finish_reason(response)
+
+    metades = _pode_subdividir(subdividir, finish_reason, texto_bloco, cortes_pagina,
+                               profundidade, f"Bloco {bloco_id}{sufixo}")
+    if metades:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="subbloco") as pool:
+            futuros = [
+                pool.submit(contextvars.copy_context().run, _enviar_bloco_adaptativo,
+                            metade, bloco_id, contexto_global, usar_cache,
+                            subdividir, cortes, f"{sufixo}_{k + 1}", profundidade + 1)
+                for k, (metade, cortes) in enumerate(metades)
+            ]
+            resultados = [f.result() for f in futuros]
+        return _registrar_mescla(bloco_id, sufixo, chave, resultados)
+
+    _guardar_no_cache(chave, response, texto)
+    return texto, not _truncado_por_max_tokens(finish_reason), False
+
+
+async def _enviar_bloco_adaptativo_async(texto_bloco: str, bloco_id: int, contexto_global: str,
+                                         usar_cache: bool, subdividir: bool, cortes_pagina: Sequence[int],
+                                         sufixo: str = "", profundidade: int = 0) -> tuple[str, bool, bool]:
+    """Versão assíncrona de `_enviar_bloco_adaptativo` (metades via asyncio.gather).
+
+    Logs em arquivo e cache (SQLite) rodam em `asyncio.to_thread`, sem travar
+    os demais blocos em voo no event loop.
+    """
+    prompt_final = montar_prompt_bloco(texto_bloco, contexto_global)
+    await asyncio.to_thread(salvar_bloco_enviado, bloco_id, prompt_final, sufixo)
+    config = _config_bloco()
+
+    chave, em_cache = await asyncio.to_thread(_consultar_cache, prompt_final, config, usar_cache)
+    if em_cache is not None:
+        logger.info(f"💾 Bloco {bloco_id}{sufixo}: resposta reaproveitada do cache")
+        await asyncio.to_thread(salvar_resposta_em_log, bloco_id, em_cache, sufixo)
+        return em_cache, True, False
+
+    response = await _gerar_com_retentativas_async(
+        prompt_final, config, f"Bloco {bloco_id}{sufixo}", max_retries=5,
+        log_tentativa=lambda a, n: _log_envio_bloco(bloco_id, contexto_global, a, n, sufixo),
+    )
+    if response is None:
+        return "", False, False
+    texto = await asyncio.to_thread(_texto_resposta_bloco, response, bloco_id, sufixo)
+    finish_reason = _finish_reason(response)
+
+    metades = _pode_subdividir(subdividir, finish_reason, texto_bloco, cortes_pagina,
+                               profundidade, f"Bloco {bloco_id}{sufixo}")
+    if metades:
+        resultados = await asyncio.gather(*(
+            _enviar_bloco_adaptativo_async(metade, bloco_id, contexto_global, usar_cache,
+                                           subdividir, cortes, f"{sufixo}_{k + 1}", profundidade + 1)
+            for k, (metade, cortes) in enumerate(metades)
+        ))
+        return await asyncio.to_thread(_registrar_mescla, bloco_id, sufixo, chave, resultados)
+
+    await asyncio.to_thread(_guardar_no_cache, chave, response, texto)
+    return texto, not _truncado_por_max_tokens(finish_reason), False
+
+
+# ---------------------------------------------------------------------------
+# API pública de blocos
+# ---------------------------------------------------------------------------
+
+def enviar_bloco_para_gemini(texto_bloco: str, bloco_id: int = 0, contexto_global: str = "",
+                             usar_cache: bool = True, subdividir: bool = SUBDIVIDIR_TRUNCADOS,
+                             cortes_pagina: Sequence[int] = (), ao_parcial=None) -> str:
+    """
+    Envia um único bloco de texto para a API Gemini com Retentativa Exponencial.
+
+    Se `usar_cache` (e CACHE_LLM_ATIVO), um prompt idêntico já respondido é
+    servido do cache local sem nova chamada à API.
+
+    Com `subdividir`, uma resposta truncada por MAX_TOKENS é descartada e o
+    bloco é reenviado em metades (em paralelo, recursivamente), cortadas na
+    divisa de páginas mais próxima do meio quando `cortes_pagina` (offsets de
+    início das páginas no texto) indica mais de uma página; as evidências
+    das partes voltam mescladas em um único array JSON, como se fossem do bloco
+    original. Se alguma parte ficar sem resposta, a resposta traz as evidências
+    das demais e `ao_parcial()` é chamado (o bloco é registrado como parcial e
+    refeito na retomada); se nenhuma responder, retorna "".
+    """
+    with telemetria.contexto(bloco_id=bloco_id):
+        texto, _, parcial = _enviar_bloco_adaptativo(texto_bloco, bloco_id, contexto_global, usar_cache,
+                                                     subdividir, cortes_pagina)
+    if parcial and ao_parcial:
+        ao_parcial()
+    return texto
+
+
+def enviar_bloco_para_gemini_stream(texto_bloco: str, bloco_id: int = 0, contexto_global: str = "",
+                                    usar_cache: bool = True, ao_receber=None,
+                                    subdividir: bool = SUBDIVIDIR_TRUNCADOS,
+                                    cortes_pagina: Sequence[int] = (),
+                                    ao_subdividir=None, ao_parcial=None) -> tuple[str, bool]:
+    """Variante em streaming de `enviar_bloco_para_gemini`.
+
+    `ao_receber(trecho)` é chamado a cada pedaço de texto recebido (uma única
+    vez com a resposta inteira em caso de cache). Retorna (resposta, completo);
+    completo=False indica que a conexão caiu no meio da geração.
+
+    Se o stream terminar por MAX_TOKENS (e `subdividir`), as metades são
+    reenviadas sem streaming e o array mesclado é entregue a
+    `ao_subdividir(resposta)` — o texto truncado já repassado a `ao_receber`
+    não pode ser completado. Se alguma metade falhar, as demais são entregues
+    e `ao_parcial()` é chamado; se nenhuma responder, retorna ("", False).
+    """
+    with telemetria.contexto(bloco_id=bloco_id):
+        return _enviar_bloco_stream(texto_bloco, bloco_id, contexto_global, usar_cache,
+                                    ao_receber, subdividir, cortes_pagina, ao_subdividir, ao_parcial)
+
+
+def _enviar_bloco_stream(texto_bloco: str, bloco_id: int, contexto_global: str, usar_cache: bool,
+                         ao_receber, subdividir: bool, cortes_pagina: Sequence[int], ao_subdividir,
+                         ao_parcial=None) -> tuple[str, bool]:
+    ao_receber = ao_receber or (lambda trecho: None)
+    prompt_final = montar_prompt_bloco(texto_bloco, contexto_global)
+    salvar_bloco_enviado(bloco_id, prompt_final)
+    config = _config_bloco()
+
+    chave, em_cache = _consultar_cache(prompt_final, config, usar_cache)
+    if em_cache is not None:
+        logger.info(f"💾 Bloco {bloco_id}: resposta reaproveitada do cache")
+        salvar_resposta_em_log(bloco_id, em_cache)
+        ao_receber(em_cache)
+        return em_cache, True
+
+    texto, finish_reason, completo = _gerar_stream_com_retentativas(
+        prompt_final, config, f"Bloco {bloco_id}", max_retries=5,
+        log_tentativa=lambda a, n: _log_envio_bloco(bloco_id, contexto_global, a, n),
+        ao_receber=ao_receber,
+    )
+    texto = texto.strip()
+    _avisar_finish_reason(finish_reason, f"Bloco {bloco_id}")
+    if texto:
+        salvar_resposta_em_log(bloco_id, texto)
+        if completo and chave and _finalizou_normalmente(finish_reason):
+            cache_respostas.guardar(chave, MODEL_ID, texto)
+
+    metades = _pode_subdividir(subdividir and ao_subdividir is not None, finish_reason,
+                               texto_bloco, cortes_pagina, 0, f"Bloco {bloco_id}") if completo else []
+    if metades:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="subbloco") as pool:
+            futuros = [
+                pool.submit(contextvars.copy_context().run, _enviar_bloco_adaptativo,
+                            metade, bloco_id, contexto_global, usar_cache,
+                            subdividir, cortes, f"_{k + 1}", 1)
+                for k, (metade, cortes) in enumerate(metades)
+            ]
+            resultados = [f.result() for f in futuros]
+        texto, _, parcial = _registrar_mescla(bloco_id, "", chave, resultados)
+        if not texto:
+            return "", False  # bloco fica como ERRO_LLM, preservando o que o stream já gravou
+        ao_subdividir(texto)
+        if parcial and ao_parcial:
+            ao_parcial()
+    return texto, completo
+
+
+async def enviar_bloco_para_gemini_async(texto_bloco: str, bloco_id: int = 0, contexto_global: str = "",
+                                         usar_cache: bool = True, subdividir: bool = SUBDIVIDIR_TRUNCADOS,
+                                         cortes_pagina: Sequence[int] = (), ao_parcial=None) -> str:
+    """Variante assíncrona de `enviar_bloco_para_gemini` sobre `client.aio`.
+
+    O backoff usa `asyncio.sleep`, liberando o event loop para os demais blocos.
+    """
+    with telemetria.contexto(bloco_id=bloco_id):
+        texto, _, parcial = await _enviar_bloco_adaptativo_async(
+            texto_bloco, bloco_id, contexto_global, usar_cache, subdividir, cortes_pagina,
+        )
+    if parcial and ao_parcial:
+        ao_parcial()
+    return texto
+
+def salvar_resposta_em_log(bloco_id: int, conteudo: str, sufixo: str = ""):
     os.makedirs(CAMINHO_LOGS, exist_ok=True)
-    nome_arquivo = os.path.join(CAMINHO_LOGS, f"resposta_bloco_{bloco_id:03}.txt")
+    nome_arquivo = os.path.join(CAMINHO_LOGS, f"resposta_bloco_{bloco_id:03}{sufixo}.txt")
     with open(nome_arquivo, "w", encoding="utf-8") as f:
         f.write(conteudo)
 
-def salvar_bloco_enviado(bloco_id: int, texto_bloco: str):
+def salvar_bloco_enviado(bloco_id: int, texto_bloco: str, sufixo: str = ""):
     os.makedirs(CAMINHO_LOGS, exist_ok=True)
-    caminho = os.path.join(CAMINHO_LOGS, f"bloco_enviado_{bloco_id:03}.txt")
+    caminho = os.path.join(CAMINHO_LOGS, f"bloco_enviado_{bloco_id:03}{sufixo}.txt")
     with open(caminho, "w", encoding="utf-8") as f:
         f.write(texto_bloco)
 
-def gerar_resumo_processo(texto_completo: str) -> str:
-    """T14: Agente 1 — gera resumo estruturado do processo completo."""
-    if not texto_completo:
-        return ""
-
+def _preparar_texto_resumo(texto_completo: str) -> str:
     # Truncagem se necessário
     if len(texto_completo) > MAX_CHARS_RESUMIDOR:
         logger.warning(f"⚠️ Texto do processo muito grande ({len(texto_completo):,} chars) — truncando para {MAX_CHARS_RESUMIDOR:,}")
         texto_completo = texto_completo[:MAX_CHARS_RESUMIDOR]
+    return texto_completo
 
-    max_retries = 3
-    retry_delay = 3
 
-    for attempt in range(max_retries):
-        try:
-            logger.info(f"🔍 Gerando resumo do processo (Tentativa {attempt + 1}/{max_retries})...")
-            inicio = time.time()
-
-            response = client.models.generate_content(
-                model=MODEL_ID,
-                contents=PROMPT_RESUMIDOR + "\n\n" + texto_completo,
-                config=types.GenerateContentConfig(
-                    max_output_tokens=MAX_TOKENS_RESUMO,
-                    # Desabilita "thinking" para não consumir o orçamento de saída
-                    # (causa do resumo truncado em gemini-2.5-flash).
-                    thinking_config=types.ThinkingConfig(thinking_budget=0),
-                ),
-            )
-
-            duracao = time.time() - inicio
-
-            # Diagnóstico de truncamento (finish_reason != STOP indica corte)
-            candidate = response.candidates[0] if response.candidates else None
-            finish_reason = candidate.finish_reason if candidate else "UNKNOWN"
-            if str(finish_reason) not in ("FinishReason.STOP", "STOP", "1"):
-                logger.warning(f"⚠️ Resumo encerrado com finish_reason={finish_reason} — pode estar incompleto.")
-
-            if not response.text:
-                logger.warning("⚠️ Resumo vazio")
-                return ""
-
-            resumo = response.text.strip()
-
-            # Salvar em auditoria
-            os.makedirs(CAMINHO_LOGS, exist_ok=True)
-            with open(os.path.join(CAMINHO_LOGS, "resumo_processo.txt"), "w", encoding="utf-8") as f:
-                f.write(resumo)
-
-            logger.success(f"✅ Resumo gerado em {duracao:.1f}s ({len(resumo)} chars)")
-            return resumo
+def _texto_resposta_resumo(response, duracao: float) -> str:
+    # Diagnóstico de truncamento (finish_reason != STOP indica corte)
+    finish_reason = _finish_reason(response)
+    if not _finalizou_normalmente(finish_reason):
+        logger.warning(f"⚠️ Resumo encerrado com finish_reason={finish_reason} — pode estar incompleto.")
 
-        except Exception as e:
-            error_msg = str(e).lower()
-            is_retryable = (
-                "429" in error_msg or "exhausted" in error_msg or "too many requests" in error_msg
-                or "503" in error_msg or "unavailable" in error_msg or "high demand" in error_msg
-            )
-            if is_retryable:
-                if attempt < max_retries - 1:
-                    wait_time = retry_delay * (2 ** attempt)
-                    logger.warning(f"⏳ API indisponível. Aguardando {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    logger.error(f"❌ Falha ao gerar resumo após {max_retries} tentativas — SAC desativado")
-            else:
-                logger.error(f"❌ Erro ao gerar resumo: {e} — SAC desativado")
-            break
-
-    return ""
+    if not response.text:
+        logger.warning("⚠️ Resumo vazio")
+        return ""
+
+    resumo = response.text.strip()
+
+    # Salvar em auditoria
+    os.makedirs(CAMINHO_LOGS, exist_ok=True)
+    with open(os.path.join(CAMINHO_LOGS, "resumo_processo.txt"), "w", encoding="utf-8") as f:
+        f.write(resumo)
+
+    logger.success(f"✅ Resumo gerado em {duracao:.1f}s ({len(resumo)} chars)")
+    return resumo
+
+
+def _log_tentativa_resumo(attempt: int, max_retries: int) -> None:
+    logger.info(f"🔍 Gerando resumo do processo (Tentativa {attempt + 1}/{max_retries})...")
+
+
+def _dividir_para_resumo(texto: str, delimitador: str) -> list[str]:
+    """Agrupa páginas consecutivas em trechos de até MAX_CHARS_RESUMO_PARCIAL chars.
+
+    Cada trecho recebe o rótulo da faixa de páginas e preserva os delimitadores
+    originais (referências [fls.]). Sem delimitador, divide por caracteres.
+    """
+    paginas = detectar_paginas(texto, delimitador)
+    if not paginas:
+        return dividir_em_blocos(texto, tamanho=MAX_CHARS_RESUMO_PARCIAL)
+
+    trechos = []
+    grupo, tamanho = [], 0
+
+    def _fechar():
+        if grupo:
+            faixa = f"[Páginas {grupo[0][0]}–{grupo[-1][0]}]\n"
+            trechos.append(faixa + "".join(delimitador + parte for _, parte in grupo))
+
+    for num, parte in paginas:
+        if grupo and tamanho + len(parte) > MAX_CHARS_RESUMO_PARCIAL:
+            _fechar()
+            grupo, tamanho = [], 0
+        if len(parte) > MAX_CHARS_RESUMO_PARCIAL:
+            # Página anômala (OCR sem quebras): fatia por caracteres
+            trechos.extend(f"[Página {num}]\n" + t for t in dividir_em_blocos(parte, tamanho=MAX_CHARS_RESUMO_PARCIAL))
+            continue
+        grupo.append((num, parte))
+        tamanho += len(parte)
+    _fechar()
+    return trechos
+
+
+def _prompt_reducao(parciais: list[str]) -> str:
+    validos = [(k, p) for k, p in enumerate(parciais) if p]
+    if len(validos) < len(parciais):
+        logger.warning(
+            f"⚠️ {len(parciais) - len(validos)} de {len(parciais)} trecho(s) sem resumo parcial "
+            f"— o resumo final pode omitir essas páginas."
+        )
+    if not validos:
+        return ""
+    combinado = "\n\n".join(f"[RESUMO PARCIAL {k + 1}/{len(parciais)}]\n{p}" for k, p in validos)
+    return PROMPT_REDUTOR + "\n\n" + _preparar_texto_resumo(combinado)
+
+
+def _texto_resumo_parcial(response, chave, k: int) -> str:
+    if response is None or not response.text:
+        logger.warning(f"⚠️ Resumo parcial {k + 1} vazio")
+        return ""
+    texto = response.text.strip()
+    _guardar_no_cache(chave, response, texto)
+    return texto
+
+
+def _resumir_trecho(k: int, total: int, trecho: str, usar_cache: bool) -> str:
+    """Fase map: resumo parcial de um grupo de páginas."""
+    prompt = PROMPT_RESUMO_PARCIAL + "\n\n" + trecho
+    config = _config_resumo()
+    chave, em_cache = _consultar_cache(prompt, config, usar_cache)
+    if em_cache is not None:
+        return em_cache
+    response = _gerar_com_retentativas(
+        prompt, config, f"Resumo parcial {k + 1}/{total}", max_retries=3,
+        log_tentativa=lambda a, n: logger.info(f"🔍 Resumo parcial {k + 1}/{total} (Tentativa {a + 1}/{n})..."),
+    )
+    return _texto_resumo_parcial(response, chave, k)
+
+
+async def _resumir_trecho_async(k: int, total: int, trecho: str, usar_cache: bool) -> str:
+    prompt = PROMPT_RESUMO_PARCIAL + "\n\n" + trecho
+    config = _config_resumo()
+    chave, em_cache = await asyncio.to_thread(_consultar_cache, prompt, config, usar_cache)
+    if em_cache is not None:
+        return em_cache
+    response = await _gerar_com_retentativas_async(
+        prompt, config, f"Resumo parcial {k + 1}/{total}", max_retries=3,
+        log_tentativa=lambda a, n: logger.info(f"🔍 Resumo parcial {k + 1}/{total} (Tentativa {a + 1}/{n})..."),
+    )
+    return await asyncio.to_thread(_texto_resumo_parcial, response, chave, k)
+
+
+def _gerar_resumo_final(prompt: str, usar_cache: bool) -> str:
+    """Chamada única do resumidor (ou redutor) com cache, retentativas e log de auditoria."""
+    config = _config_resumo()
+
+    chave, em_cache = _consultar_cache(prompt, config, usar_cache)
+    if em_cache is not None:
+        logger.success(f"💾 Resumo reaproveitado do cache ({len(em_cache)} chars)")
+        return em_cache
+
+    inicio = time.time()
+    response = _gerar_com_retentativas(
+        prompt, config, "Resumo", max_retries=3, log_tentativa=_log_tentativa_resumo,
+    )
+    if response is None:
+        logger.error("❌ Falha ao gerar resumo — SAC desativado")
+        return ""
+    resumo = _texto_resposta_resumo(response, time.time() - inicio)
+    _guardar_no_cache(chave, response, resumo)
+    return resumo
+
+
+async def _gerar_resumo_final_async(prompt: str, usar_cache: bool) -> str:
+    config = _config_resumo()
+
+    chave, em_cache = await asyncio.to_thread(_consultar_cache, prompt, config, usar_cache)
+    if em_cache is not None:
+        logger.success(f"💾 Resumo reaproveitado do cache ({len(em_cache)} chars)")
+        return em_cache
+
+    inicio = time.time()
+    response = await _gerar_com_retentativas_async(
+        prompt, config, "Resumo", max_retries=3, log_tentativa=_log_tentativa_resumo,
+    )
+    if response is None:
+        logger.error("❌ Falha ao gerar resumo — SAC desativado")
+        return ""
+    resumo = await asyncio.to_thread(_texto_resposta_resumo, response, time.time() - inicio)
+    await asyncio.to_thread(_guardar_no_cache, chave, response, resumo)
+    return resumo
+
+
+def gerar_resumo_processo(texto_completo: str, usar_cache: bool = True,
+                          delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> str:
+    """T14: Agente 1 — gera resumo estruturado do processo completo.
+
+    Acima de RESUMO_MAPREDUCE_ACIMA_DE chars usa o modo hierárquico: resume
+    grupos de páginas em paralelo e consolida os parciais no formato de
+    PROMPT_RESUMIDOR, cobrindo o documento inteiro.
+    """
+    if not texto_completo:
+        return ""
+
+    if len(texto_completo) <= RESUMO_MAPREDUCE_ACIMA_DE:
+        return _gerar_resumo_final(PROMPT_RESUMIDOR + "\n\n" + _preparar_texto_resumo(texto_completo), usar_cache)
+
+    trechos = _dividir_para_resumo(texto_completo, delimitador)
+    logger.info(f"🧩 Resumo hierárquico: {len(texto_completo):,} chars → {len(trechos)} trecho(s)")
+    with ThreadPoolExecutor(max_workers=MAX_RESUMOS_PARALELOS, thread_name_prefix="resumo") as pool:
+        futuros = [
+            pool.submit(contextvars.copy_context().run, _resumir_trecho, k, len(trechos), trecho, usar_cache)
+            for k, trecho in enumerate(trechos)
+        ]
+        parciais = [f.result() for f in futuros]
+
+    prompt = _prompt_reducao(parciais)
+    if not prompt:
+        logger.error("❌ Nenhum resumo parcial gerado — SAC desativado")
+        return ""
+    return _gerar_resumo_final(prompt, usar_cache)
+
+
+async def gerar_resumo_processo_async(texto_completo: str, usar_cache: bool = True,
+                                      delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> str:
+    """Variante assíncrona de `gerar_resumo_processo` sobre `client.aio`."""
+    if not texto_completo:
+        return ""
+
+    if len(texto_completo) <= RESUMO_MAPREDUCE_ACIMA_DE:
+        return await _gerar_resumo_final_async(
+            PROMPT_RESUMIDOR + "\n\n" + _preparar_texto_resumo(texto_completo), usar_cache
+        )
+
+    trechos = _dividir_para_resumo(texto_completo, delimitador)
+    logger.info(f"🧩 Resumo hierárquico: {len(texto_completo):,} chars → {len(trechos)} trecho(s)")
+    semaforo = asyncio.Semaphore(MAX_RESUMOS_PARALELOS)
+
+    async def _limitado(k: int, trecho: str) -> str:
+        async with semaforo:
+            return await _resumir_trecho_async(k, len(trechos), trecho, usar_cache)
+
+    parciais = await asyncio.gather(*(_limitado(k, t) for k, t in enumerate(trechos)))
+
+    prompt = _prompt_reducao(list(parciais))
+    if not prompt:
+        logger.error("❌ Nenhum resumo parcial gerado — SAC desativado")
+        return ""
+    return await _gerar_resumo_final_async(prompt, usar_cache)
@@ -0,0 +1,397 @@
+"""
+Backend Gemini simulado para testes de carga offline (sem chave nem rede).
+
+Dois modos, com o mesmo `BackendFake` por trás:
+    - em processo: `ClienteFake` imita `genai.Client` (models / aio.models) e é
+      instalado no lugar de `gemini_api.client` com `cliente_instalado(...)`;
+    - HTTP: `ServidorFake` responde aos endpoints REST generateContent,
+      streamGenerateContent (SSE) e countTokens; o cliente real do SDK aponta
+      para ele via GEMINI_BASE_URL (ou `cliente_http(url)`).
+
+Uso standalone:
+    python -m src.gemini_fake --porta 8089 --cenario instavel
+    GEMINI_BASE_URL=http://127.0.0.1:8089 streamlit run app.py
+
+O `CenarioFake` controla a distribuição de latência (lognormal), 429/503
+avulsos e em rajadas (com RetryInfo), respostas truncadas por MAX_TOKENS e
+JSON malformado. Prompts de bloco (com PROMPT_PADRAO) recebem um array de
+evidências; os demais (resumo SAC) recebem texto livre.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from loguru import logger
+from google.genai import errors, types
+
+from config import PROMPT_PADRAO
+
+CHARS_POR_TOKEN_FAKE = 4
+
+
+@dataclass
+class CenarioFake:
+    latencia_mediana_s: float = 1.0
+    latencia_sigma: float = 0.5         # desvio do log da latência (cauda da distribuição)
+    taxa_429: float = 0.0               # probabilidade de 429 avulso por chamada
+    taxa_503: float = 0.0
+    prob_rajada: float = 0.0            # chance de cada chamada abrir uma rajada de erros
+    duracao_rajada_s: float = 5.0       # durante a rajada todas as chamadas falham
+    codigo_rajada: int = 429
+    retry_after_s: float = 1.0          # retryDelay devolvido nos 429/503
+    taxa_max_tokens: float = 0.0        # resposta cortada ao meio, finish_reason=MAX_TOKENS
+    taxa_json_malformado: float = 0.0   # JSON inválido com finish_reason=STOP
+    evidencias_por_bloco: int = 3
+    pedacos_stream: int = 4
+    semente: Optional[int] = None
+
+
+CENARIOS = {
+    "ideal": CenarioFake(latencia_mediana_s=0.05, latencia_sigma=0.2),
+    "realista": CenarioFake(latencia_mediana_s=1.5, latencia_sigma=0.6, taxa_429=0.02, taxa_503=0.01,
+                            taxa_max_tokens=0.02, taxa_json_malformado=0.01),
+    "instavel": CenarioFake(latencia_mediana_s=2.0, latencia_sigma=0.9, taxa_429=0.05, taxa_503=0.03,
+                            prob_rajada=0.01, duracao_rajada_s=10.0, taxa_max_tokens=0.05,
+                            taxa_json_malformado=0.03),
+}
+
+
+@dataclass
+class RespostaFake:
+    codigo: int                  # 200 ou código HTTP do erro
+    latencia_s: float
+    texto: str = ""
+    finish_reason: str = "STOP"
+    tokens_prompt: int = 0
+    tokens_saida: int = 0
+
+    def erro_json(self, retry_after_s: float) -> dict:
+        status = "RESOURCE_EXHAUSTED" if self.codigo == 429 else "UNAVAILABLE"
+        return {"error": {
+            "code": self.codigo,
+            "message": f"Erro simulado pelo backend fake ({self.codigo})",
+            "status": status,
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                         "retryDelay": f"{retry_after_s}s"}],
+        }}
+
+
+class BackendFake:
+    """Decide o desfecho de cada chamada conforme o cenário. Seguro entre threads."""
+
+    def __init__(self, cenario: Optional[CenarioFake] = None):
+        self.cenario = cenario or CenarioFake()
+        self._rng = random.Random(self.cenario.semente)
+        self._lock = threading.Lock()
+        self._rajada_ate = 0.0
+        self.contadores: Counter = Counter()
+
+    def _sortear(self) -> tuple[int, str, float]:
+        """(código, variante, latência) sob o lock — o Random não é thread-safe."""
+        c = self.cenario
+        with self._lock:
+            agora = time.monotonic()
+            latencia = c.latencia_mediana_s * self._rng.lognormvariate(0, c.latencia_sigma)
+            sorteio = self._rng.random()
+            if agora < self._rajada_ate:
+                return c.codigo_rajada, "rajada", latencia * 0.05
+            if self._rng.random() < c.prob_rajada:
+                self._rajada_ate = agora + c.duracao_rajada_s
+                logger.debug(f"🧪 Backend fake: rajada de {c.codigo_rajada} por {c.duracao_rajada_s}s")
+                return c.codigo_rajada, "rajada", latencia * 0.05
+            limites = [(429, c.taxa_429), (503, c.taxa_503)]
+            acumulado = 0.0
+            for codigo, taxa in limites:
+                acumulado += taxa
+                if sorteio < acumulado:
+                    return codigo, str(codigo), latencia * 0.05
+            sorteio = self._rng.random()
+            if sorteio < c.taxa_max_tokens:
+                return 200, "max_tokens", latencia
+            if sorteio < c.taxa_max_tokens + c.taxa_json_malformado:
+                return 200, "json_malformado", latencia
+            return 200, "ok", latencia
+
+    def responder(self, prompt: str) -> RespostaFake:
+        codigo, variante, latencia = self._sortear()
+        with self._lock:
+            self.contadores["requisicoes"] += 1
+            self.contadores[variante] += 1
+        tokens_prompt = len(prompt) // CHARS_POR_TOKEN_FAKE + 1
+        if codigo != 200:
+            return RespostaFake(codigo, latencia, tokens_prompt=tokens_prompt)
+
+        texto = _texto_para(prompt, self.cenario.evidencias_por_bloco)
+        finish_reason = "STOP"
+        if variante == "max_tokens":
+            texto, finish_reason = texto[:len(texto) // 2], "MAX_TOKENS"
+        elif variante == "json_malformado":
+            texto = texto.replace('": "', '": ', 1).rstrip("]") + ",\n"
+        return RespostaFake(200, latencia, texto, finish_reason, tokens_prompt,
+                            len(texto) // CHARS_POR_TOKEN_FAKE + 1)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return dict(self.contadores)
+
+
+def _texto_para(prompt: str, quantidade: int) -> str:
+    """Array de evidências derivado do próprio bloco (trechos distintos entre blocos)."""
+    if PROMPT_PADRAO not in prompt:
+        return f"Resumo simulado do processo ({len(prompt)} caracteres analisados)."
+    texto = prompt.split(PROMPT_PADRAO, 1)[1].split("[FIM DO CONTEXTO]")[-1].strip()
+    folhas = re.findall(r"fls\.\s*(\d+)", texto) or ["1"]
+    passo = max(1, len(texto) // max(1, quantidade))
+    evidencias = [
+        {
+            "Tipo de Evidência": "Documento",
+            "Trecho": texto[k * passo:k * passo + 160].strip(),
+            "Conteúdo": "Conteúdo simulado",
+            "Resumo": "Evidência gerada pelo backend fake",
+            "Referência": f"fls. {folhas[min(k * len(folhas) // max(1, quantidade), len(folhas) - 1)]}",
+        }
+        for k in range(quantidade)
+    ]
+    return json.dumps(evidencias, ensure_ascii=False, indent=1)
+
+
+def _texto_do_contents(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, list):
+        return "".join(_texto_do_contents(c) for c in contents)
+    if isinstance(contents, dict):
+        return "".join(p.get("text", "") for p in contents.get("parts", []))
+    return str(contents)
+
+
+def _pedacos(texto: str, n: int) -> list[str]:
+    n = max(1, n)
+    tamanho = max(1, -(-len(texto) // n))
+    return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)] or [""]
+
+
+def _resposta_json(texto: str, finish_reason: Optional[str], tokens_prompt: int, tokens_saida: int) -> dict:
+    """Corpo REST (camelCase) de uma resposta ou de um chunk de stream."""
+    candidato = {"content": {"parts": [{"text": texto}], "role": "model"}, "index": 0}
+    if finish_reason:
+        candidato["finishReason"] = finish_reason
+    corpo = {"candidates": [candidato], "modelVersion": "fake"}
+    if finish_reason:
+        corpo["usageMetadata"] = {"promptTokenCount": tokens_prompt, "candidatesTokenCount": tokens_saida,
+                                  "totalTokenCount": tokens_prompt + tokens_saida}
+    return corpo
+
+
+def _resposta_genai(texto: str, finish_reason: Optional[str], tokens_prompt: int,
+                    tokens_saida: int) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse._from_response(
+        response=_resposta_json(texto, finish_reason, tokens_prompt, tokens_saida), kwargs={},
+    )
+
+
+# ---------------------------------------------------------------------------
+# Modo em processo
+# ---------------------------------------------------------------------------
+
+class _ModelosFake:
+    def __init__(self, backend: BackendFake):
+        self._backend = backend
+
+    def _erro(self, r: RespostaFake) -> errors.APIError:
+        classe = errors.ClientError if r.codigo < 500 else errors.ServerError
+        return classe(r.codigo, r.erro_json(self._backend.cenario.retry_after_s))
+
+    def generate_content(self, model: str, contents, config=None):
+        r = self._backend.responder(_texto_do_contents(contents))
+        time.sleep(r.latencia_s)
+        if r.codigo != 200:
+            raise self._erro(r)
+        return _resposta_genai(r.texto, r.finish_reason, r.tokens_prompt, r.tokens_saida)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        r = self._backend.responder(_texto_do_contents(contents))
+        if r.codigo != 200:
+            time.sleep(r.latencia_s)
+            raise self._erro(r)
+        pedacos = _pedacos(r.texto, self._backend.cenario.pedacos_stream)
+        for i, pedaco in enumerate(pedacos):
+            time.sleep(r.latencia_s / len(pedacos))
+            ultimo = i == len(pedacos) - 1
+            yield _resposta_genai(pedaco, r.finish_reason if ultimo else None, r.tokens_prompt, r.tokens_saida)
+
+    def count_tokens(self, model: str, contents, config=None):
+        return types.CountTokensResponse(total_tokens=len(_texto_do_contents(contents)) // CHARS_POR_TOKEN_FAKE)
+
+
+class _ModelosFakeAsync(_ModelosFake):
+    async def generate_content(self, model: str, contents, config=None):
+        r = self._backend.responder(_texto_do_contents(contents))
+        await asyncio.sleep(r.latencia_s)
+        if r.codigo != 200:
+            raise self._erro(r)
+        return _resposta_genai(r.texto, r.finish_reason, r.tokens_prompt, r.tokens_saida)
+
+
+class _AioFake:
+    def __init__(self, backend: BackendFake):
+        self.models = _ModelosFakeAsync(backend)
+
+
+class ClienteFake:
+    """Substituto de `genai.Client` com a mesma superfície usada por gemini_api."""
+
+    def __init__(self, backend: Optional[BackendFake] = None):
+        self.backend = backend or BackendFake()
+        self.models = _ModelosFake(self.backend)
+        self.aio = _AioFake(self.backend)
+
+
+@contextmanager
+def cliente_instalado(cliente):
+    """Troca `gemini_api.client` por `cliente` dentro do bloco `with`."""
+    from src import gemini_api
+    anterior = gemini_api.client
+    gemini_api.client = cliente
+    try:
+        yield cliente
+    finally:
+        gemini_api.client = anterior
+
+
+# ---------------------------------------------------------------------------
+# Modo HTTP
+# ---------------------------------------------------------------------------
+
+class _ManipuladorFake(BaseHTTPRequestHandler):
+    backend: BackendFake  # definido na subclasse criada por ServidorFake
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, formato, *args):
+        logger.debug(f"🧪 Backend fake HTTP: {formato % args}")
+
+    def _enviar_json(self, codigo: int, corpo: dict, cabecalhos: Optional[dict] = None) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        caminho = self.path.split("?", 1)[0]
+        metodo = caminho.rsplit(":", 1)[-1]
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+        prompt = _texto_do_contents(corpo.get("contents", []))
+
+        if metodo == "countTokens":
+            self._enviar_json(200, {"totalTokens": len(prompt) // CHARS_POR_TOKEN_FAKE})
+            return
+        if metodo not in ("generateContent", "streamGenerateContent"):
+            self._enviar_json(404, {"error": {"code": 404, "message": f"Método {metodo} não simulado"}})
+            return
+
+        r = self.backend.responder(prompt)
+        if r.codigo != 200:
+            time.sleep(r.latencia_s)
+            retry_after = self.backend.cenario.retry_after_s
+            self._enviar_json(r.codigo, r.erro_json(retry_after), {"Retry-After": f"{retry_after:g}"})
+            return
+        if metodo == "generateContent":
+            time.sleep(r.latencia_s)
+            self._enviar_json(200, _resposta_json(r.texto, r.finish_reason, r.tokens_prompt, r.tokens_saida))
+            return
+
+        # streamGenerateContent?alt=sse: um evento "data:" por pedaço
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        pedacos = _pedacos(r.texto, self.backend.cenario.pedacos_stream)
+        for i, pedaco in enumerate(pedacos):
+            time.sleep(r.latencia_s / len(pedacos))
+            ultimo = i == len(pedacos) - 1
+            evento = _resposta_json(pedaco, r.finish_reason if ultimo else None, r.tokens_prompt, r.tokens_saida)
+            self.wfile.write(f"data: {json.dumps(evento, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+
+class ServidorFake:
+    """Servidor HTTP local (thread daemon) com a API REST do Gemini simulada."""
+
+    def __init__(self, backend: Optional[BackendFake] = None, host: str = "127.0.0.1", porta: int = 0):
+        self.backend = backend or BackendFake()
+        manipulador = type("_Manipulador", (_ManipuladorFake,), {"backend": self.backend})
+        self._servidor = ThreadingHTTPServer((host, porta), manipulador)
+        self._servidor.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self) -> "ServidorFake":
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"🧪 Backend Gemini fake ouvindo em {self.url}")
+        return self
+
+    def parar(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+
+def cliente_http(url: str):
+    """`genai.Client` real apontado para um `ServidorFake` (ou outro endpoint)."""
+    from google import genai
+    return genai.Client(api_key="fake", http_options=types.HttpOptions(base_url=url))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor HTTP com a API Gemini simulada")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--cenario", choices=sorted(CENARIOS), default="realista")
+    parser.add_argument("--semente", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    cenario = CenarioFake(**{**asdict(CENARIOS[args.cenario]), "semente": args.semente})
+    servidor = ServidorFake(BackendFake(cenario), host=args.host, porta=args.porta).iniciar()
+    logger.info(f"🧪 Cenário '{args.cenario}': {asdict(cenario)} — Ctrl+C para encerrar")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.parar()
+        logger.info(f"🧪 Estatísticas: {servidor.backend.estatisticas()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
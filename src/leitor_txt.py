@@ -2,6 +2,13 @@
 
 import os
 import re
+import json
+import mmap
+from array import array
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from itertools import accumulate, islice
+from typing import Optional
 from loguru import logger
 from config import (
     CAMINHO_ENTRADA,
@@ -10,7 +17,17 @@ from config import (
     PAGINAS_POR_BLOCO,
     DELIMITADOR_PAGINA_PADRAO,
     MAX_CHARS_BLOCO,
+    EMPACOTAR_POR_TOKENS,
+    MAX_OUTPUT_TOKENS_BLOCO,
+    RESERVA_RACIOCINIO_TOKENS,
+    RAZAO_SAIDA_ENTRADA,
+    MARGEM_SAIDA,
+    TOKENS_ENTRADA_POR_BLOCO,
+    PREFILTRO_ATIVO,
+    PREFILTRO_LIMIAR,
 )
+from src.limitador import estimar_tokens, CHARS_POR_TOKEN_ESTIMADO
+from src.prefiltro import triar_paginas
 
 def ler_arquivo_txt(nome_arquivo=ARQUIVO_PADRAO_TXT):
     """Lê o conteúdo de um arquivo .txt na pasta de entrada."""
@@ -31,23 +48,42 @@ def limpar_texto(conteudo: str) -> str:
 
     for linha in linhas:
         linha = linha.strip()
-        if linha and not linha.lower().startswith("página") and not linha.startswith("___"):
+        # Só linhas iniciadas por p/P/_ podem ser marcas de página: evita lower() nas demais
+        if linha and (linha[0] not in "pP_"
+                      or not (linha[:6].lower().startswith("página") or linha.startswith("___"))):
             texto_limpo.append(linha)
 
     return " ".join(texto_limpo)
 
+_NAO_ESPACO = re.compile(r"\S")
+
+
+def iterar_blocos(texto: str, tamanho=TAMANHO_BLOCO):
+    """Gera os blocos de `dividir_em_blocos` percorrendo offsets do mesmo texto.
+
+    Cada bloco termina no último "." dentro de `tamanho` caracteres (ou corta
+    em tamanho+1 se não houver ponto); o restante nunca é copiado, só o bloco
+    emitido — linear no tamanho do documento.
+    """
+    ini, fim = 0, len(texto)
+    while fim - ini > tamanho:
+        corte = texto.rfind(".", ini, ini + tamanho)
+        if corte == -1:
+            corte = ini + tamanho
+        yield texto[ini:corte + 1].strip()
+        if ini == 0:
+            # Primeiro corte: o restante passa a ser considerado sem espaços finais
+            while fim > 0 and texto[fim - 1].isspace():
+                fim -= 1
+        proximo = _NAO_ESPACO.search(texto, corte + 1, fim)
+        ini = proximo.start() if proximo else fim
+    if ini < fim:
+        yield texto[ini:fim]
+
+
 def dividir_em_blocos(texto: str, tamanho=TAMANHO_BLOCO) -> list:
     """Divide o texto em blocos de tamanho aproximado."""
-    blocos = []
-    while len(texto) > tamanho:
-        corte = texto.rfind(".", 0, tamanho)
-        if corte == -1:
-            corte = tamanho
-        blocos.append(texto[:corte+1].strip())
-        texto = texto[corte+1:].strip()
-    if texto:
-        blocos.append(texto)
-    return blocos
+    return list(iterar_blocos(texto, tamanho))
 
 def carregar_texto_completo(nome_arquivo=ARQUIVO_PADRAO_TXT) -> str:
     """T04: Lê o texto bruto sem chunking (para Agente 1 — resumidor)."""
@@ -78,10 +114,9 @@ def detectar_paginas(texto: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO) -
 def dividir_por_paginas(texto: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
                         paginas_por_bloco: int = PAGINAS_POR_BLOCO) -> list:
     """v3.2: Agrupa N páginas por bloco; subdivide se exceder MAX_CHARS_BLOCO."""
-    paginas = detectar_paginas(texto, delimitador)
-    if not paginas:
-        return []
+    return _agrupar_paginas(detectar_paginas(texto, delimitador), paginas_por_bloco)
 
+def _agrupar_paginas(paginas: list, paginas_por_bloco: int = PAGINAS_POR_BLOCO) -> list:
     blocos = []
     for i in range(0, len(paginas), paginas_por_bloco):
         chunk_paginas = paginas[i:i+paginas_por_bloco]
@@ -97,19 +132,136 @@ def dividir_por_paginas(texto: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO
 
     return blocos
 
-def carregar_blocos(nome_arquivo=ARQUIVO_PADRAO_TXT, delimitador: str = DELIMITADOR_PAGINA_PADRAO):
-    """v3.2: Tenta dividir por páginas (delimitador configurável); fallback char-based."""
-    bruto = ler_arquivo_txt(nome_arquivo)
+def orcamento_tokens_bloco() -> int:
+    """Tokens de entrada por bloco, derivados da folga de saída do modelo.
+
+    A resposta (evidências + raciocínio) cresce com o trecho enviado; o
+    orçamento é o maior trecho cuja resposta esperada ainda cabe em
+    MAX_OUTPUT_TOKENS_BLOCO com margem.
+    """
+    if TOKENS_ENTRADA_POR_BLOCO > 0:
+        return TOKENS_ENTRADA_POR_BLOCO
+    folga = (MAX_OUTPUT_TOKENS_BLOCO - RESERVA_RACIOCINIO_TOKENS) * MARGEM_SAIDA
+    return max(1, int(folga / RAZAO_SAIDA_ENTRADA))
+
+def empacotar_paginas_por_tokens(texto: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                                 orcamento_tokens: int | None = None,
+                                 chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO) -> list:
+    """Agrupa páginas consecutivas até o orçamento de tokens de entrada.
+
+    Guloso em ordem: cada bloco recebe o máximo de páginas que couber, o que
+    minimiza o número de requisições sem reordenar páginas. Uma página que
+    sozinha excede o orçamento é subdividida por caracteres. Os tokens são
+    estimados com a razão `chars_por_token` do documento.
+    """
+    return _empacotar_paginas(detectar_paginas(texto, delimitador), orcamento_tokens or orcamento_tokens_bloco(),
+                              chars_por_token)
+
+def _empacotar_paginas(paginas: list, orcamento: int, chars_por_token: float) -> list:
+    blocos = []
+    atual, tokens_atual = [], 0
+    for _, pagina in paginas:
+        limpo = limpar_texto(pagina)
+        if not limpo:
+            continue
+        tokens = estimar_tokens(limpo, chars_por_token)
+        if atual and tokens_atual + tokens > orcamento:
+            blocos.append(" ".join(atual))
+            atual, tokens_atual = [], 0
+        if tokens > orcamento:
+            blocos.extend(dividir_em_blocos(limpo, tamanho=int(orcamento * chars_por_token)))
+            continue
+        atual.append(limpo)
+        tokens_atual += tokens
+    if atual:
+        blocos.append(" ".join(atual))
+    return blocos
+
+def carregar_blocos(nome_arquivo=ARQUIVO_PADRAO_TXT, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                    chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO):
+    """v3.2: Tenta dividir por páginas (delimitador configurável); fallback char-based.
+
+    Com páginas, os blocos são materializados sob demanda a partir do índice
+    de offsets (`carregar_blocos_arquivo`).
+    """
+    caminho_completo = os.path.join(CAMINHO_ENTRADA, nome_arquivo)
+    if not os.path.exists(caminho_completo):
+        raise FileNotFoundError(f"Arquivo não encontrado: {caminho_completo}")
+    return carregar_blocos_arquivo(caminho_completo, delimitador, chars_por_token=chars_por_token)
+
 
+def _triar(paginas, total: int) -> tuple[list[int], list]:
+    """Pré-triagem (PREFILTRO_ATIVO) de `total` páginas (número, texto).
+
+    Retorna as posições mantidas e o relatório das ignoradas.
+    """
+    if not PREFILTRO_ATIVO or not total:
+        return list(range(total)), []
+    mantidas, ignoradas = triar_paginas(paginas, PREFILTRO_LIMIAR)
+    if ignoradas:
+        logger.info(
+            f"🔎 Pré-triagem: {len(ignoradas)} de {total} página(s) sem sinais documentais "
+            f"(pontuação < {PREFILTRO_LIMIAR}) não serão enviadas"
+        )
+    return mantidas, ignoradas
+
+
+def assinatura_divisao(delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                       chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO) -> str:
+    """Parâmetros que determinam a divisão em blocos, numa string comparável entre execuções.
+
+    Gravada na run: linhas antigas de run_items, sem fingerprint, só casam
+    pela posição se a divisão atual for a mesma que as produziu.
+    """
+    if EMPACOTAR_POR_TOKENS:
+        modo = f"tokens:{orcamento_tokens_bloco()}:{chars_por_token:.4f}"
+    else:
+        modo = f"paginas:{PAGINAS_POR_BLOCO}:{MAX_CHARS_BLOCO}"
+    prefiltro = f"{PREFILTRO_LIMIAR}" if PREFILTRO_ATIVO else "off"
+    return f"{delimitador}|{modo}|{TAMANHO_BLOCO}|{prefiltro}"
+
+
+class BlocosTexto(list):
+    """Blocos já materializados, com o relatório da pré-triagem em `paginas_ignoradas`.
+
+    Uma lista comum que expõe o mesmo relatório (e a `divisao`) de
+    `BlocosPaginados`, para o controlador gravá-los qualquer que seja a
+    origem dos blocos.
+    """
+
+    def __init__(self, blocos=(), paginas_ignoradas: Optional[list] = None, divisao: str = ""):
+        super().__init__(blocos)
+        self.paginas_ignoradas = paginas_ignoradas or []
+        self.divisao = divisao
+
+
+def dividir_texto_em_blocos(bruto: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                            chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO) -> BlocosTexto:
+    """Mesma divisão de `carregar_blocos`, a partir do texto já lido (ex.: testes e
+    `scripts/teste_carga.py`); o app e o worker usam `carregar_blocos_arquivo`.
+
+    O relatório das páginas descartadas pela pré-triagem vai em `paginas_ignoradas`.
+    """
     paginas = detectar_paginas(bruto, delimitador)
+    divisao = assinatura_divisao(delimitador, chars_por_token)
+    mantidas, relatorio = _triar(paginas, len(paginas))
+    triadas = [paginas[i] for i in mantidas]
 
-    if paginas:
-        blocos = dividir_por_paginas(bruto, delimitador)
+    if paginas and EMPACOTAR_POR_TOKENS:
+        orcamento = orcamento_tokens_bloco()
+        blocos = _empacotar_paginas(triadas, orcamento, chars_por_token)
+        logger.info(
+            f"✅ Documento: {len(paginas)} páginas detectadas (delim='{delimitador}') "
+            f"→ {len(blocos)} blocos (até ~{orcamento} tokens/bloco, {chars_por_token:.2f} chars/token)"
+        )
+        return BlocosTexto(blocos, relatorio, divisao)
+    elif paginas:
+        blocos = _agrupar_paginas(triadas)
         logger.info(
             f"✅ Documento: {len(paginas)} páginas detectadas (delim='{delimitador}') "
             f"→ {len(blocos)} blocos (até {PAGINAS_POR_BLOCO} págs/bloco, teto {MAX_CHARS_BLOCO} chars)"
         )
-        return blocos
+        return BlocosTexto(blocos, relatorio, divisao)
     else:
         logger.warning(
             f"⚠️ Delimitador '{delimitador}' não encontrado — usando chunking por caracteres"
@@ -117,4 +269,307 @@ def carregar_blocos(nome_arquivo=ARQUIVO_PADRAO_TXT, delimitador: str = DELIMITA
         limpo = limpar_texto(bruto)
         blocos = dividir_em_blocos(limpo)
         logger.info(f"✅ Documento dividido em {len(blocos)} blocos de ~{TAMANHO_BLOCO} caracteres")
-        return blocos
\ No newline at end of file
+        return BlocosTexto(blocos, divisao=divisao)
+
+
+# ---------------------------------------------------------------------------
+# Índice de páginas por offsets (mmap) e blocos sob demanda
+# ---------------------------------------------------------------------------
+
+NOME_INDICE_PAGINAS = "paginas.json"
+_PREFIXO_PAGINA_BYTES = 256  # bytes decodificados para achar o número da página
+
+
+def ler_amostras(caminho: str, tamanho: int) -> str:
+    """Início, meio e fim do TXT (até `tamanho` bytes cada), lidos com seek.
+
+    Arquivos de até 3 × `tamanho` bytes são lidos inteiros. Caracteres
+    cortados nas bordas das amostras são descartados.
+    """
+    total = os.path.getsize(caminho)
+    with open(caminho, "rb") as f:
+        if total <= 3 * tamanho:
+            return f.read().decode("utf-8", errors="ignore")
+        partes = []
+        for inicio in (0, total // 2 - tamanho // 2, total - tamanho):
+            f.seek(inicio)
+            partes.append(f.read(tamanho).decode("utf-8", errors="ignore"))
+    return "".join(partes)
+
+
+def _numero_pagina(buf, ini: int, fim: int, sequencial: int) -> Optional[int]:
+    """Número da página como em `detectar_paginas`; None se o trecho é só espaço.
+
+    Decodifica só o início do trecho, salvo quando espaços/dígitos chegam ao
+    fim do prefixo (aí o trecho inteiro é decodificado).
+    """
+    prefixo = bytes(buf[ini:min(fim, ini + _PREFIXO_PAGINA_BYTES)]).decode("utf-8", errors="ignore")
+    match = re.match(r'\s*(\d+)', prefixo)
+    consumido = match.end() if match else len(prefixo) - len(prefixo.lstrip())
+    if consumido >= len(prefixo) and fim - ini > _PREFIXO_PAGINA_BYTES:
+        prefixo = bytes(buf[ini:fim]).decode("utf-8")
+        match = re.match(r'\s*(\d+)', prefixo)
+    if not prefixo.strip():
+        return None
+    return int(match.group(1)) if match else sequencial
+
+
+@dataclass
+class IndicePaginas:
+    """Páginas de um TXT como (número, byte inicial, byte final), sem o texto.
+
+    Cada trecho vai do fim de um delimitador ao início do próximo — o mesmo
+    texto que `detectar_paginas` devolve para a página.
+    """
+    caminho: str
+    delimitador: str
+    tamanho_bytes: int
+    mtime_ns: int
+    numeros: array = field(default_factory=lambda: array("q"))
+    inicios: array = field(default_factory=lambda: array("q"))
+    fins: array = field(default_factory=lambda: array("q"))
+
+    def __len__(self) -> int:
+        return len(self.numeros)
+
+    def atual(self) -> bool:
+        """False se o arquivo mudou desde a indexação."""
+        try:
+            estado = os.stat(self.caminho)
+        except OSError:
+            return False
+        return (estado.st_size, estado.st_mtime_ns) == (self.tamanho_bytes, self.mtime_ns)
+
+    def ler_paginas(self, primeira: int, ultima: int) -> list[str]:
+        """Texto das páginas primeira..ultima (inclusive), com uma única leitura."""
+        base = self.inicios[primeira]
+        with open(self.caminho, "rb") as f:
+            f.seek(base)
+            dados = f.read(self.fins[ultima] - base)
+        return [
+            dados[self.inicios[i] - base:self.fins[i] - base].decode("utf-8")
+            for i in range(primeira, ultima + 1)
+        ]
+
+    def iterar_paginas(self):
+        """Texto de cada página, em ordem, lido do mmap do arquivo."""
+        if not len(self):
+            return
+        with open(self.caminho, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for ini, fim in zip(self.inicios, self.fins):
+                yield mm[ini:fim].decode("utf-8")
+
+    def salvar(self, destino: str) -> None:
+        os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+        dados = {
+            "delimitador": self.delimitador,
+            "tamanho_bytes": self.tamanho_bytes,
+            "mtime_ns": self.mtime_ns,
+            "paginas": [[n, i, f] for n, i, f in zip(self.numeros, self.inicios, self.fins)],
+        }
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(dados, f, separators=(",", ":"))
+        os.replace(temporario, destino)
+
+    @classmethod
+    def carregar(cls, origem: str, caminho: str) -> "IndicePaginas":
+        with open(origem, "r", encoding="utf-8") as f:
+            dados = json.load(f)
+        indice = cls(caminho, dados["delimitador"], dados["tamanho_bytes"], dados["mtime_ns"])
+        for numero, ini, fim in dados["paginas"]:
+            indice.numeros.append(numero)
+            indice.inicios.append(ini)
+            indice.fins.append(fim)
+        return indice
+
+
+def indexar_paginas(caminho: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO) -> IndicePaginas:
+    """Uma passada sobre o mmap do arquivo localizando o delimitador.
+
+    Índice vazio se o delimitador não aparece (mesmo sinal de `detectar_paginas`).
+    """
+    estado = os.stat(caminho)
+    indice = IndicePaginas(caminho, delimitador, estado.st_size, estado.st_mtime_ns)
+    if not delimitador or not estado.st_size:
+        return indice
+    alvo = delimitador.encode("utf-8")
+    with open(caminho, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = mm.find(alvo)
+        if pos == -1:
+            return indice
+        ini = 0
+        while True:
+            fim = len(mm) if pos == -1 else pos
+            numero = _numero_pagina(mm, ini, fim, len(indice) + 1)
+            if numero is not None:
+                indice.numeros.append(numero)
+                indice.inicios.append(ini)
+                indice.fins.append(fim)
+            if pos == -1:
+                return indice
+            ini = pos + len(alvo)
+            pos = mm.find(alvo, ini)
+
+
+def indice_paginas(caminho: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                   caminho_indice: Optional[str] = None) -> IndicePaginas:
+    """Índice salvo em `caminho_indice` se ainda vale para o arquivo; senão indexa e salva."""
+    if caminho_indice and os.path.exists(caminho_indice):
+        try:
+            indice = IndicePaginas.carregar(caminho_indice, caminho)
+            if indice.delimitador == delimitador and indice.atual():
+                return indice
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Índice de páginas inválido em {caminho_indice} — reindexando: {e}")
+    indice = indexar_paginas(caminho, delimitador)
+    if caminho_indice:
+        indice.salvar(caminho_indice)
+    return indice
+
+
+class BlocosPaginados(Sequence):
+    """Blocos de um documento paginado, lidos do arquivo só quando acessados.
+
+    Guarda apenas o plano de cada bloco (página inicial, página final, parte e
+    tamanho da subdivisão); `blocos[i]` relê as páginas e produz o mesmo texto
+    de `empacotar_paginas_por_tokens` (modo "tokens") ou `dividir_por_paginas`
+    (modo "paginas"). Páginas descartadas pela pré-triagem (`ignoradas`, por
+    posição no índice) ficam de fora do texto; `paginas_ignoradas` traz o
+    relatório delas; `divisao` é a `assinatura_divisao` que gerou os planos.
+    """
+
+    def __init__(self, indice: IndicePaginas, modo: str, planos: list[tuple],
+                 ignoradas: frozenset = frozenset(), paginas_ignoradas: Optional[list] = None,
+                 divisao: str = ""):
+        self.indice = indice
+        self.modo = modo
+        self.planos = planos
+        self.ignoradas = ignoradas
+        self.paginas_ignoradas = paginas_ignoradas or []
+        self.divisao = divisao
+
+    def __len__(self) -> int:
+        return len(self.planos)
+
+    def paginas(self, i: int) -> tuple[int, int]:
+        """Números da primeira e da última página do bloco `i`."""
+        primeira, ultima, _, _ = self.planos[i]
+        return self.indice.numeros[primeira], self.indice.numeros[ultima]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return self.texto_e_cortes(i)[0]
+
+    def texto_e_cortes(self, i: int) -> tuple[str, list[int]]:
+        """Texto do bloco `i` e os offsets, nesse texto, onde começa cada página após a primeira.
+
+        Usados para subdividir um bloco truncado na divisa de páginas. Parte
+        de uma página subdividida não tem cortes.
+        """
+        primeira, ultima, parte, tamanho = self.planos[i]
+        paginas = _ler_mantidas(self.indice, primeira, ultima, self.ignoradas)
+        if self.modo == "tokens":
+            limpas = [p for p in map(limpar_texto, paginas) if p]
+            texto = " ".join(limpas)
+            cortes = list(accumulate(len(p) + 1 for p in limpas[:-1]))
+        else:
+            texto = limpar_texto(" ".join(paginas))
+            anteriores = (len(limpar_texto(" ".join(paginas[:k]))) for k in range(1, len(paginas)))
+            cortes = sorted({n + 1 for n in anteriores if 0 < n + 1 < len(texto)})
+        if parte is None:
+            return texto, cortes
+        return next(islice(iterar_blocos(texto, tamanho), parte, None)), []
+
+
+def _ler_mantidas(indice: IndicePaginas, primeira: int, ultima: int, ignoradas: frozenset) -> list[str]:
+    paginas = indice.ler_paginas(primeira, ultima)
+    if not ignoradas:
+        return paginas
+    return [p for i, p in enumerate(paginas, primeira) if i not in ignoradas]
+
+
+def _planos_por_tokens(indice: IndicePaginas, orcamento: int, ignoradas: frozenset = frozenset(),
+                       chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO) -> list[tuple]:
+    """Mesma divisão de `empacotar_paginas_por_tokens`, página a página."""
+    planos = []
+    primeira, ultima, tokens_atual = None, None, 0
+    for i, pagina in enumerate(indice.iterar_paginas()):
+        if i in ignoradas:
+            continue
+        limpo = limpar_texto(pagina)
+        if not limpo:
+            continue
+        tokens = estimar_tokens(limpo, chars_por_token)
+        if primeira is not None and tokens_atual + tokens > orcamento:
+            planos.append((primeira, ultima, None, 0))
+            primeira, tokens_atual = None, 0
+        if tokens > orcamento:
+            tamanho = int(orcamento * chars_por_token)
+            planos.extend((i, i, k, tamanho) for k in range(sum(1 for _ in iterar_blocos(limpo, tamanho))))
+            continue
+        if primeira is None:
+            primeira = i
+        ultima = i
+        tokens_atual += tokens
+    if primeira is not None:
+        planos.append((primeira, ultima, None, 0))
+    return planos
+
+
+def _planos_por_paginas(indice: IndicePaginas, paginas_por_bloco: int = PAGINAS_POR_BLOCO,
+                        ignoradas: frozenset = frozenset()) -> list[tuple]:
+    """Mesma divisão de `dividir_por_paginas`, grupo a grupo."""
+    planos = []
+    mantidas = [i for i in range(len(indice)) if i not in ignoradas]
+    for k in range(0, len(mantidas), paginas_por_bloco):
+        grupo = mantidas[k:k + paginas_por_bloco]
+        primeira, ultima = grupo[0], grupo[-1]
+        limpo = limpar_texto(" ".join(_ler_mantidas(indice, primeira, ultima, ignoradas)))
+        if not limpo:
+            continue
+        if len(limpo) > MAX_CHARS_BLOCO:
+            partes = sum(1 for _ in iterar_blocos(limpo, MAX_CHARS_BLOCO))
+            planos.extend((primeira, ultima, k, MAX_CHARS_BLOCO) for k in range(partes))
+        else:
+            planos.append((primeira, ultima, None, 0))
+    return planos
+
+
+def carregar_blocos_arquivo(caminho: str, delimitador: str = DELIMITADOR_PAGINA_PADRAO,
+                            caminho_indice: Optional[str] = None,
+                            chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO):
+    """Divide o TXT como `dividir_texto_em_blocos`, sem carregar o documento inteiro.
+
+    O arquivo é indexado por offsets (mmap, uma passada) e, se `caminho_indice`
+    for dado, o índice é gravado ali e reaproveitado enquanto o arquivo não
+    mudar. Com páginas, retorna `BlocosPaginados` (blocos lidos sob demanda);
+    sem o delimitador, cai para o chunking por caracteres do texto inteiro.
+    Com PREFILTRO_ATIVO, páginas sem sinais documentais ficam de fora dos blocos.
+    `chars_por_token` é a razão calibrada do documento (gravada na run).
+    """
+    indice = indice_paginas(caminho, delimitador, caminho_indice)
+    if not len(indice):
+        with open(caminho, "r", encoding="utf-8") as f:
+            return dividir_texto_em_blocos(f.read(), delimitador, chars_por_token)
+
+    mantidas, relatorio = _triar(zip(indice.numeros, indice.iterar_paginas()), len(indice))
+    ignoradas = frozenset(range(len(indice))).difference(mantidas) if relatorio else frozenset()
+    divisao = assinatura_divisao(delimitador, chars_por_token)
+    if EMPACOTAR_POR_TOKENS:
+        orcamento = orcamento_tokens_bloco()
+        blocos = BlocosPaginados(indice, "tokens", _planos_por_tokens(indice, orcamento, ignoradas, chars_por_token),
+                                 ignoradas, relatorio, divisao)
+        logger.info(
+            f"✅ Documento: {len(indice)} páginas indexadas (delim='{delimitador}') "
+            f"→ {len(blocos)} blocos (até ~{orcamento} tokens/bloco, {chars_por_token:.2f} chars/token)"
+        )
+    else:
+        blocos = BlocosPaginados(indice, "paginas", _planos_por_paginas(indice, ignoradas=ignoradas),
+                                 ignoradas, relatorio, divisao)
+        logger.info(
+            f"✅ Documento: {len(indice)} páginas indexadas (delim='{delimitador}') "
+            f"→ {len(blocos)} blocos (até {PAGINAS_POR_BLOCO} págs/bloco, teto {MAX_CHARS_BLOCO} chars)"
+        )
+    return blocos
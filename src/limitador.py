@@ -0,0 +1,254 @@
+"""Limitador de taxa adaptativo compartilhado por todas as chamadas Gemini do processo.
+
+Combina dois token buckets (requisições/min e tokens/min) com um limite de
+concorrência AIMD: cada 429/503 reduz o limite pela metade (no máximo uma vez
+por janela de resfriamento) e cada rodada de sucessos com taxa de 429 baixa
+o aumenta em 1. Um Retry-After devolvido pela API pausa todas as chamadas.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from loguru import logger
+from config import GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCORRENCIA
+
+CHARS_POR_TOKEN_ESTIMADO = 4.0
+CHARS_POR_TOKEN_LIMITES = (1.5, 8.0)  # faixa aceita na calibração
+JANELA_TAXA_S = 60.0        # janela para medir a taxa de 429
+RESFRIAMENTO_CORTE_S = 5.0  # intervalo mínimo entre duas reduções de concorrência
+LIMIAR_TAXA_429 = 0.05      # acima disso a concorrência não volta a crescer
+ESPERA_SEM_VAGA_S = 0.05    # polling enquanto não há vaga de concorrência
+
+
+def estimar_tokens(texto: str, chars_por_token: float = CHARS_POR_TOKEN_ESTIMADO) -> int:
+    """Estimativa barata de tokens pela razão chars/token (do documento, se calibrada)."""
+    return int(len(texto) / chars_por_token) + 1
+
+
+def calibrar_estimativa(chars: int, tokens: int) -> float:
+    """Razão chars/token de um documento a partir de uma contagem real (count_tokens).
+
+    Não há razão global: cada documento leva a sua ao empacotamento e ela fica
+    gravada na run (`runs.chars_por_token`), de modo que o mesmo documento gera
+    sempre os mesmos blocos na retomada. Arredondada a 0,05; sem contagem
+    válida, retorna CHARS_POR_TOKEN_ESTIMADO.
+    """
+    if chars <= 0 or tokens <= 0:
+        return CHARS_POR_TOKEN_ESTIMADO
+    minimo, maximo = CHARS_POR_TOKEN_LIMITES
+    razao = min(maximo, max(minimo, round(chars / tokens / 0.05) * 0.05))
+    logger.debug(f"🔢 Estimador de tokens calibrado: {razao:.2f} chars/token")
+    return razao
+
+
+# ---------------------------------------------------------------------------
+# Classificação de erros
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ErroClassificado:
+    retriavel: bool
+    codigo: Optional[int]
+    retry_after: Optional[float]
+
+    @property
+    def sobrecarga(self) -> bool:
+        """429/503: sinal de quota ou capacidade esgotada (reduz concorrência)."""
+        return self.codigo in (429, 503)
+
+
+def _parse_segundos(valor) -> Optional[float]:
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)s?", texto)
+    if match:
+        return float(match.group(1))
+    try:
+        # Retry-After também pode vir como data HTTP
+        return max(parsedate_to_datetime(texto).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _extrair_retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        segundos = _parse_segundos(headers.get("retry-after") or headers.get("Retry-After"))
+        if segundos is not None:
+            return segundos
+
+    # google.rpc.RetryInfo no corpo do erro: {"error": {"details": [{"retryDelay": "12s"}]}}
+    detalhes = getattr(e, "details", None)
+    if isinstance(detalhes, dict):
+        erro = detalhes.get("error", detalhes)
+        detalhes = erro.get("details", []) if isinstance(erro, dict) else []
+    for item in detalhes if isinstance(detalhes, list) else []:
+        if isinstance(item, dict) and "retryDelay" in item:
+            return _parse_segundos(item["retryDelay"])
+    return None
+
+
+def classificar_erro(e: Exception) -> ErroClassificado:
+    """Identifica código HTTP, se é retriável e o Retry-After de uma exceção da API."""
+    codigo = getattr(e, "code", None)
+    if not isinstance(codigo, int):
+        error_msg = str(e).lower()
+        if "429" in error_msg or "exhausted" in error_msg or "too many requests" in error_msg:
+            codigo = 429
+        elif "503" in error_msg or "unavailable" in error_msg or "high demand" in error_msg:
+            codigo = 503
+        else:
+            codigo = None
+    retriavel = codigo in (429, 500, 502, 503, 504)
+    return ErroClassificado(retriavel, codigo, _extrair_retry_after(e) if retriavel else None)
+
+
+# ---------------------------------------------------------------------------
+# Limitador
+# ---------------------------------------------------------------------------
+
+class _Balde:
+    """Token bucket: até `capacidade` unidades, reabastecido a `capacidade` por minuto."""
+
+    def __init__(self, capacidade: float, agora: float):
+        self.capacidade = float(capacidade)
+        self.taxa = self.capacidade / 60.0
+        self.saldo = self.capacidade
+        self._atualizado = agora
+
+    def _reabastecer(self, agora: float) -> None:
+        self.saldo = min(self.capacidade, self.saldo + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def espera(self, quantidade: float, agora: float) -> float:
+        """Segundos até haver `quantidade` disponível (0 se já houver)."""
+        self._reabastecer(agora)
+        quantidade = min(quantidade, self.capacidade)
+        if self.saldo >= quantidade:
+            return 0.0
+        return (quantidade - self.saldo) / self.taxa
+
+    def consumir(self, quantidade: float) -> None:
+        self.saldo = min(self.capacidade, self.saldo - quantidade)
+
+
+class LimitadorAdaptativo:
+    """Token bucket RPM/TPM + limite de concorrência AIMD, seguro entre threads e event loops."""
+
+    def __init__(self, rpm: int, tpm: int, concorrencia_max: int, concorrencia_min: int = 1,
+                 jitter: float = 0.25, relogio: Callable[[], float] = time.monotonic):
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        agora = relogio()
+        self._req = _Balde(rpm, agora)
+        self._tok = _Balde(tpm, agora)
+        self.concorrencia_max = max(1, concorrencia_max)
+        self.concorrencia_min = max(1, min(concorrencia_min, self.concorrencia_max))
+        self.limite = self.concorrencia_max
+        self.em_voo = 0
+        self.jitter = jitter
+        self._pausa_ate = 0.0
+        self._ultimo_corte = float("-inf")
+        self._sucessos_rodada = 0
+        self._resultados: deque = deque()  # (instante, sobrecarga)
+
+    # --- aquisição -------------------------------------------------------
+
+    def _tentar_adquirir(self, tokens: int) -> float:
+        """Reserva vaga + orçamento e retorna 0, ou retorna quantos segundos esperar."""
+        with self._lock:
+            agora = self._relogio()
+            if agora < self._pausa_ate:
+                return self._pausa_ate - agora
+            if self.em_voo >= self.limite:
+                return ESPERA_SEM_VAGA_S
+            espera = max(self._req.espera(1, agora), self._tok.espera(tokens, agora))
+            if espera > 0:
+                return espera
+            self._req.consumir(1)
+            self._tok.consumir(tokens)
+            self.em_voo += 1
+            return 0.0
+
+    def adquirir(self, tokens: int = 0) -> None:
+        while (espera := self._tentar_adquirir(tokens)) > 0:
+            time.sleep(espera)
+
+    async def adquirir_async(self, tokens: int = 0) -> None:
+        while (espera := self._tentar_adquirir(tokens)) > 0:
+            await asyncio.sleep(espera)
+
+    # --- liberação / feedback -------------------------------------------
+
+    def liberar(self, sobrecarga: bool = False, retry_after: Optional[float] = None,
+                tokens_estimados: int = 0, tokens_reais: Optional[int] = None) -> None:
+        """Devolve a vaga e ajusta limite/orçamento conforme o resultado da chamada."""
+        with self._lock:
+            agora = self._relogio()
+            self.em_voo = max(0, self.em_voo - 1)
+            if tokens_reais is not None:
+                self._tok.consumir(tokens_reais - tokens_estimados)
+
+            self._resultados.append((agora, sobrecarga))
+            while self._resultados and self._resultados[0][0] < agora - JANELA_TAXA_S:
+                self._resultados.popleft()
+
+            if retry_after:
+                self._pausa_ate = max(self._pausa_ate, agora + retry_after)
+
+            if sobrecarga:
+                self._sucessos_rodada = 0
+                if agora - self._ultimo_corte >= RESFRIAMENTO_CORTE_S:
+                    novo = max(self.concorrencia_min, self.limite // 2)
+                    if novo != self.limite:
+                        logger.warning(f"🚦 Limitador: concorrência {self.limite} → {novo} (sobrecarga da API)")
+                    self.limite = novo
+                    self._ultimo_corte = agora
+            else:
+                self._sucessos_rodada += 1
+                if (self._sucessos_rodada >= self.limite and self.limite < self.concorrencia_max
+                        and self._taxa_429_sem_lock() < LIMIAR_TAXA_429):
+                    self.limite += 1
+                    self._sucessos_rodada = 0
+                    logger.debug(f"🚦 Limitador: concorrência → {self.limite}")
+
+    def _taxa_429_sem_lock(self) -> float:
+        if not self._resultados:
+            return 0.0
+        return sum(1 for _, s in self._resultados if s) / len(self._resultados)
+
+    def taxa_429(self) -> float:
+        """Fração de chamadas com 429/503 na última janela de 60s."""
+        with self._lock:
+            return self._taxa_429_sem_lock()
+
+    def espera_retentativa(self, tentativa: int, retry_after: Optional[float] = None,
+                           base: float = 3.0) -> float:
+        """Backoff exponencial com jitter; nunca menor que o Retry-After da API."""
+        espera = base * (2 ** tentativa)
+        espera *= 1 + random.uniform(-self.jitter, self.jitter)
+        if retry_after:
+            espera = max(espera, retry_after + random.uniform(0, self.jitter * base))
+        return espera
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "limite_concorrencia": self.limite,
+                "em_voo": self.em_voo,
+                "taxa_429": round(self._taxa_429_sem_lock(), 3),
+                "pausa_restante_s": max(0.0, self._pausa_ate - self._relogio()),
+            }
+
+
+# Instância única do processo: compartilhada por runs, sessões Streamlit e scripts.
+limitador = LimitadorAdaptativo(GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCORRENCIA)
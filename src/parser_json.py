@@ -0,0 +1,51 @@
+"""Parser JSON incremental compartilhado pelo streaming e pela mescla de sub-blocos."""
+
+import json
+
+
+class ParserJSONIncremental:
+    """Emite cada objeto {...} de nível superior assim que sua chave de fechamento chega.
+
+    Recebe o texto em pedaços arbitrários (ex.: chunks de streaming) e mantém
+    o estado entre chamadas, ignorando chaves dentro de strings. Só guarda o
+    trecho do objeto ainda aberto, não a resposta inteira.
+    """
+
+    def __init__(self):
+        self._pendente: list[str] = []
+        self._nivel = 0
+        self._em_string = False
+        self._escape = False
+
+    def alimentar(self, trecho: str) -> list:
+        objetos = []
+        inicio = 0 if self._nivel > 0 else None
+        for i, ch in enumerate(trecho):
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._em_string = False
+                continue
+            if ch == '"':
+                self._em_string = True
+            elif ch == "{":
+                if self._nivel == 0:
+                    inicio = i
+                self._nivel += 1
+            elif ch == "}":
+                if self._nivel > 0:
+                    self._nivel -= 1
+                    if self._nivel == 0 and inicio is not None:
+                        texto_objeto = "".join(self._pendente) + trecho[inicio:i + 1]
+                        self._pendente = []
+                        try:
+                            objetos.append(json.loads(texto_objeto))
+                        except json.JSONDecodeError:
+                            pass
+                        inicio = None
+        if self._nivel > 0 and inicio is not None:
+            self._pendente.append(trecho[inicio:])
+        return objetos
@@ -1,9 +1,13 @@
+import json
 import sqlite3
+import threading
 import uuid
-from datetime import datetime, timezone
+from typing import Iterator
+from datetime import datetime, timedelta, timezone
 from contextlib import contextmanager
 from loguru import logger
-from config import CAMINHO_DB, CAMINHO_SAIDA
+from config import CAMINHO_DB, CAMINHO_SAIDA, JOB_MAX_TENTATIVAS
+from src.dedup import hash_normalizado
 import os
 
 # ---------------------------------------------------------------------------
@@ -17,6 +21,14 @@ RUN_INCOMPLETA = "INCOMPLETA"
 ITEM_OK         = "OK"
 ITEM_ERRO_LLM   = "ERRO_LLM"
 ITEM_ERRO_PARSE = "ERRO_PARSE"
+ITEM_PARCIAL    = "PARCIAL"   # subdivisão com parte sem resposta: evidências das demais gravadas
+ITEM_PENDENTE   = "PENDING"   # semeado, aguardando um worker
+ITEM_LEASED     = "LEASED"    # reivindicado por lease_owner até lease_expira_em
+
+JOB_QUEUED  = "QUEUED"
+JOB_RUNNING = "RUNNING"
+JOB_DONE    = "DONE"
+JOB_FAILED  = "FAILED"
 
 _DDL = """
 PRAGMA journal_mode=WAL;
@@ -33,7 +45,12 @@ CREATE TABLE IF NOT EXISTS runs (
     total_evidencias    INTEGER DEFAULT 0,
     email_destino       TEXT,
     erro_msg            TEXT,
-    resumo_processo     TEXT
+    resumo_processo     TEXT,
+    entrada_sha256      TEXT,
+    total_paginas       INTEGER,
+    chars_por_token     REAL,
+    auxilio_liberado    INTEGER NOT NULL DEFAULT 0,
+    divisao_blocos      TEXT
 );
 
 CREATE TABLE IF NOT EXISTS run_items (
@@ -43,30 +60,162 @@ CREATE TABLE IF NOT EXISTS run_items (
     evidencias_count INTEGER DEFAULT 0,
     erro_msg         TEXT,
     processed_at     TEXT NOT NULL,
+    lease_owner      TEXT,
+    lease_expira_em  TEXT,
+    fingerprint      TEXT,
+    pagina_inicial   INTEGER,
+    pagina_final     INTEGER,
     PRIMARY KEY (run_id, bloco_id)
 );
 
+CREATE TABLE IF NOT EXISTS resumos_documento (
+    doc_hash    TEXT PRIMARY KEY,
+    resumo      TEXT NOT NULL,
+    criado_em   TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS evidencias (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id              TEXT NOT NULL,
+    bloco_id            INTEGER,
+    hash                TEXT NOT NULL,
+    tipo_evidencia      TEXT,
+    trecho              TEXT,
+    conteudo            TEXT,
+    resumo              TEXT,
+    referencia          TEXT,
+    arquivo_origem      TEXT,
+    data_processamento  TEXT,
+    UNIQUE (run_id, hash)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id         TEXT PRIMARY KEY,
+    run_id         TEXT NOT NULL,
+    status         TEXT NOT NULL DEFAULT 'QUEUED',
+    parametros     TEXT NOT NULL DEFAULT '{}',
+    worker         TEXT,
+    tentativas     INTEGER DEFAULT 0,
+    criado_em      TEXT NOT NULL,
+    iniciado_em    TEXT,
+    heartbeat_em   TEXT,
+    finalizado_em  TEXT,
+    erro_msg       TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tentativas_api (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id              TEXT,
+    bloco_id            INTEGER,
+    rotulo              TEXT,
+    tentativa           INTEGER NOT NULL,
+    modelo              TEXT,
+    streaming           INTEGER DEFAULT 0,
+    inicio_em           TEXT NOT NULL,
+    duracao_s           REAL NOT NULL,
+    espera_limitador_s  REAL DEFAULT 0,
+    tokens_prompt       INTEGER,
+    tokens_saida        INTEGER,
+    tokens_raciocinio   INTEGER,
+    tokens_cache        INTEGER,
+    codigo_http         INTEGER,
+    classe_erro         TEXT,
+    erro_msg            TEXT,
+    finish_reason       TEXT
+);
+
 CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status);
+CREATE INDEX IF NOT EXISTS idx_tentativas_run ON tentativas_api(run_id, bloco_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, criado_em);
 CREATE INDEX IF NOT EXISTS idx_items_run   ON run_items(run_id);
+CREATE INDEX IF NOT EXISTS idx_evidencias_run ON evidencias(run_id, id);
 """
 
+# Cabeçalho da planilha → coluna da tabela evidencias. Os campos de evidência
+# formam o hash de deduplicação (mesmo critério do antigo drop_duplicates).
+_CAMPOS_EVIDENCIA = {
+    "Tipo de Evidência": "tipo_evidencia",
+    "Trecho": "trecho",
+    "Conteúdo": "conteudo",
+    "Resumo": "resumo",
+    "Referência": "referencia",
+}
+_CAMPOS_META = {
+    "Arquivo Origem": "arquivo_origem",
+    "Data Processamento": "data_processamento",
+}
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
 
+def _iso_em(segundos: float) -> str:
+    """Instante atual deslocado de `segundos` (negativo = passado), no formato de _now_iso."""
+    return (datetime.now(timezone.utc) + timedelta(seconds=segundos)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Uma conexão por thread e por arquivo de banco, reaproveitada entre chamadas.
+_local = threading.local()
+_lock_init = threading.Lock()
+_bancos_inicializados: set[str] = set()
+
+
+def _conexao() -> sqlite3.Connection:
+    """Conexão da thread atual com CAMINHO_DB (aberta na primeira chamada).
+
+    Em modo autocommit (as transações são explícitas em `_conn`) e com
+    synchronous=NORMAL, seguro sob WAL e sem fsync a cada commit.
+    """
+    conexoes = getattr(_local, "conexoes", None)
+    if conexoes is None:
+        conexoes = _local.conexoes = {}
+    con = conexoes.get(CAMINHO_DB)
+    if con is None:
+        os.makedirs(CAMINHO_SAIDA, exist_ok=True)
+        con = sqlite3.connect(CAMINHO_DB, timeout=10, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA synchronous=NORMAL")
+        conexoes[CAMINHO_DB] = con
+    return con
+
+
 @contextmanager
-def _conn():
-    os.makedirs(CAMINHO_SAIDA, exist_ok=True)
-    con = sqlite3.connect(CAMINHO_DB, timeout=10)
-    con.row_factory = sqlite3.Row
+def _conn(imediata: bool = False):
+    """Transação na conexão da thread. Dentro de `transacao()`, só o nível
+    externo faz COMMIT (ou ROLLBACK).
+
+    `imediata=True` (BEGIN IMMEDIATE) reserva a escrita já no início — usado
+    em leitura-seguida-de-escrita disputada entre processos (ex.: fila de jobs).
+    """
+    con = _conexao()
+    if con.in_transaction:
+        yield con
+        return
+    con.execute("BEGIN IMMEDIATE" if imediata else "BEGIN")
     try:
         yield con
-        con.commit()
-    except Exception:
-        con.rollback()
+        con.execute("COMMIT")
+    except BaseException:
+        con.execute("ROLLBACK")
         raise
-    finally:
+
+
+def transacao():
+    """Agrupa várias operações de persistência em uma única transação.
+
+    Ex.: checkpoint de bloco (evidências + run_item + progresso da run).
+    Abre com BEGIN IMMEDIATE: com vários processos gravando a mesma run, uma
+    transação que lê antes de escrever esperaria o lock em vez de falhar
+    com "database is locked".
+    """
+    return _conn(imediata=True)
+
+
+def fechar_conexao() -> None:
+    """Fecha a conexão da thread atual com CAMINHO_DB (se houver)."""
+    con = getattr(_local, "conexoes", {}).pop(CAMINHO_DB, None)
+    if con is not None:
         con.close()
 
 
@@ -76,32 +225,83 @@ def _migrar_schema(con) -> None:
     if "resumo_processo" not in colunas:
         con.execute("ALTER TABLE runs ADD COLUMN resumo_processo TEXT")
         logger.info("Migração: coluna 'resumo_processo' adicionada à tabela runs.")
-
-
-def init_db() -> None:
-    """Cria banco e tabelas se não existirem (idempotente)."""
-    try:
-        with _conn() as con:
-            con.executescript(_DDL)
-            _migrar_schema(con)
-        logger.debug(f"Banco inicializado: {CAMINHO_DB}")
-    except Exception as exc:
-        logger.error(f"Falha ao inicializar banco: {exc}")
-        raise
+    for coluna, tipo in (("entrada_sha256", "TEXT"), ("total_paginas", "INTEGER"), ("chars_por_token", "REAL"),
+                         ("auxilio_liberado", "INTEGER NOT NULL DEFAULT 0"), ("divisao_blocos", "TEXT")):
+        if coluna not in colunas:
+            con.execute(f"ALTER TABLE runs ADD COLUMN {coluna} {tipo}")
+            logger.info(f"Migração: coluna '{coluna}' adicionada à tabela runs.")
+    # Índice criado aqui, e não no DDL: em bancos antigos a coluna só existe após a migração
+    con.execute("CREATE INDEX IF NOT EXISTS idx_runs_entrada ON runs(entrada_sha256)")
+
+    colunas_itens = {row["name"] for row in con.execute("PRAGMA table_info(run_items)").fetchall()}
+    for coluna, tipo in (("lease_owner", "TEXT"), ("lease_expira_em", "TEXT"), ("fingerprint", "TEXT"),
+                         ("pagina_inicial", "INTEGER"), ("pagina_final", "INTEGER")):
+        if coluna not in colunas_itens:
+            con.execute(f"ALTER TABLE run_items ADD COLUMN {coluna} {tipo}")
+            logger.info(f"Migração: coluna '{coluna}' adicionada à tabela run_items.")
+
+    versao = con.execute("PRAGMA user_version").fetchone()[0]
+    if versao < 1:
+        _recalcular_hashes_evidencias(con)
+        con.execute("PRAGMA user_version = 1")
+
+
+def _recalcular_hashes_evidencias(con) -> None:
+    """v1: hash de dedup passa a usar os campos normalizados.
+
+    Linhas que colidem sob a nova normalização mantêm o hash antigo
+    (UPDATE OR IGNORE): já estão gravadas e não são apagadas.
+    """
+    colunas = ", ".join(_CAMPOS_EVIDENCIA.values())
+    rows = con.execute(f"SELECT id, {colunas} FROM evidencias").fetchall()
+    for row in rows:
+        linha = {cab: row[col] for cab, col in _CAMPOS_EVIDENCIA.items()}
+        con.execute("UPDATE OR IGNORE evidencias SET hash=? WHERE id=?", (hash_evidencia(linha), row["id"]))
+    if rows:
+        logger.info(f"Migração: hash de deduplicação recalculado para {len(rows)} evidência(s).")
+
+
+def init_db(forcar: bool = False) -> None:
+    """Cria banco e tabelas se não existirem.
+
+    Executa uma única vez por processo e arquivo de banco (reruns do
+    Streamlit não repetem o DDL); `forcar=True` refaz DDL e migrações.
+    """
+    with _lock_init:
+        if CAMINHO_DB in _bancos_inicializados and not forcar:
+            return
+        try:
+            # PRAGMA journal_mode não pode rodar dentro de transação
+            _conexao().executescript(_DDL)
+            with _conn() as con:
+                _migrar_schema(con)
+            _bancos_inicializados.add(CAMINHO_DB)
+            logger.debug(f"Banco inicializado: {CAMINHO_DB}")
+        except Exception as exc:
+            logger.error(f"Falha ao inicializar banco: {exc}")
+            raise
+
+
+def banco_inicializado() -> bool:
+    """True se `init_db` já rodou neste processo para o CAMINHO_DB atual."""
+    return CAMINHO_DB in _bancos_inicializados
 
 
 # ---------------------------------------------------------------------------
 # Runs
 # ---------------------------------------------------------------------------
 
-def criar_run(nome: str, arquivo_origem: str = None, email_destino: str = None) -> str:
+def criar_run(nome: str, arquivo_origem: str = None, email_destino: str = None,
+              entrada_sha256: str = None, total_paginas: int = None) -> str:
     """Insere nova run com status RUNNING. Retorna run_id (UUID)."""
     run_id = str(uuid.uuid4())
     with _conn() as con:
         con.execute(
-            """INSERT INTO runs (run_id, nome, arquivo_origem, started_at, status, email_destino)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (run_id, nome, arquivo_origem, _now_iso(), RUN_RUNNING, email_destino),
+            """INSERT INTO runs (run_id, nome, arquivo_origem, started_at, status, email_destino,
+                                 entrada_sha256, total_paginas)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (run_id, nome, arquivo_origem, _now_iso(), RUN_RUNNING, email_destino,
+             entrada_sha256, total_paginas),
         )
     logger.info(f"Run criada: {run_id} | {nome}")
     return run_id
@@ -130,6 +330,44 @@ def finalizar_run(run_id: str, status: str, erro_msg: str = None) -> None:
     logger.info(f"Run finalizada: {run_id} → {status}")
 
 
+def registrar_entrada_run(run_id: str, entrada_sha256: str, total_paginas: int) -> None:
+    """Associa a run ao TXT armazenado por hash (ver `src.entradas`)."""
+    with _conn() as con:
+        con.execute(
+            "UPDATE runs SET entrada_sha256=?, total_paginas=? WHERE run_id=?",
+            (entrada_sha256, total_paginas, run_id),
+        )
+
+
+def registrar_chars_por_token(run_id: str, chars_por_token: float) -> None:
+    """Grava a razão chars/token calibrada do documento da run.
+
+    Passadas seguintes e workers auxiliares empacotam os blocos com ela, sem
+    recalibrar: a divisão em blocos da run não muda entre processos.
+    """
+    with _conn() as con:
+        con.execute("UPDATE runs SET chars_por_token=? WHERE run_id=?", (chars_por_token, run_id))
+
+
+def liberar_auxilio(run_id: str, liberado: bool = True) -> None:
+    """Marca se workers auxiliares já podem reivindicar blocos da run.
+
+    O dono do job libera depois da Fase 1 (resumo SAC gravado em
+    `resumo_processo`), para que os auxiliares usem o mesmo contexto global.
+    """
+    with _conn() as con:
+        con.execute("UPDATE runs SET auxilio_liberado=? WHERE run_id=?", (int(liberado), run_id))
+
+
+def buscar_runs_por_entrada(entrada_sha256: str) -> list[dict]:
+    """Runs com a mesma entrada (upload idêntico), mais recentes primeiro."""
+    with _conn() as con:
+        rows = con.execute(
+            "SELECT * FROM runs WHERE entrada_sha256=? ORDER BY started_at DESC", (entrada_sha256,)
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
 def salvar_resumo_run(run_id: str, resumo: str) -> None:
     """Persiste o resumo do processo (SAC) gerado pelo Agente 1."""
     with _conn() as con:
@@ -139,6 +377,23 @@ def salvar_resumo_run(run_id: str, resumo: str) -> None:
         )
 
 
+def salvar_resumo_documento(doc_hash: str, resumo: str) -> None:
+    """Guarda o resumo SAC pelo hash do texto, para reaproveitar em novos uploads."""
+    with _conn() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO resumos_documento (doc_hash, resumo, criado_em) VALUES (?, ?, ?)",
+            (doc_hash, resumo, _now_iso()),
+        )
+
+
+def get_resumo_documento(doc_hash: str) -> str | None:
+    with _conn() as con:
+        row = con.execute(
+            "SELECT resumo FROM resumos_documento WHERE doc_hash=?", (doc_hash,)
+        ).fetchone()
+    return row["resumo"] if row else None
+
+
 def get_run(run_id: str) -> dict | None:
     with _conn() as con:
         row = con.execute("SELECT * FROM runs WHERE run_id=?", (run_id,)).fetchone()
@@ -146,24 +401,165 @@ def get_run(run_id: str) -> dict | None:
 
 
 def listar_runs() -> list[dict]:
-    """Todas as runs, mais recentes primeiro. Orphan RUNNING → INCOMPLETA."""
+    """Todas as runs, mais recentes primeiro. Orphan RUNNING → INCOMPLETA.
+
+    Runs com job na fila ou em execução (ver `jobs`) continuam RUNNING e
+    trazem `job_status`.
+    """
     with _conn() as con:
         rows = con.execute(
             "SELECT * FROM runs ORDER BY started_at DESC"
         ).fetchall()
+        jobs_ativos = {
+            r["run_id"]: r["status"] for r in con.execute(
+                "SELECT run_id, status FROM jobs WHERE status IN (?, ?)",
+                (JOB_QUEUED, JOB_RUNNING),
+            ).fetchall()
+        }
     result = []
     for r in rows:
         d = dict(r)
-        if d["status"] == RUN_RUNNING and d["finished_at"] is None:
+        d["job_status"] = jobs_ativos.get(d["run_id"])
+        if d["status"] == RUN_RUNNING and d["finished_at"] is None and not d["job_status"]:
             d["status"] = RUN_INCOMPLETA
         result.append(d)
     return result
 
 
 def listar_runs_incompletas() -> list[dict]:
-    """Runs que podem ser retomadas."""
+    """Runs que podem ser retomadas (sem job ativo na fila)."""
     return [r for r in listar_runs()
-            if r["status"] in (RUN_INCOMPLETA, RUN_FAILED, RUN_RUNNING)]
+            if r["status"] in (RUN_INCOMPLETA, RUN_FAILED, RUN_RUNNING) and not r["job_status"]]
+
+
+# ---------------------------------------------------------------------------
+# Jobs (fila de execuções atendida por `python -m src.worker`)
+# ---------------------------------------------------------------------------
+
+def _job_dict(row) -> dict | None:
+    if row is None:
+        return None
+    d = dict(row)
+    d["parametros"] = json.loads(d["parametros"] or "{}")
+    return d
+
+
+def enfileirar_job(run_id: str, parametros: dict | None = None) -> str:
+    """Enfileira a execução de uma run. Retorna job_id.
+
+    Se a run já tem job QUEUED/RUNNING, devolve esse job em vez de duplicá-lo.
+    """
+    with _conn(imediata=True) as con:
+        row = con.execute(
+            "SELECT job_id FROM jobs WHERE run_id=? AND status IN (?, ?)",
+            (run_id, JOB_QUEUED, JOB_RUNNING),
+        ).fetchone()
+        if row:
+            return row["job_id"]
+        job_id = str(uuid.uuid4())
+        con.execute(
+            """INSERT INTO jobs (job_id, run_id, status, parametros, criado_em)
+               VALUES (?, ?, ?, ?, ?)""",
+            (job_id, run_id, JOB_QUEUED, json.dumps(parametros or {}, ensure_ascii=False), _now_iso()),
+        )
+    logger.info(f"Job enfileirado: {job_id} | run {run_id}")
+    return job_id
+
+
+def reivindicar_job(worker: str) -> dict | None:
+    """Pega atomicamente o job QUEUED mais antigo e o marca RUNNING para `worker`.
+
+    Seguro entre processos: dois workers nunca recebem o mesmo job.
+    """
+    agora = _now_iso()
+    with _conn(imediata=True) as con:
+        row = con.execute(
+            """UPDATE jobs
+               SET status=?, worker=?, iniciado_em=?, heartbeat_em=?, tentativas=tentativas+1
+               WHERE job_id = (SELECT job_id FROM jobs WHERE status=?
+                               ORDER BY criado_em, rowid LIMIT 1)
+               RETURNING *""",
+            (JOB_RUNNING, worker, agora, agora, JOB_QUEUED),
+        ).fetchone()
+    return _job_dict(row)
+
+
+def registrar_heartbeat_job(job_id: str) -> None:
+    with _conn() as con:
+        con.execute("UPDATE jobs SET heartbeat_em=? WHERE job_id=?", (_now_iso(), job_id))
+
+
+def finalizar_job(job_id: str, status: str, erro_msg: str = None) -> None:
+    """Marca job como DONE ou FAILED."""
+    with _conn() as con:
+        con.execute(
+            "UPDATE jobs SET status=?, finalizado_em=?, erro_msg=? WHERE job_id=?",
+            (status, _now_iso(), erro_msg, job_id),
+        )
+    logger.info(f"Job finalizado: {job_id} → {status}")
+
+
+def reenfileirar_jobs_orfaos(timeout_s: float) -> int:
+    """Devolve à fila jobs RUNNING sem batimento há mais de `timeout_s` (worker caiu).
+
+    Após JOB_MAX_TENTATIVAS execuções o job é marcado FAILED. Retorna quantos
+    jobs voltaram à fila.
+    """
+    limite = _iso_em(-timeout_s)
+    with _conn(imediata=True) as con:
+        orfaos = [dict(r) for r in con.execute(
+            "SELECT job_id, run_id, tentativas FROM jobs WHERE status=? AND heartbeat_em < ?",
+            (JOB_RUNNING, limite),
+        ).fetchall()]
+        for job in orfaos:
+            if job["tentativas"] >= JOB_MAX_TENTATIVAS:
+                con.execute(
+                    "UPDATE jobs SET status=?, finalizado_em=?, erro_msg=? WHERE job_id=?",
+                    (JOB_FAILED, _now_iso(), "Worker parou de responder", job["job_id"]),
+                )
+            else:
+                con.execute(
+                    "UPDATE jobs SET status=?, worker=NULL WHERE job_id=?",
+                    (JOB_QUEUED, job["job_id"]),
+                )
+    reenfileirados = sum(1 for j in orfaos if j["tentativas"] < JOB_MAX_TENTATIVAS)
+    if orfaos:
+        logger.warning(f"Jobs órfãos: {reenfileirados} reenfileirado(s), "
+                       f"{len(orfaos) - reenfileirados} esgotado(s)")
+    return reenfileirados
+
+
+def job_com_blocos_disponiveis(excluir_worker: str | None = None) -> dict | None:
+    """Job RUNNING (de outro worker) cuja run, já liberada para auxílio, tem blocos a reivindicar."""
+    with _conn() as con:
+        row = con.execute(
+            """SELECT j.* FROM jobs j JOIN runs r ON r.run_id=j.run_id
+               WHERE j.status=? AND COALESCE(j.worker, '') != ? AND r.auxilio_liberado=1
+                 AND EXISTS (SELECT 1 FROM run_items i
+                             WHERE i.run_id=j.run_id
+                               AND (i.status=? OR (i.status=? AND i.lease_expira_em <= ?)))
+               ORDER BY j.criado_em LIMIT 1""",
+            (JOB_RUNNING, excluir_worker or "", ITEM_PENDENTE, ITEM_LEASED, _now_iso()),
+        ).fetchone()
+    return _job_dict(row)
+
+
+def get_job(job_id: str) -> dict | None:
+    with _conn() as con:
+        row = con.execute("SELECT * FROM jobs WHERE job_id=?", (job_id,)).fetchone()
+    return _job_dict(row)
+
+
+def listar_jobs(status: str | None = None) -> list[dict]:
+    """Jobs (opcionalmente filtrados por status), mais antigos primeiro."""
+    with _conn() as con:
+        if status:
+            rows = con.execute(
+                "SELECT * FROM jobs WHERE status=? ORDER BY criado_em, rowid", (status,)
+            ).fetchall()
+        else:
+            rows = con.execute("SELECT * FROM jobs ORDER BY criado_em, rowid").fetchall()
+    return [_job_dict(r) for r in rows]
 
 
 # ---------------------------------------------------------------------------
@@ -172,15 +568,208 @@ def listar_runs_incompletas() -> list[dict]:
 
 def salvar_run_item(run_id: str, bloco_id: int, status: str,
                     evidencias_count: int = 0, erro_msg: str = None) -> None:
+    """Grava o resultado do bloco e encerra o lease (fingerprint e páginas são mantidos)."""
     with _conn() as con:
         con.execute(
-            """INSERT OR REPLACE INTO run_items
+            """INSERT INTO run_items
                (run_id, bloco_id, status, evidencias_count, erro_msg, processed_at)
-               VALUES (?, ?, ?, ?, ?, ?)""",
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (run_id, bloco_id) DO UPDATE SET
+                   status=excluded.status, evidencias_count=excluded.evidencias_count,
+                   erro_msg=excluded.erro_msg, processed_at=excluded.processed_at,
+                   lease_owner=NULL, lease_expira_em=NULL""",
             (run_id, bloco_id, status, evidencias_count, erro_msg, _now_iso()),
         )
 
 
+def sincronizar_fingerprints(run_id: str, digitais: list[tuple], lease_owner: str | None = None,
+                             divisao: str = "") -> set:
+    """Casa os blocos atuais da run com run_items pela fingerprint do texto.
+
+    `digitais[i]` é (fingerprint, pagina_inicial, pagina_final) do bloco i.
+    Uma linha com a mesma fingerprint na posição é mantida; se o texto mudou
+    de posição, o bloco herda o OK de qualquer linha da run com a mesma
+    fingerprint, senão volta a PENDING. Linhas sem fingerprint (de runs
+    anteriores) só casam pela posição se `divisao` (a `assinatura_divisao`
+    dos blocos) e o total de blocos forem os gravados na run; senão são
+    reprocessadas. Linhas além do total atual são removidas. Retorna os
+    bloco_ids OK.
+
+    Só quem conduz a run (o dono do job, ou a interface sem worker) deve
+    chamar esta função. Blocos LEASED por outro `lease_owner` com lease ainda
+    válido nunca são alterados nem removidos.
+    """
+    agora = _now_iso()
+    with _conn(imediata=True) as con:
+        linhas = con.execute(
+            """SELECT bloco_id, status, evidencias_count, fingerprint, pagina_inicial, pagina_final,
+                      lease_owner, lease_expira_em
+               FROM run_items WHERE run_id=?""",
+            (run_id,),
+        ).fetchall()
+        alheios = {
+            r["bloco_id"] for r in linhas
+            if r["status"] == ITEM_LEASED and r["lease_owner"] != lease_owner
+            and (r["lease_expira_em"] or "") > agora
+        }
+        atuais = {r["bloco_id"]: r for r in linhas}
+        run = con.execute("SELECT total_blocos, divisao_blocos FROM runs WHERE run_id=?", (run_id,)).fetchone()
+        mesma_divisao = bool(divisao) and run is not None and (
+            (run["divisao_blocos"], run["total_blocos"]) == (divisao, len(digitais)))
+        ok_por_fingerprint = {
+            r["fingerprint"]: r["evidencias_count"] for r in atuais.values()
+            if r["status"] == ITEM_OK and r["fingerprint"]
+        }
+        processados, marcar, regravar = set(), [], []
+        for bloco_id, (fingerprint, pagina_inicial, pagina_final) in enumerate(digitais):
+            atual = atuais.get(bloco_id)
+            if bloco_id in alheios and atual["fingerprint"] != fingerprint:
+                logger.warning(f"Run {run_id}: bloco {bloco_id} reservado por {atual['lease_owner']} "
+                               f"com outro texto — mantido até o lease terminar.")
+                continue
+            if atual is not None and (atual["fingerprint"] == fingerprint
+                                      or (atual["fingerprint"] is None and mesma_divisao)):
+                if (atual["fingerprint"], atual["pagina_inicial"], atual["pagina_final"]) != (
+                        fingerprint, pagina_inicial, pagina_final):
+                    marcar.append((fingerprint, pagina_inicial, pagina_final, run_id, bloco_id))
+                if atual["status"] == ITEM_OK:
+                    processados.add(bloco_id)
+                continue
+            if fingerprint in ok_por_fingerprint:
+                status, evidencias_count = ITEM_OK, ok_por_fingerprint[fingerprint]
+                processados.add(bloco_id)
+            else:
+                status, evidencias_count = ITEM_PENDENTE, 0
+            regravar.append((run_id, bloco_id, status, evidencias_count, agora,
+                             fingerprint, pagina_inicial, pagina_final))
+        con.executemany(
+            """UPDATE run_items SET fingerprint=?, pagina_inicial=?, pagina_final=?
+               WHERE run_id=? AND bloco_id=?""",
+            marcar,
+        )
+        con.executemany(
+            """INSERT OR REPLACE INTO run_items
+               (run_id, bloco_id, status, evidencias_count, processed_at, fingerprint, pagina_inicial, pagina_final)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            regravar,
+        )
+        removidas = con.execute(
+            """DELETE FROM run_items WHERE run_id=? AND bloco_id>=?
+               AND NOT (status=? AND IFNULL(lease_owner, '') <> ? AND lease_expira_em > ?)""",
+            (run_id, len(digitais), ITEM_LEASED, lease_owner or "", agora),
+        ).rowcount
+        if divisao:
+            con.execute("UPDATE runs SET divisao_blocos=? WHERE run_id=?", (divisao, run_id))
+    remapeados = sum(1 for r in regravar if r[2] == ITEM_OK)
+    if remapeados or removidas or any(b in atuais for _, b, *_ in regravar):
+        logger.info(
+            f"Run {run_id}: divisão em blocos mudou — {remapeados} bloco(s) já processado(s) "
+            f"reencontrado(s) pela fingerprint, {len(regravar) - remapeados} a (re)processar, "
+            f"{removidas} posição(ões) removida(s)."
+        )
+    return processados
+
+
+def conferir_fingerprints(run_id: str, fingerprints: list[str]) -> bool:
+    """True se run_items da run tem exatamente estas fingerprints, na ordem dos blocos.
+
+    Usada por workers auxiliares: só ajudam uma run cuja divisão em blocos
+    coincide com a que o dono do job gravou.
+    """
+    with _conn() as con:
+        rows = con.execute(
+            "SELECT fingerprint FROM run_items WHERE run_id=? ORDER BY bloco_id", (run_id,),
+        ).fetchall()
+    return [r["fingerprint"] for r in rows] == list(fingerprints)
+
+
+def semear_run_items(run_id: str, total_blocos: int) -> None:
+    """Cria como PENDING os blocos da run que ainda não têm run_item."""
+    agora = _now_iso()
+    with _conn() as con:
+        con.executemany(
+            """INSERT OR IGNORE INTO run_items (run_id, bloco_id, status, processed_at)
+               VALUES (?, ?, ?, ?)""",
+            [(run_id, i, ITEM_PENDENTE, agora) for i in range(total_blocos)],
+        )
+
+
+def reivindicar_blocos(run_id: str, owner: str, quantidade: int, duracao_s: float) -> list[int]:
+    """Reserva atomicamente até `quantidade` blocos PENDING (ou com lease vencido).
+
+    Os blocos passam a LEASED para `owner` por `duracao_s` segundos; nenhum
+    outro processo os recebe enquanto o lease valer. Retorna os bloco_ids em ordem.
+    """
+    if quantidade <= 0:
+        return []
+    agora = _now_iso()
+    with _conn(imediata=True) as con:
+        rows = con.execute(
+            """UPDATE run_items
+               SET status=?, lease_owner=?, lease_expira_em=?, processed_at=?
+               WHERE run_id=? AND bloco_id IN (
+                   SELECT bloco_id FROM run_items
+                   WHERE run_id=? AND (status=? OR (status=? AND lease_expira_em <= ?))
+                   ORDER BY bloco_id LIMIT ?)
+               RETURNING bloco_id""",
+            (ITEM_LEASED, owner, _iso_em(duracao_s), agora,
+             run_id, run_id, ITEM_PENDENTE, ITEM_LEASED, agora, quantidade),
+        ).fetchall()
+    return sorted(r["bloco_id"] for r in rows)
+
+
+def renovar_leases(run_id: str, owner: str, duracao_s: float) -> int:
+    """Estende por `duracao_s` os leases de `owner` na run. Retorna quantos renovou."""
+    with _conn() as con:
+        cur = con.execute(
+            """UPDATE run_items SET lease_expira_em=?
+               WHERE run_id=? AND status=? AND lease_owner=?""",
+            (_iso_em(duracao_s), run_id, ITEM_LEASED, owner),
+        )
+    return cur.rowcount
+
+
+def liberar_leases(run_id: str, owner: str) -> int:
+    """Devolve a PENDING os blocos ainda reservados por `owner` (ex.: run interrompida)."""
+    with _conn() as con:
+        cur = con.execute(
+            """UPDATE run_items SET status=?, lease_owner=NULL, lease_expira_em=NULL
+               WHERE run_id=? AND status=? AND lease_owner=?""",
+            (ITEM_PENDENTE, run_id, ITEM_LEASED, owner),
+        )
+    return cur.rowcount
+
+
+def reabrir_blocos_com_erro(run_id: str) -> int:
+    """Volta a PENDING os blocos com erro ou parciais, para a nova passada reprocessá-los."""
+    with _conn() as con:
+        cur = con.execute(
+            "UPDATE run_items SET status=?, erro_msg=NULL WHERE run_id=? AND status IN (?, ?, ?)",
+            (ITEM_PENDENTE, run_id, ITEM_ERRO_LLM, ITEM_ERRO_PARSE, ITEM_PARCIAL),
+        )
+    return cur.rowcount
+
+
+def blocos_em_aberto(run_id: str) -> int:
+    """Blocos PENDING ou LEASED (ainda sem resultado) da run."""
+    with _conn() as con:
+        row = con.execute(
+            "SELECT COUNT(*) AS n FROM run_items WHERE run_id=? AND status IN (?, ?)",
+            (run_id, ITEM_PENDENTE, ITEM_LEASED),
+        ).fetchone()
+    return row["n"]
+
+
+def contar_blocos_finalizados(run_id: str) -> int:
+    """Blocos com resultado (OK ou erro) da run."""
+    with _conn() as con:
+        row = con.execute(
+            "SELECT COUNT(*) AS n FROM run_items WHERE run_id=? AND status NOT IN (?, ?)",
+            (run_id, ITEM_PENDENTE, ITEM_LEASED),
+        ).fetchone()
+    return row["n"]
+
+
 def get_processed_block_ids(run_id: str) -> set:
     """Retorna set de bloco_ids já processados com status OK."""
     with _conn() as con:
@@ -189,3 +778,106 @@ def get_processed_block_ids(run_id: str) -> set:
             (run_id, ITEM_OK),
         ).fetchall()
     return {r["bloco_id"] for r in rows}
+
+
+# ---------------------------------------------------------------------------
+# Evidências (append-only; a planilha é gerada a partir daqui)
+# ---------------------------------------------------------------------------
+
+def hash_evidencia(linha: dict) -> str:
+    """SHA-256 dos campos de evidência normalizados — chave de deduplicação da run."""
+    return hash_normalizado(linha, _CAMPOS_EVIDENCIA)
+
+
+def inserir_evidencias(run_id: str, bloco_id: int | None, linhas: list[dict]) -> list[dict]:
+    """Acrescenta as evidências de um bloco em uma transação, ignorando duplicatas da run.
+
+    `linhas` usa os cabeçalhos da planilha. Retorna só as linhas efetivamente
+    inseridas (novas), na ordem recebida.
+    """
+    if not linhas:
+        return []
+    colunas = ["run_id", "bloco_id", "hash", *_CAMPOS_EVIDENCIA.values(), *_CAMPOS_META.values()]
+    sql = (
+        f"INSERT OR IGNORE INTO evidencias ({', '.join(colunas)}) "
+        f"VALUES ({', '.join('?' for _ in colunas)})"
+    )
+    inseridas = []
+    with _conn() as con:
+        for linha in linhas:
+            valores = [linha.get(c, "") for c in (*_CAMPOS_EVIDENCIA, *_CAMPOS_META)]
+            cur = con.execute(sql, (run_id, bloco_id, hash_evidencia(linha), *valores))
+            if cur.rowcount:
+                inseridas.append(linha)
+    return inseridas
+
+
+def contar_evidencias(run_id: str) -> int:
+    with _conn() as con:
+        row = con.execute("SELECT COUNT(*) AS n FROM evidencias WHERE run_id=?", (run_id,)).fetchone()
+    return row["n"]
+
+
+def iterar_evidencias(run_id: str, lote: int = 1000) -> Iterator[dict]:
+    """Percorre as evidências da run na ordem de inserção, `lote` linhas por vez.
+
+    Cada linha vem com os cabeçalhos da planilha (COLUNAS_PADRAO).
+    """
+    for _, linha in iterar_evidencias_com_id(run_id, lote=lote):
+        yield linha
+
+
+def iterar_evidencias_com_id(run_id: str, apos_id: int = 0, lote: int = 1000) -> Iterator[tuple[int, dict]]:
+    """Como `iterar_evidencias`, com o id de cada linha e só as de id > `apos_id`.
+
+    Permite acompanhar a tabela por cursor, inclusive linhas gravadas por
+    outros processos (workers auxiliares).
+    """
+    campos = {**_CAMPOS_EVIDENCIA, "Run ID": "run_id", **_CAMPOS_META}
+    ultimo_id = apos_id
+    while True:
+        with _conn() as con:
+            rows = con.execute(
+                f"SELECT id, {', '.join(campos.values())} FROM evidencias "
+                "WHERE run_id=? AND id>? ORDER BY id LIMIT ?",
+                (run_id, ultimo_id, lote),
+            ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield row["id"], {cabecalho: row[coluna] for cabecalho, coluna in campos.items()}
+        ultimo_id = rows[-1]["id"]
+
+
+# ---------------------------------------------------------------------------
+# Telemetria (uma linha por tentativa de chamada à API; ver src/telemetria.py)
+# ---------------------------------------------------------------------------
+
+_COLUNAS_TENTATIVA = (
+    "run_id", "bloco_id", "rotulo", "tentativa", "modelo", "streaming", "inicio_em", "duracao_s",
+    "espera_limitador_s", "tokens_prompt", "tokens_saida", "tokens_raciocinio", "tokens_cache",
+    "codigo_http", "classe_erro", "erro_msg", "finish_reason",
+)
+
+
+def inserir_tentativas_api(registros: list[dict]) -> None:
+    if not registros:
+        return
+    sql = (
+        f"INSERT INTO tentativas_api ({', '.join(_COLUNAS_TENTATIVA)}) "
+        f"VALUES ({', '.join('?' for _ in _COLUNAS_TENTATIVA)})"
+    )
+    with _conn() as con:
+        con.executemany(sql, [tuple(r.get(c) for c in _COLUNAS_TENTATIVA) for r in registros])
+
+
+def listar_tentativas_api(run_id: str | None = None) -> list[dict]:
+    """Tentativas registradas (da run, ou todas), na ordem em que foram gravadas."""
+    with _conn() as con:
+        if run_id is None:
+            rows = con.execute("SELECT * FROM tentativas_api ORDER BY id").fetchall()
+        else:
+            rows = con.execute(
+                "SELECT * FROM tentativas_api WHERE run_id=? ORDER BY id", (run_id,)
+            ).fetchall()
+    return [dict(r) for r in rows]
@@ -1,7 +1,16 @@
 import os
+import csv
+import gzip
+import json
+import threading
 from datetime import datetime, timezone
 import pandas as pd
-from config import CAMINHO_SAIDA, CAMINHO_RUNS
+from loguru import logger
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from collections import OrderedDict
+from config import CAMINHO_SAIDA, CAMINHO_RUNS, DEDUP_MINHASH, DEDUP_MINHASH_LIMIAR
+from src import persistence
+from src.dedup import IndiceDedup
 
 # ---------------------------------------------------------------------------
 # Schema
@@ -23,6 +32,16 @@ COLUNAS_META = [
 COLUNAS_PADRAO = COLUNAS_EVIDENCIA + COLUNAS_META
 
 NOME_ARQUIVO_EXCEL = "evidencias.xlsx"
+NOME_RELATORIO_TRIAGEM = "paginas_ignoradas.csv"
+NOME_ABA_EVIDENCIAS = "Sheet1"  # nome histórico (padrão do pandas.to_excel)
+
+# Formatos colunares/texto gerados junto com o Excel (mesmo schema COLUNAS_PADRAO)
+FORMATOS_EXPORTACAO = {
+    "parquet": "evidencias.parquet",
+    "csv": "evidencias.csv.gz",
+    "jsonl": "evidencias.jsonl",
+}
+LINHAS_POR_GRUPO_PARQUET = 5000
 
 
 # ---------------------------------------------------------------------------
@@ -35,19 +54,62 @@ def get_caminho_excel(run_id: str) -> str:
     return os.path.join(pasta, NOME_ARQUIVO_EXCEL)
 
 
+def get_caminho_relatorio_triagem(run_id: str) -> str:
+    """Relatório das páginas descartadas pela pré-triagem local (`src.prefiltro`)."""
+    pasta = os.path.join(CAMINHO_RUNS, run_id)
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, NOME_RELATORIO_TRIAGEM)
+
+
+def get_caminho_exportacao(run_id: str, formato: str) -> str:
+    """Caminho do export `formato` ('parquet' | 'csv' | 'jsonl') da run."""
+    pasta = os.path.join(CAMINHO_RUNS, run_id)
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, FORMATOS_EXPORTACAO[formato])
+
+
 # ---------------------------------------------------------------------------
 # Criação / inicialização
 # ---------------------------------------------------------------------------
 
+def _caminho_temporario(caminho: str) -> str:
+    """Temporário exclusivo do processo/thread, para gravar e depois `os.replace`.
+
+    Workers distintos (processos ou threads) podem gravar a mesma run ao mesmo tempo.
+    """
+    return f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
 def inicializar_planilha(run_id: str) -> str:
-    """Cria Excel isolado para a run. Retorna caminho do arquivo."""
+    """Cria Excel isolado para a run. Retorna caminho do arquivo.
+
+    Runs anteriores à tabela `evidencias` guardavam as linhas só no Excel: na
+    retomada, essas linhas são importadas uma vez para o banco.
+    """
     caminho = get_caminho_excel(run_id)
     if not os.path.exists(caminho):
-        df = pd.DataFrame(columns=COLUNAS_PADRAO)
-        df.to_excel(caminho, index=False)
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        wb.create_sheet(NOME_ABA_EVIDENCIAS).append(COLUNAS_PADRAO)
+        temporario = _caminho_temporario(caminho)
+        wb.save(temporario)
+        os.replace(temporario, caminho)
+    elif persistence.contar_evidencias(run_id) == 0:
+        _importar_excel_legado(run_id, caminho)
     return caminho
 
 
+def _importar_excel_legado(run_id: str, caminho: str) -> None:
+    df = ler_evidencias_df(caminho)
+    if df.empty:
+        return
+    df = df.reindex(columns=COLUNAS_PADRAO).fillna("").astype(str)
+    inseridas = persistence.inserir_evidencias(run_id, None, df.to_dict("records"))
+    descartar_indice_dedup(run_id)
+    logger.info(f"Migração: {len(inseridas)} evidência(s) do Excel legado importada(s) para o banco.")
+
+
 # ---------------------------------------------------------------------------
 # Inserção
 # ---------------------------------------------------------------------------
@@ -62,30 +124,74 @@ def _preparar_linha(dados_linha: dict, run_id: str, arquivo_origem: str, ts: str
     return row
 
 
-def adicionar_linhas_excel(lista_dados: list[dict], run_id: str, arquivo_origem: str = "") -> int:
-    """
-    Escreve todas as evidências de um bloco de uma vez (batch).
-    Muito mais eficiente que chamar linha a linha.
-    Retorna quantidade de linhas adicionadas após deduplicação.
+def registrar_evidencias(lista_dados: list[dict], run_id: str, arquivo_origem: str = "",
+                         bloco_id: int | None = None) -> list[dict]:
+    """Acrescenta as evidências de um bloco à tabela `evidencias` (O(1) por bloco).
+
+    Duplicatas são descartadas em O(1) por linha pelo índice em memória da run
+    (hash dos campos normalizados; com DEDUP_MINHASH, também trechos quase
+    idênticos), que antes acompanha o que outros processos gravaram; a
+    restrição UNIQUE do banco é a última barreira (só para duplicatas exatas
+    gravadas por outro processo no mesmo instante).
+    O Excel não é tocado: é gerado por `exportar_excel` no fim da run ou sob
+    demanda. Se a run tiver exportações abertas (`abrir_exportacoes`), elas
+    são postas em dia com o banco (as linhas novas entram nelas).
+    Retorna as linhas efetivamente inseridas.
     """
     if not lista_dados:
-        return 0
-
-    caminho = get_caminho_excel(run_id)
+        return []
     ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    indice = _indice_dedup(run_id)
+    novas_linhas = indice.filtrar([_preparar_linha(d, run_id, arquivo_origem, ts) for d in lista_dados])
+    try:
+        inseridas = persistence.inserir_evidencias(run_id, bloco_id, novas_linhas)
+    except Exception:
+        descartar_indice_dedup(run_id)
+        raise
+    if inseridas:
+        atualizar_exportacoes(run_id)
+    return inseridas
+
+
+MAX_INDICES_DEDUP = 8
+_indices_dedup: "OrderedDict[str, tuple[IndiceDedup, int]]" = OrderedDict()
+_lock_indices_dedup = threading.Lock()
+
+
+def _indice_dedup(run_id: str) -> IndiceDedup:
+    """Índice de dedup da run, posto em dia com a tabela `evidencias` a cada uso.
+
+    Na primeira vez (retomada, reinício do processo ou descarte pelo LRU) é
+    montado do banco; depois recebe só as linhas de id maior que a última
+    vista, inclusive as gravadas por outros processos (workers auxiliares),
+    para que quase-duplicatas entre processos também sejam descartadas.
+    O LRU é compartilhado por threads (pool de blocos, `asyncio.to_thread`,
+    sessões do Streamlit): consulta, montagem e descarte ficam sob um lock,
+    para que nunca existam dois índices da mesma run.
+    """
+    with _lock_indices_dedup:
+        indice, ultimo_id = _indices_dedup.get(run_id, (None, 0))
+        if indice is None:
+            indice = IndiceDedup(COLUNAS_EVIDENCIA, usar_minhash=DEDUP_MINHASH, limiar=DEDUP_MINHASH_LIMIAR)
+        for ultimo_id, linha in persistence.iterar_evidencias_com_id(run_id, ultimo_id):
+            indice.adicionar_se_nova(linha)
+        _indices_dedup[run_id] = (indice, ultimo_id)
+        _indices_dedup.move_to_end(run_id)
+        while len(_indices_dedup) > MAX_INDICES_DEDUP:
+            _indices_dedup.popitem(last=False)
+        return indice
+
+
+def descartar_indice_dedup(run_id: str) -> None:
+    """Invalida o índice em memória (ex.: a transação que gravava as linhas
+    marcadas nele sofreu ROLLBACK); será remontado do banco no próximo uso."""
+    with _lock_indices_dedup:
+        _indices_dedup.pop(run_id, None)
 
-    novas_linhas = [_preparar_linha(d, run_id, arquivo_origem, ts) for d in lista_dados]
-    df_novas = pd.DataFrame(novas_linhas)[COLUNAS_PADRAO]
-
-    df_existente = pd.read_excel(caminho) if os.path.exists(caminho) else pd.DataFrame(columns=COLUNAS_PADRAO)
-    antes = len(df_existente)
-
-    df_atualizado = pd.concat([df_existente, df_novas], ignore_index=True)
-    df_atualizado.dropna(how="all", inplace=True)
-    df_atualizado.drop_duplicates(subset=COLUNAS_EVIDENCIA, keep="first", inplace=True)
-    df_atualizado.to_excel(caminho, index=False)
 
-    return len(df_atualizado) - antes
+def adicionar_linhas_excel(lista_dados: list[dict], run_id: str, arquivo_origem: str = "") -> int:
+    """Compatibilidade: registra as evidências e retorna quantas eram novas."""
+    return len(registrar_evidencias(lista_dados, run_id, arquivo_origem))
 
 
 def adicionar_linha_excel(dados_linha: dict, run_id: str, arquivo_origem: str = "") -> None:
@@ -93,6 +199,174 @@ def adicionar_linha_excel(dados_linha: dict, run_id: str, arquivo_origem: str =
     adicionar_linhas_excel([dados_linha], run_id, arquivo_origem)
 
 
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+def evidencias_df(run_id: str) -> pd.DataFrame:
+    """Evidências da run lidas do banco, nas colunas da planilha."""
+    return pd.DataFrame(list(persistence.iterar_evidencias(run_id)), columns=COLUNAS_PADRAO)
+
+
+def exportar_excel(run_id: str, resumo: str = "") -> str:
+    """Gera evidencias.xlsx a partir do banco (fim da run ou sob demanda).
+
+    Usa um workbook write-only do openpyxl: as linhas vêm do banco em lotes e
+    vão direto para o arquivo, então a memória não cresce com o número de
+    evidências. Com `resumo`, a aba 'Resumo' é escrita primeiro na mesma
+    passada (o arquivo nunca é recarregado). A gravação é atômica.
+    Retorna o caminho do arquivo.
+    """
+    from openpyxl import Workbook
+
+    caminho = get_caminho_excel(run_id)
+    wb = Workbook(write_only=True)
+    if resumo and resumo.strip():
+        _escrever_aba_resumo_write_only(wb, resumo)
+
+    ws = wb.create_sheet(NOME_ABA_EVIDENCIAS)
+    ws.append(COLUNAS_PADRAO)
+    for linha in persistence.iterar_evidencias(run_id):
+        ws.append([_valor_celula(linha[c]) for c in COLUNAS_PADRAO])
+
+    temporario = _caminho_temporario(caminho)
+    wb.save(temporario)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+class ExportadorIncremental:
+    """Parquet, CSV gzip e JSONL da run, escritos à medida que os blocos terminam.
+
+    Ao abrir, os arquivos são recriados com as evidências já gravadas no banco
+    (retomada); depois `acompanhar_banco()` só acrescenta as linhas de id
+    maior que a última exportada, venham deste processo ou de workers
+    auxiliares. CSV e JSONL ficam legíveis durante a run; o Parquet só é
+    válido após `fechar()` (o rodapé é escrito no fechamento). `caminhos`
+    ({formato: caminho}) substitui os arquivos padrão da run.
+    """
+
+    def __init__(self, run_id: str, caminhos: dict[str, str] | None = None):
+        self.run_id = run_id
+        caminhos = caminhos or {f: get_caminho_exportacao(run_id, f) for f in FORMATOS_EXPORTACAO}
+        self._buffer_parquet: list[dict] = []
+        self._parquet = None
+        self._schema = None
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._schema = pa.schema([(c, pa.string()) for c in COLUNAS_PADRAO])
+            self._parquet = pq.ParquetWriter(caminhos["parquet"], self._schema)
+        except ImportError:
+            logger.warning("pyarrow não instalado — exportação Parquet desativada.")
+
+        self._csv_arquivo = gzip.open(caminhos["csv"], "wt", encoding="utf-8", newline="")
+        self._csv = csv.DictWriter(self._csv_arquivo, fieldnames=COLUNAS_PADRAO)
+        self._csv.writeheader()
+        self._jsonl = open(caminhos["jsonl"], "w", encoding="utf-8")
+        self._ultimo_id = 0
+        self._lock = threading.Lock()
+        self.acompanhar_banco()
+
+    def acompanhar_banco(self) -> None:
+        """Acrescenta as evidências gravadas no banco desde a última exportada."""
+        with self._lock:
+            lote = []
+            for self._ultimo_id, linha in persistence.iterar_evidencias_com_id(self.run_id, self._ultimo_id):
+                lote.append(linha)
+                if len(lote) >= LINHAS_POR_GRUPO_PARQUET:
+                    self.acrescentar(lote)
+                    lote = []
+            self.acrescentar(lote)
+
+    def acrescentar(self, linhas: list[dict]) -> None:
+        if not linhas:
+            return
+        for linha in linhas:
+            registro = {c: "" if linha.get(c) is None else str(linha.get(c)) for c in COLUNAS_PADRAO}
+            self._csv.writerow(registro)
+            self._jsonl.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            if self._parquet is not None:
+                self._buffer_parquet.append(registro)
+        self._csv_arquivo.flush()
+        self._jsonl.flush()
+        if len(self._buffer_parquet) >= LINHAS_POR_GRUPO_PARQUET:
+            self._descarregar_parquet()
+
+    def _descarregar_parquet(self) -> None:
+        if self._parquet is None or not self._buffer_parquet:
+            return
+        import pyarrow as pa
+        self._parquet.write_table(pa.Table.from_pylist(self._buffer_parquet, schema=self._schema))
+        self._buffer_parquet = []
+
+    def fechar(self) -> None:
+        self._descarregar_parquet()
+        if self._parquet is not None:
+            self._parquet.close()
+        self._csv_arquivo.close()
+        self._jsonl.close()
+
+
+_exportadores: dict[str, ExportadorIncremental] = {}
+
+
+def abrir_exportacoes(run_id: str) -> None:
+    """Abre os exports incrementais da run; `registrar_evidencias` passa a alimentá-los."""
+    fechar_exportacoes(run_id)
+    _exportadores[run_id] = ExportadorIncremental(run_id)
+
+
+def atualizar_exportacoes(run_id: str) -> None:
+    """Põe os exports abertos da run em dia com o banco (no-op se não houver)."""
+    exportador = _exportadores.get(run_id)
+    if exportador:
+        exportador.acompanhar_banco()
+
+
+def fechar_exportacoes(run_id: str) -> None:
+    exportador = _exportadores.pop(run_id, None)
+    if exportador:
+        exportador.acompanhar_banco()
+        exportador.fechar()
+
+
+def exportar_formatos(run_id: str) -> dict[str, str]:
+    """Regera Parquet/CSV/JSONL a partir do banco (sob demanda). Retorna {formato: caminho}.
+
+    Grava em temporários e troca os arquivos com `os.replace`. Se a run tem
+    exports incrementais abertos neste processo, eles não são tocados: CSV e
+    JSONL já estão em dia e o Parquet só fica válido quando a run fecha.
+    """
+    if run_id in _exportadores:
+        logger.info(f"Run {run_id}: exports incrementais em andamento — mantidos como estão.")
+        return {f: c for f, c in caminhos_exportacao_existentes(run_id).items() if f != "parquet"}
+    finais = {f: get_caminho_exportacao(run_id, f) for f in FORMATOS_EXPORTACAO}
+    temporarios = {f: _caminho_temporario(c) for f, c in finais.items()}
+    try:
+        ExportadorIncremental(run_id, temporarios).fechar()
+        for formato, temporario in temporarios.items():
+            if os.path.exists(temporario):
+                os.replace(temporario, finais[formato])
+    finally:
+        for temporario in temporarios.values():
+            if os.path.exists(temporario):
+                os.remove(temporario)
+    return caminhos_exportacao_existentes(run_id)
+
+
+def caminhos_exportacao_existentes(run_id: str) -> dict[str, str]:
+    caminhos = {f: get_caminho_exportacao(run_id, f) for f in FORMATOS_EXPORTACAO}
+    return {f: c for f, c in caminhos.items() if os.path.exists(c)}
+
+
+def _valor_celula(valor):
+    # Caracteres de controle são rejeitados pelo openpyxl (IllegalCharacterError)
+    if isinstance(valor, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", valor)
+    return valor
+
+
 def ler_evidencias_df(caminho: str) -> pd.DataFrame:
     """Lê a aba de evidências de forma resiliente.
 
@@ -154,43 +428,28 @@ def _parsear_resumo(resumo: str) -> list[tuple[str, str]]:
     return linhas
 
 
-def escrever_resumo_primeira_aba(run_id: str, resumo: str) -> None:
-    """Grava o resumo do processo (SAC) como PRIMEIRA aba ('Resumo') do Excel da run.
-
-    Deve ser chamada APÓS todas as escritas de evidências, pois
-    `adicionar_linhas_excel` reescreve o arquivo inteiro e apagaria abas extras.
-    Best-effort: qualquer falha apenas gera warning e não derruba o pipeline.
-    """
-    if not resumo or not resumo.strip():
-        return
-
-    caminho = get_caminho_excel(run_id)
-    if not os.path.exists(caminho):
-        return
-
-    try:
-        from openpyxl import load_workbook
-        from openpyxl.styles import Alignment, Font
-
-        wb = load_workbook(caminho)
-        if NOME_ABA_RESUMO in wb.sheetnames:
-            del wb[NOME_ABA_RESUMO]
-
-        ws = wb.create_sheet(NOME_ABA_RESUMO, 0)
-        ws.append(["Campo", "Valor"])
-        ws["A1"].font = Font(bold=True)
-        ws["B1"].font = Font(bold=True)
-
-        for campo, valor in _parsear_resumo(resumo):
-            ws.append([campo, valor])
-
-        ws.column_dimensions["A"].width = 32
-        ws.column_dimensions["B"].width = 90
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-        wb.save(caminho)
-    except Exception as exc:
-        from loguru import logger
-        logger.warning(f"Falha ao escrever aba '{NOME_ABA_RESUMO}' (best-effort): {exc}")
+def _escrever_aba_resumo_write_only(wb, resumo: str) -> None:
+    """Aba 'Resumo' (Campo | Valor) no workbook write-only: cabeçalho em negrito,
+    colunas largas e quebra de linha nos valores."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+
+    ws = wb.create_sheet(NOME_ABA_RESUMO)
+    ws.column_dimensions["A"].width = 32
+    ws.column_dimensions["B"].width = 90
+
+    cabecalho = []
+    for titulo in ("Campo", "Valor"):
+        cell = WriteOnlyCell(ws, value=titulo)
+        cell.font = Font(bold=True)
+        cabecalho.append(cell)
+    ws.append(cabecalho)
+
+    alinhamento = Alignment(wrap_text=True, vertical="top")
+    for campo, valor in _parsear_resumo(resumo):
+        linha = []
+        for v in (campo, valor):
+            cell = WriteOnlyCell(ws, value=_valor_celula(v))
+            cell.alignment = alinhamento
+            linha.append(cell)
+        ws.append(linha)
@@ -0,0 +1,101 @@
+"""Pré-triagem local das páginas antes da montagem dos blocos.
+
+Cada página recebe uma pontuação por sinais de conteúdo documental (CNPJ/CPF,
+valores em R$, chaves de NF-e, termos como "nota fiscal", datas, valores e
+linhas de tabela), descontados sinais de narrativa jurídica (ementas,
+petições, jurisprudência). Páginas abaixo de PREFILTRO_LIMIAR não são
+enviadas ao modelo; ficam listadas em `paginas_ignoradas.csv` na pasta da run.
+
+Tudo roda com regex compiladas, sem chamada à API.
+"""
+
+import csv
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+
+from config import PREFILTRO_LIMIAR
+
+TETO_OCORRENCIAS = 5  # ocorrências contadas por sinal (uma tabela longa não domina a pontuação)
+
+_SEPARADOR_COLUNA = r"(?:\t|[ ]{3,}|[ ]?\|[ ]?)"
+
+# nome: (regex, peso por ocorrência)
+SINAIS = {
+    "cnpj": (re.compile(r"\b\d{2}\.?\d{3}\.?\d{3}/\d{4}-?\d{2}\b"), 3.0),
+    "cpf": (re.compile(r"\b\d{3}\.\d{3}\.\d{3}-\d{2}\b"), 2.0),
+    "moeda": (re.compile(r"R\$\s*\d"), 2.0),
+    "chave_nfe": (re.compile(r"\b(?:\d{4}[ .]?){10}\d{4}\b"), 4.0),
+    "termo_documental": (re.compile(
+        r"\b(?:notas? fisca(?:l|is)|nf-?e|danfe|cupom fiscal|recibo|fatura|boleto|duplicata|comprovante"
+        r"|extrato|contrato|aditivo|or[çc]amento|pedido de compra|ordem de servi[çc]o|laudo)\b",
+        re.IGNORECASE), 1.5),
+    "data": (re.compile(r"\b\d{1,2}/\d{1,2}/\d{2,4}\b"), 0.5),
+    "valor": (re.compile(r"\b\d{1,3}(?:\.\d{3})*,\d{2}\b"), 0.5),
+    "linha_tabela": (re.compile(
+        rf"^[^\n]*\S{_SEPARADOR_COLUNA}\S[^\n]*?\S{_SEPARADOR_COLUNA}\S", re.MULTILINE), 0.5),
+    "narrativa": (re.compile(
+        r"\b(?:excelent[íi]ssim[oa]|ementa|ac[óo]rd[ãa]o|jurisprud[êe]ncia|data venia|d\.m\.j\."
+        r"|nestes termos|pede deferimento|trata-se de|in verbis)\b",
+        re.IGNORECASE), -1.0),
+}
+
+
+@dataclass
+class PaginaIgnorada:
+    numero: int
+    pontuacao: float
+    caracteres: int
+    inicio: str
+    sinais: dict = field(default_factory=dict)
+
+
+def pontuar_pagina(texto: str) -> tuple[float, dict]:
+    """Pontuação da página e ocorrências de cada sinal encontrado."""
+    pontuacao, sinais = 0.0, {}
+    for nome, (regex, peso) in SINAIS.items():
+        ocorrencias = 0
+        for _ in regex.finditer(texto):
+            ocorrencias += 1
+            if ocorrencias >= TETO_OCORRENCIAS:
+                break
+        if ocorrencias:
+            sinais[nome] = ocorrencias
+            pontuacao += peso * ocorrencias
+    return pontuacao, sinais
+
+
+def triar_paginas(paginas, limiar: float = PREFILTRO_LIMIAR) -> tuple[list[int], list[PaginaIgnorada]]:
+    """Separa as páginas (iterável de (número, texto)) pela pontuação.
+
+    Retorna (posições mantidas, páginas ignoradas). Páginas em branco são
+    mantidas: a montagem dos blocos já as descarta sem custo.
+    """
+    mantidas, ignoradas = [], []
+    for posicao, (numero, texto) in enumerate(paginas):
+        if not texto.strip():
+            mantidas.append(posicao)
+            continue
+        pontuacao, sinais = pontuar_pagina(texto)
+        if pontuacao >= limiar:
+            mantidas.append(posicao)
+        else:
+            inicio = " ".join(texto.split())
+            ignoradas.append(PaginaIgnorada(numero, pontuacao, len(texto), inicio[:120], sinais))
+    return mantidas, ignoradas
+
+
+def salvar_relatorio(caminho: str, ignoradas: list[PaginaIgnorada]) -> str:
+    """Grava o relatório das páginas ignoradas (CSV ';') e retorna o caminho."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    # Temporário + replace: workers da mesma run podem gravar o relatório ao mesmo tempo
+    fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(["pagina", "pontuacao", "caracteres", "sinais", "inicio"])
+        for p in ignoradas:
+            sinais = ", ".join(f"{nome}={n}" for nome, n in p.sinais.items())
+            escritor.writerow([p.numero, f"{p.pontuacao:.1f}", p.caracteres, sinais, p.inicio])
+    os.replace(temporario, caminho)
+    return caminho
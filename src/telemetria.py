@@ -0,0 +1,249 @@
+"""Telemetria por tentativa de chamada à API Gemini.
+
+Cada tentativa — inclusive as que falham e são retentadas — vira uma linha em
+`tentativas_api` (runs.db): duração, espera no limitador, tokens de entrada,
+saída e raciocínio (usage_metadata), código HTTP / classe do erro e
+finish_reason. Os registros vão para um buffer em memória e são gravados em
+lotes de LOTE_TELEMETRIA (e em `descarregar()`, ao fim de cada run), sem um
+INSERT no caminho de cada chamada.
+
+run_id e bloco_id vêm de um ContextVar preenchido com `contexto(...)` pelo
+controlador e pelas funções de envio de bloco.
+
+Consultas: `resumo_run`, `blocos_mais_lentos`, `serie_por_minuto` e
+`projetar_custo`.
+"""
+
+import atexit
+import math
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from loguru import logger
+from config import TELEMETRIA_ATIVA, PRECO_ENTRADA_USD_MILHAO, PRECO_SAIDA_USD_MILHAO
+from src import persistence
+
+LOTE_TELEMETRIA = 50
+
+_contexto: ContextVar[dict] = ContextVar("telemetria_contexto", default={})
+_buffer: list[dict] = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def contexto(**campos):
+    """Associa run_id/bloco_id às tentativas feitas dentro do bloco `with`.
+
+    Threads de um pool não herdam o contexto: submeta com
+    `contextvars.copy_context().run`.
+    """
+    token = _contexto.set({**_contexto.get(), **campos})
+    try:
+        yield
+    finally:
+        _contexto.reset(token)
+
+
+def agora_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def classe_http(codigo: Optional[int]) -> str:
+    """Classe do erro para agregação: '429', '4xx', '5xx' ou 'outro'."""
+    if codigo == 429:
+        return "429"
+    if isinstance(codigo, int) and 400 <= codigo < 500:
+        return "4xx"
+    if isinstance(codigo, int) and codigo >= 500:
+        return "5xx"
+    return "outro"
+
+
+def _uso_tokens(resposta) -> dict:
+    uso = getattr(resposta, "usage_metadata", None)
+    return {
+        "tokens_prompt": getattr(uso, "prompt_token_count", None),
+        "tokens_saida": getattr(uso, "candidates_token_count", None),
+        "tokens_raciocinio": getattr(uso, "thoughts_token_count", None),
+        "tokens_cache": getattr(uso, "cached_content_token_count", None),
+    }
+
+
+def _finish_reason(resposta) -> Optional[str]:
+    candidatos = getattr(resposta, "candidates", None)
+    if not candidatos:
+        return None
+    motivo = getattr(candidatos[0], "finish_reason", None)
+    return getattr(motivo, "name", None) or (str(motivo) if motivo is not None else None)
+
+
+def registrar(rotulo: str, tentativa: int, inicio_em: str, duracao_s: float, espera_s: float = 0.0,
+              modelo: str = "", resposta=None, finish_reason=None, exc: Optional[Exception] = None,
+              codigo: Optional[int] = None, streaming: bool = False) -> None:
+    """Enfileira o registro de uma tentativa (tentativa começa em 1). Nunca levanta."""
+    if not TELEMETRIA_ATIVA:
+        return
+    try:
+        if finish_reason is not None:
+            finish_reason = getattr(finish_reason, "name", None) or str(finish_reason)
+        registro = {
+            **_contexto.get(),
+            "rotulo": rotulo,
+            "tentativa": tentativa,
+            "modelo": modelo,
+            "streaming": int(streaming),
+            "inicio_em": inicio_em,
+            "duracao_s": round(duracao_s, 4),
+            "espera_limitador_s": round(espera_s, 4),
+            **_uso_tokens(resposta),
+            "codigo_http": codigo,
+            "classe_erro": classe_http(codigo) if exc is not None else None,
+            "erro_msg": f"{type(exc).__name__}: {exc}"[:500] if exc is not None else None,
+            "finish_reason": finish_reason or _finish_reason(resposta),
+        }
+        with _lock:
+            _buffer.append(registro)
+            cheio = len(_buffer) >= LOTE_TELEMETRIA
+        if cheio:
+            descarregar()
+    except Exception as e:
+        logger.warning(f"Telemetria indisponível (best-effort): {e}")
+
+
+def descarregar() -> int:
+    """Grava os registros pendentes no banco. Retorna quantos foram gravados.
+
+    Só grava em processos que inicializaram o banco (`persistence.init_db`):
+    scripts e testes que apenas importam a API descartam o buffer, sem criar
+    um runs.db vazio no diretório atual (inclusive no `atexit`).
+    """
+    global _buffer
+    with _lock:
+        lote, _buffer = _buffer, []
+    if not lote:
+        return 0
+    if not persistence.banco_inicializado():
+        logger.debug(f"Telemetria: {len(lote)} registro(s) descartado(s) — banco não inicializado neste processo")
+        return 0
+    try:
+        persistence.inserir_tentativas_api(lote)
+    except Exception as e:
+        logger.warning(f"Telemetria: {len(lote)} registro(s) descartado(s) (best-effort): {e}")
+        return 0
+    return len(lote)
+
+
+atexit.register(descarregar)
+
+
+# ---------------------------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------------------------
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por posição mais próxima (0 se vazio)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def _tokens_saida_total(t: dict) -> int:
+    return (t["tokens_saida"] or 0) + (t["tokens_raciocinio"] or 0)
+
+
+def custo_usd(tokens_prompt: int, tokens_saida: int) -> float:
+    """Custo estimado em USD; `tokens_saida` inclui os de raciocínio."""
+    return (tokens_prompt * PRECO_ENTRADA_USD_MILHAO + tokens_saida * PRECO_SAIDA_USD_MILHAO) / 1_000_000
+
+
+def tentativas(run_id: str) -> list[dict]:
+    """Todas as tentativas registradas da run (grava o buffer antes)."""
+    descarregar()
+    return persistence.listar_tentativas_api(run_id)
+
+
+def resumo_run(run_id: str) -> dict:
+    """Totais da run: tentativas, retentativas, erros por classe, latência e custo."""
+    linhas = tentativas(run_id)
+    duracoes = [t["duracao_s"] for t in linhas]
+    erros = [t for t in linhas if t["classe_erro"]]
+    tokens_prompt = sum(t["tokens_prompt"] or 0 for t in linhas)
+    tokens_saida = sum(_tokens_saida_total(t) for t in linhas)
+    return {
+        "tentativas": len(linhas),
+        "retentativas": sum(1 for t in linhas if t["tentativa"] > 1),
+        "erros_por_classe": dict(Counter(t["classe_erro"] for t in erros)),
+        "taxa_429": round(sum(1 for t in erros if t["classe_erro"] == "429") / len(linhas), 4) if linhas else 0.0,
+        "finish_reasons": dict(Counter(t["finish_reason"] for t in linhas if t["finish_reason"])),
+        "latencia_p50_s": percentil(duracoes, 50),
+        "latencia_p95_s": percentil(duracoes, 95),
+        "latencia_max_s": max(duracoes, default=0.0),
+        "espera_limitador_total_s": round(sum(t["espera_limitador_s"] or 0 for t in linhas), 3),
+        "tokens_prompt": tokens_prompt,
+        "tokens_saida": sum(t["tokens_saida"] or 0 for t in linhas),
+        "tokens_raciocinio": sum(t["tokens_raciocinio"] or 0 for t in linhas),
+        "custo_usd": round(custo_usd(tokens_prompt, tokens_saida), 6),
+    }
+
+
+def blocos_mais_lentos(run_id: str, limite: int = 10) -> list[dict]:
+    """Blocos ordenados pelo tempo total de API (todas as tentativas e subdivisões)."""
+    por_bloco: dict[int, list[dict]] = defaultdict(list)
+    for t in tentativas(run_id):
+        if t["bloco_id"] is not None:
+            por_bloco[t["bloco_id"]].append(t)
+    blocos = [
+        {
+            "bloco_id": bloco_id,
+            "tempo_total_s": round(sum(t["duracao_s"] for t in linhas), 3),
+            "tentativas": len(linhas),
+            "erros": sum(1 for t in linhas if t["classe_erro"]),
+            "tokens_prompt": sum(t["tokens_prompt"] or 0 for t in linhas),
+            "tokens_saida": sum(_tokens_saida_total(t) for t in linhas),
+            "finish_reasons": sorted({t["finish_reason"] for t in linhas if t["finish_reason"]}),
+        }
+        for bloco_id, linhas in por_bloco.items()
+    ]
+    blocos.sort(key=lambda b: b["tempo_total_s"], reverse=True)
+    return blocos[:limite]
+
+
+def serie_por_minuto(run_id: str) -> list[dict]:
+    """Vazão, 429 e latência por minuto — base para ajustar a concorrência."""
+    por_minuto: dict[str, list[dict]] = defaultdict(list)
+    for t in tentativas(run_id):
+        por_minuto[t["inicio_em"][:16]].append(t)
+    return [
+        {
+            "minuto": minuto,
+            "tentativas": len(linhas),
+            "erros_429": sum(1 for t in linhas if t["classe_erro"] == "429"),
+            "latencia_media_s": round(sum(t["duracao_s"] for t in linhas) / len(linhas), 3),
+            "tokens_prompt": sum(t["tokens_prompt"] or 0 for t in linhas),
+        }
+        for minuto, linhas in sorted(por_minuto.items())
+    ]
+
+
+def projetar_custo(run_id: str, total_blocos: int) -> dict:
+    """Projeta o custo da run inteira a partir do custo médio dos blocos já enviados."""
+    por_bloco: dict[int, float] = defaultdict(float)
+    outros = 0.0
+    for t in tentativas(run_id):
+        custo = custo_usd(t["tokens_prompt"] or 0, _tokens_saida_total(t))
+        if t["bloco_id"] is None:
+            outros += custo  # resumo SAC e demais chamadas fora de blocos
+        else:
+            por_bloco[t["bloco_id"]] += custo
+    medio = sum(por_bloco.values()) / len(por_bloco) if por_bloco else 0.0
+    return {
+        "blocos_medidos": len(por_bloco),
+        "custo_medio_bloco_usd": round(medio, 6),
+        "custo_ate_agora_usd": round(sum(por_bloco.values()) + outros, 6),
+        "custo_projetado_usd": round(medio * total_blocos + outros, 6),
+    }
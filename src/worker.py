@@ -0,0 +1,303 @@
+"""
+Worker de processamento: executa as runs enfileiradas na tabela `jobs` (runs.db).
+
+Uso:
+    python -m src.worker                  # atende a fila continuamente
+    python -m src.worker --uma-vez        # processa os jobs já enfileirados e sai
+    python -m src.worker --id worker-2    # identificador do worker (padrão: host:pid)
+
+A interface (app.py, com USAR_WORKER=true) apenas cria a run, enfileira o job e
+acompanha o progresso pelo banco. Vários workers (processos ou containers com o
+mesmo volume `saida/`) podem atender a mesma fila; fechar o navegador não
+interrompe o processamento.
+
+Cada job em execução renova um batimento a cada JOB_HEARTBEAT_S. Jobs sem
+batimento há mais de JOB_TIMEOUT_HEARTBEAT_S (worker morto) voltam à fila e são
+retomados a partir dos blocos já OK em run_items.
+
+Os blocos são distribuídos por leases em run_items: com a fila vazia, um worker
+ocioso ajuda a run de outro (`auxiliar_job`), reivindicando blocos ainda não
+reservados, de modo que uma run muito grande é dividida entre vários workers.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from loguru import logger
+
+from config import (
+    CAMINHO_RUNS, DELIMITADOR_PAGINA_PADRAO, MAX_BLOCOS_CONCORRENTES, USAR_STREAMING,
+    WORKER_INTERVALO_S, JOB_HEARTBEAT_S, JOB_TIMEOUT_HEARTBEAT_S, EMPACOTAR_POR_TOKENS,
+)
+from src import persistence
+from src.entradas import armazenar_entrada, caminho_entrada, caminho_indice, contar_paginas
+from src.controlador import fingerprint_texto, processar_blocos_run
+from src.gemini_api import calibrar_estimador_tokens
+from src.leitor_txt import NOME_INDICE_PAGINAS, carregar_blocos_arquivo
+from src.limitador import CHARS_POR_TOKEN_ESTIMADO
+from src.planilha import get_caminho_excel
+from src.mailer import enviar_resultado
+
+NOME_ARQUIVO_ENTRADA = "entrada.txt"
+
+
+def caminho_entrada_run(run_id: str, run: dict | None = None) -> str:
+    """TXT de entrada da run: o armazenado pelo hash ou, em runs antigas, a cópia na pasta da run."""
+    run = run if run is not None else persistence.get_run(run_id)
+    if run and run.get("entrada_sha256"):
+        return caminho_entrada(run["entrada_sha256"])
+    return os.path.join(CAMINHO_RUNS, run_id, NOME_ARQUIVO_ENTRADA)
+
+
+def caminho_indice_paginas(run_id: str, run: dict | None = None) -> str:
+    """Índice de offsets das páginas da entrada, reaproveitado entre passadas e workers."""
+    run = run if run is not None else persistence.get_run(run_id)
+    if run and run.get("entrada_sha256"):
+        return caminho_indice(run["entrada_sha256"])
+    return os.path.join(CAMINHO_RUNS, run_id, NOME_INDICE_PAGINAS)
+
+
+def enfileirar_run(run_id: str, caminho_txt: str | None = None, **parametros) -> str:
+    """Registra a entrada da run e enfileira o job. Retorna job_id.
+
+    O TXT é armazenado pelo hash do conteúdo (`src.entradas`); sem
+    `caminho_txt`, a run mantém a entrada já registrada. `parametros` são
+    repassados a `processar_blocos_run` pelo worker (delimitador, usar_sac,
+    concorrencia, usar_cache, streaming).
+    """
+    run = persistence.get_run(run_id) or {}
+    if caminho_txt is None and run.get("entrada_sha256"):
+        sha256 = run["entrada_sha256"]
+    else:
+        sha256 = armazenar_entrada(caminho_txt or caminho_entrada_run(run_id, run))
+    delimitador = parametros.get("delimitador", DELIMITADOR_PAGINA_PADRAO)
+    persistence.registrar_entrada_run(run_id, sha256, contar_paginas(sha256, delimitador))
+    return persistence.enfileirar_job(run_id, parametros)
+
+
+def _manter_batimento(job_id: str, parar: threading.Event) -> None:
+    try:
+        while not parar.wait(JOB_HEARTBEAT_S):
+            persistence.registrar_heartbeat_job(job_id)
+    except Exception as exc:
+        logger.warning(f"💓 Falha no batimento do job {job_id}: {exc}")
+    finally:
+        persistence.fechar_conexao()
+
+
+def _enviar_email(run: dict, total_evidencias: int, total_blocos: int, duracao: float) -> None:
+    if not run.get("email_destino"):
+        return
+    mins, segs = int(duracao // 60), int(duracao % 60)
+    resumo = (
+        f"Total de evidências extraídas: {total_evidencias}\n"
+        f"Blocos processados: {total_blocos}\n"
+        f"Duração: {mins}min {segs:02d}s"
+    )
+    enviar_resultado(
+        destino=run["email_destino"],
+        run_nome=run["nome"],
+        xlsx_path=get_caminho_excel(run["run_id"]),
+        resumo=resumo,
+    )
+
+
+def _parametros_processamento(job: dict, run: dict, calibrar: bool = True) -> dict:
+    """Argumentos de `processar_blocos_run` comuns ao dono do job e aos auxiliares.
+
+    A razão chars/token é calibrada uma vez por run (por amostras do arquivo) e
+    gravada nela; as passadas seguintes e os auxiliares (`calibrar=False`)
+    reaproveitam a gravada. Sem EMPACOTAR_POR_TOKENS ela não entra na divisão
+    em blocos: usa-se a estimativa padrão, sem count_tokens.
+    """
+    parametros = job["parametros"]
+    delimitador = parametros.get("delimitador", DELIMITADOR_PAGINA_PADRAO)
+    caminho = caminho_entrada_run(run["run_id"], run)
+    razao = run.get("chars_por_token") if EMPACOTAR_POR_TOKENS else CHARS_POR_TOKEN_ESTIMADO
+    if not razao:
+        if not calibrar:
+            raise ValueError("Run sem razão chars/token calibrada")
+        razao = calibrar_estimador_tokens(caminho)
+        persistence.registrar_chars_por_token(run["run_id"], razao)
+    blocos = carregar_blocos_arquivo(
+        caminho, delimitador, caminho_indice_paginas(run["run_id"], run), chars_por_token=razao,
+    )
+    if not blocos:
+        raise ValueError("O documento não gerou nenhum bloco")
+    return dict(
+        run_id=run["run_id"],
+        blocos=blocos,
+        arquivo_origem=run.get("arquivo_origem") or "",
+        concorrencia=int(parametros.get("concorrencia", MAX_BLOCOS_CONCORRENTES)),
+        usar_cache=parametros.get("usar_cache", True),
+        delimitador=delimitador,
+        streaming=parametros.get("streaming", USAR_STREAMING),
+    )
+
+
+def _ler_entrada(run: dict) -> str:
+    with open(caminho_entrada_run(run["run_id"], run), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def executar_job(job: dict, worker: str = "") -> bool:
+    """Processa a run do job até o fim. Retorna True se concluiu (DONE).
+
+    Sempre retoma: blocos já OK são pulados e o resumo SAC salvo é reaproveitado,
+    de modo que um job reenfileirado após queda do worker continua de onde parou.
+    """
+    job_id, run_id = job["job_id"], job["run_id"]
+    parametros = job["parametros"]
+    run = persistence.get_run(run_id)
+    if run is None:
+        persistence.finalizar_job(job_id, persistence.JOB_FAILED, "Run não encontrada")
+        return False
+
+    logger.info(f"🛠️ Job {job_id}: processando run '{run['nome']}' ({run_id})")
+    parar_batimento = threading.Event()
+    batimento = threading.Thread(target=_manter_batimento, args=(job_id, parar_batimento), daemon=True)
+    batimento.start()
+    t0 = time.monotonic()
+    try:
+        argumentos = _parametros_processamento(job, run)
+        usar_sac = parametros.get("usar_sac", False)
+        # Os blocos são lidos do arquivo sob demanda; o texto inteiro só serve ao resumo SAC
+        texto_completo = _ler_entrada(run) if usar_sac else ""
+        # Nova passada: blocos com erro da passada anterior voltam a ser reivindicáveis
+        persistence.reabrir_blocos_com_erro(run_id)
+
+        total_evidencias, _ = processar_blocos_run(
+            **argumentos,
+            texto_completo=texto_completo,
+            usar_sac=usar_sac,
+            resumo_existente=run.get("resumo_processo") or "",
+            lease_owner=worker or job.get("worker") or job_id,
+        )
+        persistence.finalizar_run(run_id, persistence.RUN_COMPLETED)
+        persistence.finalizar_job(job_id, persistence.JOB_DONE)
+    except Exception as exc:
+        logger.exception(f"Erro no processamento da run {run_id}")
+        persistence.finalizar_run(run_id, persistence.RUN_INCOMPLETA, str(exc))
+        persistence.finalizar_job(job_id, persistence.JOB_FAILED, str(exc))
+        return False
+    finally:
+        parar_batimento.set()
+        batimento.join()
+
+    _enviar_email(run, total_evidencias, len(argumentos["blocos"]), time.monotonic() - t0)
+    return True
+
+
+def auxiliar_job(job: dict, worker: str) -> bool:
+    """Processa blocos ainda não reservados da run de um job de outro worker.
+
+    Não finaliza job nem run (isso cabe ao dono); erros só são registrados no log.
+    Retorna False se a run ainda não pode ser auxiliada (dono ainda na Fase 1,
+    sem blocos gravados, sem razão chars/token gravada quando
+    EMPACOTAR_POR_TOKENS, ou com fingerprints diferentes das que o dono do job
+    gravou em run_items) ou se o auxílio falhou — o laço do worker então espera
+    o intervalo em vez de tentar de novo em seguida. O auxiliar não lê o TXT
+    inteiro nem chama count_tokens.
+    """
+    run = persistence.get_run(job["run_id"])
+    if run is None or not run.get("auxilio_liberado"):
+        return False  # sem o resumo SAC do dono, os blocos sairiam sem o contexto global
+    if not run.get("total_blocos") or (EMPACOTAR_POR_TOKENS and not run.get("chars_por_token")):
+        return False
+    logger.info(f"🤝 Worker {worker} auxiliando a run '{run['nome']}' ({run['run_id']})")
+    try:
+        argumentos = _parametros_processamento(job, run, calibrar=False)
+        fingerprints = [fingerprint_texto(texto) for texto in argumentos["blocos"]]
+        if not persistence.conferir_fingerprints(run["run_id"], fingerprints):
+            logger.warning(f"Run {run['run_id']}: divisão em blocos difere da do dono do job — não auxiliando")
+            return False
+        processar_blocos_run(
+            **argumentos,
+            resumo_existente=run.get("resumo_processo") or "",
+            lease_owner=worker,
+            reconciliar=False,
+        )
+    except Exception:
+        logger.exception(f"Erro ao auxiliar a run {run['run_id']}")
+        return False
+    return True
+
+
+def _processar_proximo(worker: str) -> str | None:
+    """Como `processar_proximo_job`; retorna "job", "auxilio" ou None (nada feito)."""
+    persistence.reenfileirar_jobs_orfaos(JOB_TIMEOUT_HEARTBEAT_S)
+    job = persistence.reivindicar_job(worker)
+    if job is not None:
+        executar_job(job, worker)
+        return "job"
+    job = persistence.job_com_blocos_disponiveis(excluir_worker=worker)
+    if job is not None and auxiliar_job(job, worker):
+        return "auxilio"
+    return None
+
+
+def processar_proximo_job(worker: str) -> bool:
+    """Reenfileira órfãos, reivindica o próximo job e o executa.
+
+    Sem job na fila, auxilia um job em andamento que ainda tenha blocos livres.
+    False se não havia nada a fazer (ou o auxílio falhou).
+    """
+    return _processar_proximo(worker) is not None
+
+
+def executar(worker: str | None = None, uma_vez: bool = False,
+             intervalo: float = WORKER_INTERVALO_S, parar: threading.Event | None = None) -> int:
+    """Laço do worker. Retorna quantos jobs foram processados (auxílios não contam).
+
+    `parar` encerra o laço após o job em andamento (SIGINT/SIGTERM em `main`).
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    parar = parar or threading.Event()
+    persistence.init_db()
+    logger.info(f"👷 Worker {worker} aguardando jobs (intervalo {intervalo}s)")
+    processados = 0
+    while not parar.is_set():
+        feito = _processar_proximo(worker)
+        if feito == "job":
+            processados += 1
+        if feito:
+            continue
+        if uma_vez:
+            break
+        parar.wait(intervalo)
+    logger.info(f"👷 Worker {worker} encerrado — {processados} job(s) processado(s)")
+    return processados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Worker da fila de execuções (tabela jobs)")
+    parser.add_argument("--id", default=None, help="Identificador do worker (padrão: host:pid)")
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="Processa os jobs já enfileirados e sai")
+    parser.add_argument("--intervalo", type=float, default=WORKER_INTERVALO_S,
+                        help=f"Segundos entre consultas à fila vazia (padrão: {WORKER_INTERVALO_S})")
+    args = parser.parse_args(argv)
+
+    logger.remove()
+    logger.add(sys.stdout, format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}", level="INFO")
+
+    parar = threading.Event()
+
+    def _sinal(signum, _frame):
+        logger.warning(f"Sinal {signum} recebido — encerrando após o job em andamento")
+        parar.set()
+
+    signal.signal(signal.SIGINT, _sinal)
+    signal.signal(signal.SIGTERM, _sinal)
+
+    executar(worker=args.id, uma_vez=args.uma_vez, intervalo=args.intervalo, parar=parar)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
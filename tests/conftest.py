@@ -1,7 +1,18 @@
 import os
 import sys
 
+import pytest
+
 # Garante que a raiz do projeto está no sys.path para `import config` e `import src.*`
 RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if RAIZ not in sys.path:
     sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture(autouse=True)
+def _isolar_telemetria():
+    """Registros de telemetria de um teste não vazam para o banco de outro."""
+    from src import telemetria
+    telemetria._buffer.clear()
+    yield
+    telemetria._buffer.clear()
@@ -0,0 +1,29 @@
+from benchmarks.medicao import Caso, carregar_baseline, comparar, medir, salvar_baseline
+
+
+def test_medir_aquece_e_repete():
+    chamadas = []
+    caso = Caso("x", funcao=lambda: chamadas.append(1), numero=3, repeticoes=4, unidade="itens", unidades=10)
+    resultado = medir(caso)
+    assert len(chamadas) == 1 + 3 * 4
+    assert resultado["min_s"] <= resultado["mediana_s"] <= resultado["max_s"]
+    assert resultado["unidade"] == "itens/s" and resultado["vazao"] > 0
+
+
+def test_baseline_mescla_e_comparacao_acusa_regressao(tmp_path):
+    caminho = str(tmp_path / "baseline.json")
+    salvar_baseline(caminho, {"a": {"mediana_s": 1.0, "min_s": 1.0, "max_s": 1.0}})
+    salvar_baseline(caminho, {"b": {"mediana_s": 2.0, "min_s": 2.0, "max_s": 2.0, "unidade": "x/s"}})
+    baseline = carregar_baseline(caminho)
+    assert set(baseline["casos"]) == {"a", "b"}
+    assert "unidade" not in baseline["casos"]["b"]
+
+    atual = {
+        "a": {"mediana_s": 1.2, "min_s": 1.2},
+        "b": {"mediana_s": 3.0, "min_s": 3.0},
+        "c": {"mediana_s": 1.0, "min_s": 1.0},
+    }
+    resultado = {c["nome"]: c for c in comparar(atual, baseline, tolerancia=0.25)}
+    assert not resultado["a"]["regressao"]
+    assert resultado["b"]["regressao"] and resultado["b"]["razao"] == 1.5
+    assert resultado["c"]["razao"] is None and not resultado["c"]["regressao"]
@@ -0,0 +1,93 @@
+import base64
+import os
+from types import SimpleNamespace
+
+from src import cache_respostas, gemini_api
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+
+
+def test_chave_depende_de_modelo_config_e_prompt():
+    config = gemini_api._config_bloco()
+    base = cache_respostas.calcular_chave("m1", config, "prompt")
+    assert base == cache_respostas.calcular_chave("m1", gemini_api._config_bloco(), "prompt")
+    assert base != cache_respostas.calcular_chave("m2", config, "prompt")
+    assert base != cache_respostas.calcular_chave("m1", gemini_api._config_resumo(), "prompt")
+    assert base != cache_respostas.calcular_chave("m1", config, "prompt!")
+
+
+def test_guardar_e_obter(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    assert cache_respostas.obter("k") is None
+    cache_respostas.guardar("k", "m", "resposta " * 100)
+    assert cache_respostas.obter("k") == "resposta " * 100
+
+
+def test_despejo_lru_por_tamanho(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(cache_respostas, "CACHE_LLM_MAX_MB", 0)
+    # Limite zero: toda entrada é despejada logo após gravada
+    cache_respostas.guardar("a", "m", "x")
+    assert cache_respostas.estatisticas()["entradas"] == 0
+
+    monkeypatch.setattr(cache_respostas, "CACHE_LLM_MAX_MB", 1)
+    grande = base64.b64encode(os.urandom(700 * 1024)).decode()  # pouco compressível (~700 KB zlib)
+    cache_respostas.guardar("antiga", "m", grande)
+    cache_respostas.guardar("recente", "m", grande[::-1])
+    # A mais antiga (menos recentemente acessada) sai primeiro
+    assert cache_respostas.obter("antiga") is None
+    assert cache_respostas.obter("recente") is not None
+
+
+def test_conexao_reaproveitada_sem_recontar_a_cada_gravacao(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    cache_respostas.guardar("k0", "m", "primeira")  # abre a conexão, cria o schema e conta o total
+    comandos = []
+    cache_respostas._conexao().set_trace_callback(comandos.append)
+
+    for i in range(1, 5):
+        cache_respostas.guardar(f"k{i}", "m", f"resposta {i}")
+        assert cache_respostas.obter(f"k{i}") == f"resposta {i}"
+
+    assert not any("CREATE TABLE" in c or "journal_mode" in c for c in comandos)
+    assert not any("SUM(tamanho)" in c for c in comandos)
+    assert cache_respostas.estatisticas()["entradas"] == 5
+
+
+def _fake_client(chamadas, finish="STOP"):
+    def generate_content(model, contents, config):
+        chamadas.append(contents)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(finish_reason=finish)],
+            text='[{"Trecho": "x"}]',
+            usage_metadata=None,
+        )
+    return SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+
+def test_bloco_repetido_vem_do_cache(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    chamadas = []
+    monkeypatch.setattr(gemini_api, "client", _fake_client(chamadas))
+
+    r1 = gemini_api.enviar_bloco_para_gemini("bloco igual", bloco_id=1)
+    r2 = gemini_api.enviar_bloco_para_gemini("bloco igual", bloco_id=2)
+    assert r1 == r2 == '[{"Trecho": "x"}]'
+    assert len(chamadas) == 1
+
+    # Bypass força nova chamada
+    gemini_api.enviar_bloco_para_gemini("bloco igual", bloco_id=3, usar_cache=False)
+    assert len(chamadas) == 2
+
+
+def test_resposta_truncada_nao_e_cacheada(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    chamadas = []
+    monkeypatch.setattr(gemini_api, "client", _fake_client(chamadas, finish="MAX_TOKENS"))
+
+    gemini_api.enviar_bloco_para_gemini("bloco", bloco_id=1)
+    gemini_api.enviar_bloco_para_gemini("bloco", bloco_id=1)
+    assert len(chamadas) == 2
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from src import controlador, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="Concorrente", arquivo_origem="proc.txt")
+
+
+def _resposta(bloco_id: int) -> str:
+    return (
+        f'[{{"Tipo de Evidência": "Contrato", "Trecho": "t{bloco_id}", "Conteúdo": "c", '
+        f'"Resumo": "r", "Referência": "Pág. {bloco_id}"}},'
+        # Evidência repetida em todos os blocos — deve ser deduplicada
+        '{"Tipo de Evidência": "Nota Fiscal", "Trecho": "NF 1", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}]'
+    )
+
+
+def test_blocos_em_paralelo_terminam_fora_de_ordem(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+
+    em_voo = [0]
+    pico = [0]
+    lock = threading.Lock()
+
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        with lock:
+            em_voo[0] += 1
+            pico[0] = max(pico[0], em_voo[0])
+        # Blocos iniciais demoram mais → terminam depois dos seguintes
+        time.sleep(0.05 * (4 - bloco_id))
+        with lock:
+            em_voo[0] -= 1
+        return "" if bloco_id == 2 else _resposta(bloco_id)
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+
+    chamadas = []
+    total, _ = controlador.processar_blocos_run(
+        run_id=run_id,
+        blocos=["b0", "b1", "b2", "b3"],
+        progress_cb=lambda *args: chamadas.append(args),
+        concorrencia=4,
+    )
+
+    assert pico[0] > 1
+    # progress_cb dispara uma vez por bloco, na ordem de término
+    assert [c[0] for c in chamadas] == [3, 2, 1, 0]
+    assert {c[0]: c[3] for c in chamadas}[2] == "erro"
+    # 3 blocos OK com 1 evidência própria cada + 1 evidência compartilhada
+    assert total == 4
+    assert chamadas[-1][2] == 4
+
+    df = planilha.ler_evidencias_df(planilha.get_caminho_excel(run_id))
+    assert len(df) == 4
+    assert persistence.get_processed_block_ids(run_id) == {0, 1, 3}
+    assert persistence.get_run(run_id)["blocos_processados"] == 4
+
+
+def test_skip_ids_nao_sao_reenviados(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    enviados = []
+
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        enviados.append(bloco_id)
+        return _resposta(bloco_id)
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+
+    status = []
+    controlador.processar_blocos_run(
+        run_id=run_id,
+        blocos=["b0", "b1", "b2"],
+        skip_ids={1},
+        progress_cb=lambda b, t, e, s: status.append((b, s)),
+        concorrencia=2,
+    )
+
+    assert sorted(enviados) == [0, 2]
+    assert (1, "pulado") in status
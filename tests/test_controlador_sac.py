@@ -0,0 +1,58 @@
+from src import controlador, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+
+
+def _fakes(monkeypatch, contextos, resumos_gerados):
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        contextos.append(contexto_global)
+        return "[]"
+
+    def fake_resumo(texto_completo, **kwargs):
+        resumos_gerados.append(texto_completo)
+        return "OBJETO: resumo gerado"
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+    monkeypatch.setattr(controlador, "gerar_resumo_processo", fake_resumo)
+
+
+def test_retomada_usa_resumo_persistido(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    contextos, gerados = [], []
+    _fakes(monkeypatch, contextos, gerados)
+    run_id = persistence.criar_run(nome="R")
+
+    _, resumo = controlador.processar_blocos_run(
+        run_id=run_id, blocos=["b0", "b1"], resumo_existente="OBJETO: já pago",
+    )
+
+    assert gerados == []
+    assert resumo == "OBJETO: já pago"
+    assert contextos == ["OBJETO: já pago"] * 2
+
+
+def test_mesmo_documento_nao_chama_resumidor_de_novo(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    contextos, gerados = [], []
+    _fakes(monkeypatch, contextos, gerados)
+
+    run1 = persistence.criar_run(nome="R1")
+    controlador.processar_blocos_run(run_id=run1, blocos=["b0"], texto_completo="processo X", usar_sac=True)
+    run2 = persistence.criar_run(nome="R2")
+    _, resumo = controlador.processar_blocos_run(run_id=run2, blocos=["b0"], texto_completo="processo X", usar_sac=True)
+
+    assert len(gerados) == 1
+    assert resumo == "OBJETO: resumo gerado"
+    assert persistence.get_run(run2)["resumo_processo"] == "OBJETO: resumo gerado"
+
+    # Sem cache, o resumidor é chamado novamente
+    run3 = persistence.criar_run(nome="R3")
+    controlador.processar_blocos_run(
+        run_id=run3, blocos=["b0"], texto_completo="processo X", usar_sac=True, usar_cache=False,
+    )
+    assert len(gerados) == 2
@@ -0,0 +1,112 @@
+import sqlite3
+
+from src import persistence, planilha
+from src.dedup import IndiceDedup, assinatura_minhash, normalizar_texto, similaridade
+from src.planilha import COLUNAS_EVIDENCIA
+
+
+def _ev(trecho: str, tipo: str = "Contrato") -> dict:
+    return {"Tipo de Evidência": tipo, "Trecho": trecho, "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}
+
+
+def test_normalizacao_ignora_caixa_espacos_e_pontuacao_final():
+    assert normalizar_texto('  Contrato  de\nLocação. ') == normalizar_texto("contrato de locação")
+    assert normalizar_texto("“NF 123”") == "nf 123"
+    assert normalizar_texto(None) == ""
+
+
+def test_indice_descarta_duplicatas_normalizadas_no_mesmo_lote():
+    indice = IndiceDedup(COLUNAS_EVIDENCIA)
+    novas = indice.filtrar([_ev("Pagamento de R$ 10"), _ev("pagamento  de r$ 10."), _ev("Outro")])
+    assert [n["Trecho"] for n in novas] == ["Pagamento de R$ 10", "Outro"]
+    assert len(indice) == 2
+
+
+def test_minhash_detecta_quase_duplicatas():
+    base = "Contrato de prestação de serviços firmado entre a Empresa XYZ Ltda e João da Silva em 10/01/2020"
+    variante = base.replace("10/01/2020", "10/01/2020, conforme fls. 12")
+    assert similaridade(assinatura_minhash(base), assinatura_minhash(variante)) > 0.7
+    assert similaridade(assinatura_minhash(base), assinatura_minhash("Nota fiscal 554 de material")) < 0.2
+
+    sem_minhash = IndiceDedup(COLUNAS_EVIDENCIA)
+    assert len(sem_minhash.filtrar([_ev(base), _ev(base + " ")])) == 1
+    assert len(sem_minhash.filtrar([_ev(base + " (cópia)")])) == 1
+
+    com_minhash = IndiceDedup(COLUNAS_EVIDENCIA, usar_minhash=True, limiar=0.8)
+    assert len(com_minhash.filtrar([_ev(base), _ev(base + " (cópia)"), _ev("Nota fiscal 554")])) == 2
+
+
+def test_indice_reconstruido_do_banco_na_retomada(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    run_id = persistence.criar_run(nome="Dedup")
+
+    assert len(planilha.registrar_evidencias([_ev("Recibo 1")], run_id)) == 1
+    planilha._indices_dedup.clear()  # novo processo / retomada
+
+    assert planilha.registrar_evidencias([_ev("RECIBO 1.")], run_id) == []
+    assert persistence.contar_evidencias(run_id) == 1
+
+
+def test_indice_acompanha_evidencias_de_outro_processo(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(planilha, "DEDUP_MINHASH", True)
+    monkeypatch.setattr(planilha, "DEDUP_MINHASH_LIMIAR", 0.8)
+    persistence.init_db()
+    run_id = persistence.criar_run(nome="Dedup")
+    base = "Contrato de prestação de serviços firmado entre a Empresa XYZ Ltda e João da Silva em 10/01/2020"
+
+    assert len(planilha.registrar_evidencias([_ev("Recibo 1")], run_id)) == 1  # índice já montado aqui
+    # Outro processo (worker auxiliar) grava direto no banco, sem passar por este índice
+    persistence.inserir_evidencias(run_id, 1, [_ev(base)])
+
+    assert planilha.registrar_evidencias([_ev(base + " (cópia)")], run_id) == []
+    assert persistence.contar_evidencias(run_id) == 2
+
+
+def test_migracao_recalcula_hash_normalizado(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    persistence.init_db()
+    con = sqlite3.connect(tmp_path / "runs.db")
+    con.execute("INSERT INTO evidencias (run_id, hash, trecho) VALUES ('r', 'hash-antigo', 'Recibo')")
+    con.execute("PRAGMA user_version = 0")
+    con.commit()
+    con.close()
+
+    persistence.init_db(forcar=True)
+
+    assert persistence.inserir_evidencias("r", 0, [{"Trecho": "recibo"}]) == []
+
+
+def test_indice_unico_por_run_com_threads_concorrentes(monkeypatch):
+    import threading
+    import time
+
+    def iterar_lento(run_id, apos_id=0):
+        time.sleep(0.01)  # alarga a janela entre a consulta e a inserção no LRU
+        return iter(())
+
+    monkeypatch.setattr(planilha.persistence, "iterar_evidencias_com_id", iterar_lento)
+    monkeypatch.setattr(planilha, "_indices_dedup", planilha.OrderedDict())
+    vistos, erros = [], []
+
+    def usar(k):
+        try:
+            vistos.append((k % 3, planilha._indice_dedup(f"run-{k % 3}")))
+        except Exception as exc:
+            erros.append(exc)
+
+    threads = [threading.Thread(target=usar, args=(k,)) for k in range(24)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert erros == []
+    for run in range(3):
+        assert len({id(indice) for r, indice in vistos if r == run}) == 1
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from src import persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="DB", arquivo_origem="proc.txt")
+
+
+def _ev(trecho: str) -> dict:
+    return {"Tipo de Evidência": "Contrato", "Trecho": trecho, "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}
+
+
+def test_registro_append_only_com_dedup(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+
+    novas = planilha.registrar_evidencias([_ev("t1"), _ev("t2"), _ev("t1")], run_id, "proc.txt", bloco_id=0)
+    assert [n["Trecho"] for n in novas] == ["t1", "t2"]
+    # Mesma evidência em outro bloco não é regravada
+    novas = planilha.registrar_evidencias([_ev("t2"), _ev("t3")], run_id, "proc.txt", bloco_id=1)
+    assert [n["Trecho"] for n in novas] == ["t3"]
+    assert persistence.contar_evidencias(run_id) == 3
+
+    linhas = list(persistence.iterar_evidencias(run_id, lote=2))
+    assert [l["Trecho"] for l in linhas] == ["t1", "t2", "t3"]
+    assert list(linhas[0]) == planilha.COLUNAS_PADRAO
+    assert linhas[0]["Run ID"] == run_id
+
+
+def test_excel_gerado_sob_demanda(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    planilha.inicializar_planilha(run_id)
+    planilha.registrar_evidencias([_ev("t1"), _ev("t2")], run_id)
+
+    # Registrar não reescreve o Excel
+    assert planilha.ler_evidencias_df(planilha.get_caminho_excel(run_id)).empty
+
+    caminho = planilha.exportar_excel(run_id)
+    df = planilha.ler_evidencias_df(caminho)
+    assert list(df.columns) == planilha.COLUNAS_PADRAO
+    assert list(df["Trecho"]) == ["t1", "t2"]
+
+
+def test_excel_legado_importado_na_retomada(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    legado = pd.DataFrame([planilha._preparar_linha(_ev("antigo"), run_id, "proc.txt", "2025-01-01 00:00:00")])
+    legado.to_excel(planilha.get_caminho_excel(run_id), index=False)
+
+    planilha.inicializar_planilha(run_id)
+    planilha.inicializar_planilha(run_id)  # idempotente
+
+    assert persistence.contar_evidencias(run_id) == 1
+    assert planilha.registrar_evidencias([_ev("antigo")], run_id) == []
+
+
+def test_exportacao_write_only_resumo_primeiro(tmp_path, monkeypatch):
+    from openpyxl import load_workbook
+    import openpyxl
+
+    run_id = _setup(tmp_path, monkeypatch)
+    planilha.registrar_evidencias([_ev(f"t{i}\x0b") for i in range(2500)], run_id)
+
+    # A exportação não pode recarregar o arquivo para inserir a aba Resumo
+    def _proibido(*args, **kwargs):
+        raise AssertionError("load_workbook chamado durante a exportação")
+    with monkeypatch.context() as m:
+        m.setattr(openpyxl, "load_workbook", _proibido)
+        caminho = planilha.exportar_excel(run_id, "TIPO DE AÇÃO: Cobrança\nLinha livre")
+
+    wb = load_workbook(caminho)
+    assert wb.sheetnames == [planilha.NOME_ABA_RESUMO, planilha.NOME_ABA_EVIDENCIAS]
+    resumo = wb[planilha.NOME_ABA_RESUMO]
+    assert [c.value for c in resumo[2]] == ["TIPO DE AÇÃO", "Cobrança"]
+    assert resumo["A1"].font.bold
+
+    df = planilha.ler_evidencias_df(caminho)
+    assert len(df) == 2500
+    assert df["Trecho"].iloc[0] == "t0"  # caractere de controle removido
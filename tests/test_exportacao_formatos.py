@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pandas as pd
+
+from src import controlador, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="Formatos", arquivo_origem="proc.txt")
+
+
+def _ev(trecho: str) -> dict:
+    return {"Tipo de Evidência": "Contrato", "Trecho": trecho, "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}
+
+
+def test_exports_incrementais_durante_a_run(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    planilha.registrar_evidencias([_ev("antes")], run_id)  # já gravada (retomada)
+
+    planilha.abrir_exportacoes(run_id)
+    planilha.registrar_evidencias([_ev("t1"), _ev("antes")], run_id)
+
+    # JSONL é legível antes do fechamento
+    with open(planilha.get_caminho_exportacao(run_id, "jsonl"), encoding="utf-8") as f:
+        assert [json.loads(l)["Trecho"] for l in f] == ["antes", "t1"]
+
+    planilha.registrar_evidencias([_ev("t2")], run_id)
+    planilha.fechar_exportacoes(run_id)
+
+    df_parquet = pd.read_parquet(planilha.get_caminho_exportacao(run_id, "parquet"))
+    assert list(df_parquet.columns) == planilha.COLUNAS_PADRAO
+    assert list(df_parquet["Trecho"]) == ["antes", "t1", "t2"]
+
+    with gzip.open(planilha.get_caminho_exportacao(run_id, "csv"), "rt", encoding="utf-8") as f:
+        df_csv = pd.read_csv(f)
+    assert list(df_csv.columns) == planilha.COLUNAS_PADRAO
+    assert list(df_csv["Trecho"]) == ["antes", "t1", "t2"]
+
+
+def test_run_gera_formatos_junto_com_excel(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(
+        controlador, "enviar_bloco_para_gemini",
+        lambda texto_bloco, bloco_id=0, **kwargs: json.dumps([_ev(f"t{bloco_id}")]),
+    )
+
+    controlador.processar_blocos_run(run_id=run_id, blocos=["b0", "b1"], concorrencia=2)
+
+    assert set(planilha.caminhos_exportacao_existentes(run_id)) == {"parquet", "csv", "jsonl"}
+    assert len(pd.read_parquet(planilha.get_caminho_exportacao(run_id, "parquet"))) == 2
+    assert planilha._exportadores == {}
+
+
+def test_exportacao_sob_demanda_nao_fecha_exports_da_run_em_andamento(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    planilha.abrir_exportacoes(run_id)
+    planilha.registrar_evidencias([_ev("t1")], run_id)
+
+    parciais = planilha.exportar_formatos(run_id)  # botão do Histórico com a run rodando
+    assert set(parciais) == {"csv", "jsonl"}
+
+    planilha.registrar_evidencias([_ev("t2")], run_id)
+    planilha.fechar_exportacoes(run_id)
+    df_parquet = pd.read_parquet(planilha.get_caminho_exportacao(run_id, "parquet"))
+    assert list(df_parquet["Trecho"]) == ["t1", "t2"]
+
+    # Sem exports abertos: regera do banco via temporários, sem sobras na pasta
+    assert set(planilha.exportar_formatos(run_id)) == set(planilha.FORMATOS_EXPORTACAO)
+    with open(planilha.get_caminho_exportacao(run_id, "jsonl"), encoding="utf-8") as f:
+        assert [json.loads(l)["Trecho"] for l in f] == ["t1", "t2"]
+    assert not list((tmp_path / "runs" / run_id).glob("*.tmp"))
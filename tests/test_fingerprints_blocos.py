@@ -0,0 +1,125 @@
+import os
+
+from src import controlador, leitor_txt, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="Fingerprints", arquivo_origem="proc.txt")
+
+
+def _enviar_registrando(monkeypatch, enviados: list, falhar: set = frozenset()):
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        enviados.append(texto_bloco)
+        if texto_bloco in falhar:
+            raise RuntimeError("falha simulada")
+        return (
+            f'[{{"Tipo de Evidência": "Contrato", "Trecho": "{texto_bloco}", "Conteúdo": "c", '
+            f'"Resumo": "r", "Referência": "Pág. 1"}}]'
+        )
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+
+
+def test_retomada_casa_blocos_pelo_texto(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    enviados = []
+    _enviar_registrando(monkeypatch, enviados, falhar={"c"})
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b", "c", "d"])
+    assert persistence.get_processed_block_ids(run_id) == {0, 1, 3}
+
+    # Nova divisão: blocos mudam de posição, um novo surge e a run encolhe
+    enviados.clear()
+    _enviar_registrando(monkeypatch, enviados)
+    controlador.processar_blocos_run(run_id=run_id, blocos=["d", "c", "novo"])
+
+    assert sorted(enviados) == ["c", "novo"]  # "d" já processado em outra posição
+    assert persistence.get_processed_block_ids(run_id) == {0, 1, 2}
+    assert persistence.contar_blocos_finalizados(run_id) == 3  # posição 3 antiga removida
+
+    # Mesma divisão de novo: nada a enviar
+    enviados.clear()
+    controlador.processar_blocos_run(run_id=run_id, blocos=["d", "c", "novo"])
+    assert enviados == []
+
+
+def test_posicao_com_texto_diferente_nao_e_pulada(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    enviados = []
+    _enviar_registrando(monkeypatch, enviados)
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b"])
+
+    enviados.clear()
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b2"])
+    assert enviados == ["b2"]
+
+    # Linhas de runs antigas (sem fingerprint) só casam pela posição com a mesma divisão e total
+    def legado(divisao):
+        with persistence.transacao() as con:
+            con.execute("UPDATE run_items SET fingerprint=NULL, status=? WHERE run_id=?", (persistence.ITEM_OK, run_id))
+            con.execute("UPDATE runs SET divisao_blocos=?, total_blocos=2 WHERE run_id=?", (divisao, run_id))
+
+    legado("d1")
+    assert controlador.blocos_ja_processados(run_id, leitor_txt.BlocosTexto(["x", "y"], divisao="d1")) == {0, 1}
+    legado("d1")
+    assert controlador.blocos_ja_processados(run_id, leitor_txt.BlocosTexto(["x", "y"], divisao="d2")) == set()
+    legado("d1")
+    assert controlador.blocos_ja_processados(run_id, leitor_txt.BlocosTexto(["x"], divisao="d1")) == set()
+    legado(None)
+    assert controlador.blocos_ja_processados(run_id, ["x", "y"]) == set()
+
+
+def test_fingerprint_guarda_paginas_do_bloco(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(leitor_txt, "EMPACOTAR_POR_TOKENS", False)
+    txt = tmp_path / "proc.txt"
+    txt.write_text("".join(f"---Página--- {n}\nConteúdo {n}.\n" for n in range(3, 25)), encoding="utf-8")
+    blocos = leitor_txt.carregar_blocos_arquivo(str(txt), "---Página---")
+
+    assert controlador.blocos_ja_processados(run_id, blocos) == set()
+    with persistence.transacao() as con:
+        linhas = con.execute(
+            "SELECT fingerprint, pagina_inicial, pagina_final FROM run_items WHERE run_id=? ORDER BY bloco_id",
+            (run_id,),
+        ).fetchall()
+    assert [(r["pagina_inicial"], r["pagina_final"]) for r in linhas] == [(3, 12), (13, 22), (23, 24)]
+    assert [r["fingerprint"] for r in linhas] == [controlador.fingerprint_texto(b) for b in blocos]
+
+
+def test_sincronizacao_nao_toca_bloco_reservado_por_outro_lease(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    controlador.blocos_ja_processados(run_id, ["a", "b", "c"], lease_owner="dono")
+    persistence.semear_run_items(run_id, 3)
+    assert persistence.reivindicar_blocos(run_id, "auxiliar", 3, 60) == [0, 1, 2]
+
+    # O dono replaneja com outro texto: os blocos reservados pelo auxiliar ficam intactos
+    assert controlador.blocos_ja_processados(run_id, ["x", "y"], lease_owner="dono") == set()
+    with persistence.transacao() as con:
+        linhas = con.execute(
+            "SELECT bloco_id, status, lease_owner, fingerprint FROM run_items WHERE run_id=? ORDER BY bloco_id",
+            (run_id,),
+        ).fetchall()
+    assert [(r["status"], r["lease_owner"]) for r in linhas] == [(persistence.ITEM_LEASED, "auxiliar")] * 3
+    assert linhas[0]["fingerprint"] == controlador.fingerprint_texto("a")
+
+
+def test_auxiliar_confere_fingerprints_do_dono(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    controlador.blocos_ja_processados(run_id, ["a", "b"], lease_owner="dono")
+    digitais = [controlador.fingerprint_texto(t) for t in ("a", "b")]
+
+    assert persistence.conferir_fingerprints(run_id, digitais)
+    assert not persistence.conferir_fingerprints(run_id, digitais[:1])
+    assert not persistence.conferir_fingerprints(run_id, [digitais[0], controlador.fingerprint_texto("b2")])
+
+    # Auxiliar não reconcilia: nada em run_items muda e só os blocos livres são processados
+    enviados = []
+    _enviar_registrando(monkeypatch, enviados)
+    persistence.salvar_run_item(run_id, 0, persistence.ITEM_OK, 1)
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b"], lease_owner="auxiliar", reconciliar=False)
+    assert enviados == ["b"]
+    assert persistence.conferir_fingerprints(run_id, digitais)
+    # O Excel da run é do dono: o auxiliar não o gera nem o sobrescreve
+    assert not os.path.exists(planilha.get_caminho_excel(run_id))
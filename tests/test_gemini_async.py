@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+from src import cache_respostas, gemini_api
+
+
+def test_backoff_async_nao_bloqueia(tmp_path, monkeypatch):
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    esperas = []
+
+    async def fake_sleep(segundos):
+        esperas.append(segundos)
+
+    tentativas = [0]
+
+    async def fake_generate(model, contents, config):
+        tentativas[0] += 1
+        if tentativas[0] == 1:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(finish_reason="STOP")],
+            text='[{"Trecho": "x"}]',
+        )
+
+    fake_client = SimpleNamespace(aio=SimpleNamespace(models=SimpleNamespace(generate_content=fake_generate)))
+    monkeypatch.setattr(gemini_api, "client", fake_client)
+    monkeypatch.setattr(gemini_api.asyncio, "sleep", fake_sleep)
+
+    resposta = asyncio.run(gemini_api.enviar_bloco_para_gemini_async("texto", bloco_id=7))
+
+    assert resposta == '[{"Trecho": "x"}]'
+    assert tentativas[0] == 2
+    assert len(esperas) == 1
+
+
+def test_envio_async_grava_logs_cache_e_telemetria_fora_do_event_loop(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    threads = {}
+
+    def espionar(modulo, nome):
+        original = getattr(modulo, nome)
+
+        def espiao(*args, **kwargs):
+            threads.setdefault(nome, set()).add(threading.get_ident())
+            return original(*args, **kwargs)
+        monkeypatch.setattr(modulo, nome, espiao)
+
+    for modulo, nome in ((cache_respostas, "obter"), (cache_respostas, "guardar"),
+                         (gemini_api, "salvar_bloco_enviado"), (gemini_api, "salvar_resposta_em_log"),
+                         (gemini_api.telemetria, "registrar")):
+        espionar(modulo, nome)
+
+    async def fake_generate(model, contents, config):
+        return SimpleNamespace(candidates=[SimpleNamespace(finish_reason="STOP")],
+                               text='[{"Trecho": "x"}]', usage_metadata=None)
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=fake_generate)),
+    ))
+
+    async def enviar():
+        loop = threading.get_ident()
+        await gemini_api.enviar_bloco_para_gemini_async("bloco", bloco_id=0)
+        return loop
+
+    loop = asyncio.run(enviar())
+    assert set(threads) == {"obter", "guardar", "salvar_bloco_enviado", "salvar_resposta_em_log", "registrar"}
+    assert all(loop not in idents for idents in threads.values())
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from config import PROMPT_PADRAO
+from src import gemini_api
+from src.gemini_fake import BackendFake, CenarioFake, ClienteFake, ServidorFake, cliente_http, cliente_instalado
+from src.limitador import classificar_erro
+
+
+def _prompt(texto="fls. 7 Contrato assinado pelas partes. fls. 8 Pagamento em atraso."):
+    return gemini_api.montar_prompt_bloco(texto)
+
+
+def test_backend_simula_rajadas_truncamento_e_json_malformado():
+    rajada = BackendFake(CenarioFake(latencia_mediana_s=0, prob_rajada=1.0, duracao_rajada_s=60, codigo_rajada=503))
+    assert [rajada.responder("x").codigo for _ in range(3)] == [503, 503, 503]
+    assert rajada.estatisticas() == {"requisicoes": 3, "rajada": 3}
+
+    ok = BackendFake(CenarioFake(latencia_mediana_s=0)).responder(_prompt())
+    evidencias = json.loads(ok.texto)
+    assert len(evidencias) == 3 and ok.finish_reason == "STOP"
+    assert {e["Referência"] for e in evidencias} <= {"fls. 7", "fls. 8"}
+
+    truncada = BackendFake(CenarioFake(latencia_mediana_s=0, taxa_max_tokens=1.0)).responder(_prompt())
+    assert truncada.finish_reason == "MAX_TOKENS"
+    malformada = BackendFake(CenarioFake(latencia_mediana_s=0, taxa_json_malformado=1.0)).responder(_prompt())
+    assert malformada.finish_reason == "STOP"
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(malformada.texto)
+
+    resumo = BackendFake(CenarioFake(latencia_mediana_s=0)).responder("Resuma o processo")
+    assert resumo.texto.startswith("Resumo simulado")
+
+
+def test_cliente_em_processo_atende_o_pipeline(monkeypatch, tmp_path):
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path))
+    cliente = ClienteFake(BackendFake(CenarioFake(latencia_mediana_s=0, semente=1)))
+
+    with cliente_instalado(cliente):
+        assert gemini_api.client is cliente
+        resposta = gemini_api.enviar_bloco_para_gemini("fls. 3 Texto do bloco.", bloco_id=1, usar_cache=False)
+        trechos = []
+        _, completo = gemini_api.enviar_bloco_para_gemini_stream(
+            "fls. 4 Outro bloco.", bloco_id=2, usar_cache=False, ao_receber=trechos.append)
+    assert gemini_api.client is not cliente
+
+    assert len(json.loads(resposta)) == 3
+    assert completo and len(trechos) > 1
+    assert len(json.loads("".join(trechos))) == 3
+    assert cliente.backend.estatisticas() == {"requisicoes": 2, "ok": 2}
+
+
+def test_servidor_http_com_sdk_real(monkeypatch, tmp_path):
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path))
+    with ServidorFake(BackendFake(CenarioFake(latencia_mediana_s=0, retry_after_s=7))) as servidor:
+        cliente = cliente_http(servidor.url)
+        with cliente_instalado(cliente):
+            resposta = gemini_api.enviar_bloco_para_gemini("fls. 5 Bloco via HTTP.", bloco_id=1, usar_cache=False)
+        assert len(json.loads(resposta)) == 3
+        assert cliente.models.count_tokens(model=gemini_api.MODEL_ID, contents="abcdefgh").total_tokens == 2
+
+        # 429 chega ao SDK como ClientError com RetryInfo, como na API real
+        servidor.backend.cenario.taxa_429 = 1.0
+        with pytest.raises(Exception) as exc:
+            cliente.models.generate_content(model=gemini_api.MODEL_ID, contents=_prompt())
+        erro = classificar_erro(exc.value)
+        assert (erro.codigo, erro.retriavel, erro.retry_after) == (429, True, 7)
@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+
+from src import controlador, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="Leases", arquivo_origem="proc.txt")
+
+
+def test_reivindicacao_sem_sobreposicao_e_lease_vencido(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    persistence.semear_run_items(run_id, 5)
+    persistence.semear_run_items(run_id, 5)  # idempotente
+
+    a = persistence.reivindicar_blocos(run_id, "w1", 2, duracao_s=600)
+    b = persistence.reivindicar_blocos(run_id, "w2", 2, duracao_s=-1)  # já vencido
+    assert a == [0, 1] and b == [2, 3]
+    assert persistence.blocos_em_aberto(run_id) == 5
+
+    # Lease vencido de w2 volta a ser reivindicável; o de w1 não
+    c = persistence.reivindicar_blocos(run_id, "w3", 10, duracao_s=600)
+    assert c == [2, 3, 4]
+    assert persistence.reivindicar_blocos(run_id, "w4", 10, duracao_s=600) == []
+
+    # Resultado do bloco encerra o lease
+    persistence.salvar_run_item(run_id, 0, persistence.ITEM_OK, 3)
+    persistence.salvar_run_item(run_id, 2, persistence.ITEM_ERRO_LLM, 0, "falha")
+    assert persistence.contar_blocos_finalizados(run_id) == 2
+    assert persistence.get_processed_block_ids(run_id) == {0}
+
+    assert persistence.renovar_leases(run_id, "w3", 600) == 2
+    assert persistence.liberar_leases(run_id, "w3") == 2
+    assert persistence.reabrir_blocos_com_erro(run_id) == 1
+    assert persistence.reivindicar_blocos(run_id, "w5", 10, duracao_s=600) == [2, 3, 4]
+
+
+def test_migracao_adiciona_colunas_de_lease(tmp_path, monkeypatch):
+    db = tmp_path / "runs.db"
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(db))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    con = sqlite3.connect(str(db))
+    con.execute(
+        "CREATE TABLE run_items (run_id TEXT NOT NULL, bloco_id INTEGER NOT NULL, status TEXT NOT NULL, "
+        "evidencias_count INTEGER DEFAULT 0, erro_msg TEXT, processed_at TEXT NOT NULL, "
+        "PRIMARY KEY (run_id, bloco_id))"
+    )
+    con.execute("INSERT INTO run_items VALUES ('r1', 0, 'OK', 1, NULL, '2026-01-01 00:00:00')")
+    con.commit()
+    con.close()
+
+    persistence.init_db(forcar=True)
+
+    assert persistence.get_processed_block_ids("r1") == {0}
+    persistence.semear_run_items("r1", 2)
+    assert persistence.reivindicar_blocos("r1", "w1", 5, duracao_s=600) == [1]
+
+
+def test_dois_workers_dividem_a_run(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    enviados = []
+    lock = threading.Lock()
+
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        with lock:
+            enviados.append((threading.current_thread().name, bloco_id))
+        time.sleep(0.01)
+        return (
+            f'[{{"Tipo de Evidência": "Contrato", "Trecho": "t{bloco_id}", "Conteúdo": "c", '
+            f'"Resumo": "r", "Referência": "Pág. {bloco_id}"}}]'
+        )
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+    monkeypatch.setattr(controlador, "ESPERA_LEASES_ALHEIOS_S", 0.01)
+    blocos = [f"b{i}" for i in range(12)]
+    erros = []
+
+    def _worker(nome):
+        try:
+            controlador.processar_blocos_run(run_id=run_id, blocos=blocos, concorrencia=2, lease_owner=nome)
+        except Exception as exc:
+            erros.append(exc)
+        finally:
+            persistence.fechar_conexao()
+
+    threads = [threading.Thread(target=_worker, args=(f"w{n}",)) for n in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not erros
+    ids = sorted(b for _, b in enviados)
+    assert ids == list(range(12))  # cada bloco enviado uma única vez
+    assert persistence.get_processed_block_ids(run_id) == set(range(12))
+    assert persistence.blocos_em_aberto(run_id) == 0
+    run = persistence.get_run(run_id)
+    assert run["blocos_processados"] == 12
+    assert run["total_evidencias"] == persistence.contar_evidencias(run_id) == 12
+
+
+def test_auxilio_so_depois_do_resumo_do_dono(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    persistence.enfileirar_job(run_id)
+    persistence.reivindicar_job("dono")
+    visto_na_fase_1 = []
+
+    def fake_resumo(texto, **kwargs):
+        # Fase 1 em andamento: blocos já existem em run_items, mas a run não é oferecida
+        visto_na_fase_1.append((persistence.blocos_em_aberto(run_id),
+                                persistence.job_com_blocos_disponiveis(excluir_worker="ajudante")))
+        return "Resumo do processo"
+
+    monkeypatch.setattr(controlador, "gerar_resumo_processo", fake_resumo)
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", lambda texto, **kwargs: "[]")
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b"], texto_completo="ab",
+                                     usar_sac=True, usar_cache=False, lease_owner="dono")
+
+    assert visto_na_fase_1 == [(2, None)]
+    run = persistence.get_run(run_id)
+    assert run["auxilio_liberado"] == 1 and run["resumo_processo"] == "Resumo do processo"
+
+
+def test_auxiliar_nao_espera_leases_alheios(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    persistence.semear_run_items(run_id, 2)
+    assert persistence.reivindicar_blocos(run_id, "dono", 2, duracao_s=600) == [0, 1]
+    monkeypatch.setattr(controlador, "ESPERA_LEASES_ALHEIOS_S", 60)
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", lambda texto, **kwargs: "[]")
+
+    t0 = time.monotonic()
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b"], lease_owner="ajudante", reconciliar=False)
+
+    assert time.monotonic() - t0 < 5
+    assert persistence.blocos_em_aberto(run_id) == 2  # continuam com o dono
+
+
+def test_exports_do_dono_incluem_blocos_dos_auxiliares(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    persistence.semear_run_items(run_id, 3)
+    assert persistence.reivindicar_blocos(run_id, "ajudante", 1, duracao_s=600) == [0]
+    monkeypatch.setattr(controlador, "ESPERA_LEASES_ALHEIOS_S", 0.01)
+    monkeypatch.setattr(
+        controlador, "enviar_bloco_para_gemini",
+        lambda texto, bloco_id=0, **kwargs: f'[{{"Tipo de Evidência": "Contrato", "Trecho": "{texto}"}}]',
+    )
+
+    def _auxiliar_em_outro_processo():
+        # Grava direto no banco, como faria um worker auxiliar em outro processo
+        time.sleep(0.1)
+        persistence.inserir_evidencias(run_id, 0, [{"Tipo de Evidência": "Contrato", "Trecho": "do ajudante"}])
+        persistence.salvar_run_item(run_id, 0, persistence.ITEM_OK, 1)
+        persistence.fechar_conexao()
+
+    auxiliar = threading.Thread(target=_auxiliar_em_outro_processo)
+    auxiliar.start()
+    controlador.processar_blocos_run(run_id=run_id, blocos=["a", "b", "c"], lease_owner="dono")
+    auxiliar.join()
+
+    with open(planilha.get_caminho_exportacao(run_id, "jsonl"), encoding="utf-8") as f:
+        trechos = [json.loads(linha)["Trecho"] for linha in f]
+    assert sorted(trechos) == ["b", "c", "do ajudante"]
+    assert planilha._exportadores == {}
@@ -38,3 +38,151 @@ def test_teto_de_tamanho_subdivide(monkeypatch):
     blocos = dividir_por_paginas(doc, DELIM, paginas_por_bloco=10)
     assert len(blocos) > 1
     assert all(len(b) <= 60 for b in blocos)  # margem sobre o corte em ponto final
+
+
+def _doc_paginas(tamanhos):
+    return "".join(f"{DELIM} {i + 1}\n" + "x" * (n - 1) + ".\n" for i, n in enumerate(tamanhos))
+
+
+def test_empacota_paginas_ate_o_orcamento(monkeypatch):
+    from src import limitador
+    # Páginas de ~100 tokens; orçamento de 250 → 2 páginas por bloco
+    doc = _doc_paginas([400] * 5)
+    blocos = leitor_txt.empacotar_paginas_por_tokens(doc, DELIM, orcamento_tokens=250)
+    assert len(blocos) == 3
+    assert all(limitador.estimar_tokens(b) <= 251 for b in blocos)
+
+
+def test_empacotamento_preenche_com_paginas_pequenas(monkeypatch):
+    # Páginas esparsas: ao contrário de PAGINAS_POR_BLOCO fixo, cabem todas em 1 bloco
+    doc = _doc_paginas([40] * 30)
+    assert len(leitor_txt.empacotar_paginas_por_tokens(doc, DELIM, orcamento_tokens=1000)) == 1
+
+
+def test_pagina_acima_do_orcamento_e_subdividida(monkeypatch):
+    doc = _doc_paginas([100, 2000, 100])
+    blocos = leitor_txt.empacotar_paginas_por_tokens(doc, DELIM, orcamento_tokens=100)
+    assert len(blocos) >= 4
+    assert blocos[0].startswith("1 ") and blocos[-1].startswith("3 ")
+
+
+def test_razao_chars_por_token_do_documento():
+    # Mesma página de 400 chars: ~100 tokens a 4 chars/token, ~200 a 2 chars/token
+    doc = _doc_paginas([400] * 6)
+    contar = lambda razao: len(leitor_txt.empacotar_paginas_por_tokens(
+        doc, DELIM, orcamento_tokens=250, chars_por_token=razao))
+    # Sem estado global: a razão de um documento não afeta a divisão de outro
+    assert (contar(4.0), contar(2.0), contar(4.0)) == (3, 6, 3)
+
+
+def test_orcamento_derivado_da_folga_de_saida(monkeypatch):
+    monkeypatch.setattr(leitor_txt, "TOKENS_ENTRADA_POR_BLOCO", 0)
+    monkeypatch.setattr(leitor_txt, "MAX_OUTPUT_TOKENS_BLOCO", 10_000)
+    monkeypatch.setattr(leitor_txt, "RESERVA_RACIOCINIO_TOKENS", 2_000)
+    monkeypatch.setattr(leitor_txt, "MARGEM_SAIDA", 0.5)
+    monkeypatch.setattr(leitor_txt, "RAZAO_SAIDA_ENTRADA", 2.0)
+    assert leitor_txt.orcamento_tokens_bloco() == 2_000
+    monkeypatch.setattr(leitor_txt, "TOKENS_ENTRADA_POR_BLOCO", 1234)
+    assert leitor_txt.orcamento_tokens_bloco() == 1234
+
+
+def _dividir_em_blocos_por_copia(texto, tamanho):
+    """Implementação anterior (copia o restante a cada bloco) — referência do resultado."""
+    blocos = []
+    while len(texto) > tamanho:
+        corte = texto.rfind(".", 0, tamanho)
+        if corte == -1:
+            corte = tamanho
+        blocos.append(texto[:corte + 1].strip())
+        texto = texto[corte + 1:].strip()
+    if texto:
+        blocos.append(texto)
+    return blocos
+
+
+def test_dividir_em_blocos_igual_a_implementacao_por_copia():
+    import random
+    rng = random.Random(7)
+    pedacos = ["Frase curta.", "palavra", " ", "  \n", ".", "sem ponto final", "\t", "Fim. "]
+    casos = ["", "   ", "abc", " . ", "x" * 50, "  Começo com espaço. " * 5 + "   "]
+    casos += ["".join(rng.choices(pedacos, k=rng.randint(1, 60))) for _ in range(300)]
+    for texto in casos:
+        for tamanho in (1, 5, 17, 40, 1000):
+            assert leitor_txt.dividir_em_blocos(texto, tamanho) == _dividir_em_blocos_por_copia(texto, tamanho)
+
+
+def test_blocos_do_arquivo_iguais_aos_do_texto(monkeypatch, tmp_path):
+    monkeypatch.setattr(leitor_txt, "TOKENS_ENTRADA_POR_BLOCO", 100)
+    monkeypatch.setattr(leitor_txt, "MAX_CHARS_BLOCO", 300)
+    docs = [
+        _doc_paginas([100, 2000, 100, 40, 40, 900]),
+        _doc_paginas([60] * 23 + [700] + [30] * 4),
+        f"Capa sem número.\r\n{DELIM} 7\r\nAção e citação. Página\r\n{DELIM}   \n{DELIM}\nsem número. ___\n"
+        + f"{DELIM} 12" + " é" * 200,
+        f"{DELIM}{DELIM} 3",
+        "texto sem marcador algum. " * 80,
+    ]
+    for i, doc in enumerate(docs):
+        caminho = tmp_path / f"doc{i}.txt"
+        caminho.write_bytes(doc.encode("utf-8"))
+        texto = caminho.read_text(encoding="utf-8")
+        for por_tokens in (True, False):
+            monkeypatch.setattr(leitor_txt, "EMPACOTAR_POR_TOKENS", por_tokens)
+            blocos = leitor_txt.carregar_blocos_arquivo(str(caminho), DELIM)
+            assert list(blocos) == leitor_txt.dividir_texto_em_blocos(texto, DELIM)
+            assert blocos[-1:] == list(blocos)[-1:]
+            densos = leitor_txt.carregar_blocos_arquivo(str(caminho), DELIM, chars_por_token=2.5)
+            assert list(densos) == leitor_txt.dividir_texto_em_blocos(texto, DELIM, chars_por_token=2.5)
+
+
+def test_indice_de_paginas_salvo_e_reaproveitado(monkeypatch, tmp_path):
+    caminho, indice_json = tmp_path / "doc.txt", tmp_path / "run" / leitor_txt.NOME_INDICE_PAGINAS
+    caminho.write_text(DOC, encoding="utf-8")
+    indice = leitor_txt.indice_paginas(str(caminho), DELIM, str(indice_json))
+    assert list(indice.numeros) == [1, 2, 3] and indice_json.exists()
+    assert [p for _, p in detectar_paginas(DOC, DELIM)] == list(indice.iterar_paginas())
+
+    def _nao_reindexa(*args):
+        raise AssertionError("índice atual deveria ser reaproveitado")
+    monkeypatch.setattr(leitor_txt, "indexar_paginas", _nao_reindexa)
+    reaproveitado = leitor_txt.indice_paginas(str(caminho), DELIM, str(indice_json))
+    assert list(reaproveitado.inicios) == list(indice.inicios)
+
+    # Arquivo alterado → índice obsoleto é refeito
+    monkeypatch.undo()
+    caminho.write_text(DOC + f"{DELIM} 4\nPágina nova. Aditivo.\n", encoding="utf-8")
+    assert len(leitor_txt.indice_paginas(str(caminho), DELIM, str(indice_json))) == 4
+
+
+def test_amostras_de_calibracao_lidas_por_seek(tmp_path):
+    caminho = tmp_path / "doc.txt"
+    caminho.write_bytes(b"a" * 100 + b"m" * 100 + b"z" * 100)
+    assert leitor_txt.ler_amostras(str(caminho), 100) == "a" * 100 + "m" * 100 + "z" * 100
+    assert leitor_txt.ler_amostras(str(caminho), 10) == "a" * 10 + "m" * 10 + "z" * 10
+
+    # Amostra que corta um caractere multibyte descarta só o pedaço cortado
+    caminho.write_bytes("é".encode("utf-8") * 200)
+    amostra = leitor_txt.ler_amostras(str(caminho), 11)
+    assert set(amostra) == {"é"} and 3 * 5 <= len(amostra) <= 3 * 6
+
+
+def test_cortes_de_pagina_apontam_o_inicio_de_cada_pagina(monkeypatch, tmp_path):
+    monkeypatch.setattr(leitor_txt, "TOKENS_ENTRADA_POR_BLOCO", 300)
+    monkeypatch.setattr(leitor_txt, "PAGINAS_POR_BLOCO", 3)
+    caminho = tmp_path / "doc.txt"
+    caminho.write_text(_doc_paginas([200, 180, 220, 150, 5000, 190]), encoding="utf-8")
+    for por_tokens in (True, False):
+        monkeypatch.setattr(leitor_txt, "EMPACOTAR_POR_TOKENS", por_tokens)
+        blocos = leitor_txt.carregar_blocos_arquivo(str(caminho), DELIM)
+        com_cortes = 0
+        for i in range(len(blocos)):
+            texto, cortes = blocos.texto_e_cortes(i)
+            assert texto == blocos[i]
+            primeira, ultima = blocos.paginas(i)
+            if cortes:
+                com_cortes += 1
+                # Cada corte cai exatamente no número da página seguinte
+                inicios = [int(texto[c:].split(" ", 1)[0]) for c in cortes]
+                assert inicios == list(range(primeira + 1, primeira + 1 + len(cortes)))
+                assert inicios[-1] <= ultima
+        assert com_cortes > 0
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+from src import limitador as mod
+from src.limitador import LimitadorAdaptativo, classificar_erro
+
+
+class Relogio:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_balde_rpm_exige_espera_apos_esgotar():
+    relogio = Relogio()
+    lim = LimitadorAdaptativo(rpm=2, tpm=10_000, concorrencia_max=10, relogio=relogio)
+
+    assert lim._tentar_adquirir(10) == 0
+    assert lim._tentar_adquirir(10) == 0
+    # 3ª requisição no mesmo minuto: precisa esperar ~30s (2 req/min)
+    espera = lim._tentar_adquirir(10)
+    assert 29 < espera <= 30
+
+    relogio.t += 30
+    assert lim._tentar_adquirir(10) == 0
+
+
+def test_balde_tpm_limita_por_tokens():
+    relogio = Relogio()
+    lim = LimitadorAdaptativo(rpm=1000, tpm=600, concorrencia_max=10, relogio=relogio)
+
+    assert lim._tentar_adquirir(500) == 0
+    # Restam 100 tokens; 300 exigem (300-100)/(600/60) = 20s
+    assert lim._tentar_adquirir(300) == 20
+
+
+def test_aimd_reduz_na_sobrecarga_e_cresce_com_sucessos():
+    relogio = Relogio()
+    lim = LimitadorAdaptativo(rpm=10_000, tpm=10**9, concorrencia_max=8, relogio=relogio)
+
+    lim.liberar(sobrecarga=True)
+    assert lim.limite == 4
+    # Segundo 429 dentro do resfriamento não corta de novo
+    lim.liberar(sobrecarga=True)
+    assert lim.limite == 4
+
+    # Passada a janela de medição, sucessos voltam a aumentar o limite
+    relogio.t += mod.JANELA_TAXA_S + 1
+    for _ in range(4):
+        lim.liberar()
+    assert lim.limite == 5
+
+
+def test_concorrencia_respeita_limite():
+    lim = LimitadorAdaptativo(rpm=10_000, tpm=10**9, concorrencia_max=2, relogio=Relogio())
+    assert lim._tentar_adquirir(1) == 0
+    assert lim._tentar_adquirir(1) == 0
+    assert lim._tentar_adquirir(1) == mod.ESPERA_SEM_VAGA_S
+    lim.liberar()
+    assert lim._tentar_adquirir(1) == 0
+
+
+def test_retry_after_pausa_todas_as_chamadas():
+    relogio = Relogio()
+    lim = LimitadorAdaptativo(rpm=10_000, tpm=10**9, concorrencia_max=4, relogio=relogio)
+    lim.liberar(sobrecarga=True, retry_after=12)
+    assert lim._tentar_adquirir(1) == 12
+    relogio.t += 12
+    assert lim._tentar_adquirir(1) == 0
+
+
+def test_espera_retentativa_honra_retry_after():
+    lim = LimitadorAdaptativo(rpm=10, tpm=10, concorrencia_max=1, jitter=0.25)
+    for _ in range(20):
+        assert 2.25 <= lim.espera_retentativa(0, base=3) <= 3.75
+        assert lim.espera_retentativa(0, retry_after=40, base=3) >= 40
+
+
+def test_classificar_erro_por_codigo_e_cabecalho():
+    exc = RuntimeError("quota")
+    exc.code = 429
+    exc.response = SimpleNamespace(headers={"retry-after": "7"})
+    erro = classificar_erro(exc)
+    assert erro.retriavel and erro.sobrecarga
+    assert erro.retry_after == 7
+
+
+def test_classificar_erro_retry_info_no_corpo():
+    exc = RuntimeError("429 RESOURCE_EXHAUSTED")
+    exc.details = {"error": {"details": [{"@type": "RetryInfo", "retryDelay": "15s"}]}}
+    erro = classificar_erro(exc)
+    assert erro.codigo == 429
+    assert erro.retry_after == 15
+
+
+def test_classificar_erro_nao_retriavel():
+    erro = classificar_erro(ValueError("400 INVALID_ARGUMENT"))
+    assert not erro.retriavel
+    assert erro.retry_after is None
+
+
+def test_calibracao_do_estimador(monkeypatch, tmp_path):
+    from types import SimpleNamespace as NS
+    from src import gemini_api
+    monkeypatch.setattr(gemini_api, "client", NS(models=NS(
+        count_tokens=lambda model, contents: NS(total_tokens=len(contents) // 3),
+    )))
+    caminho = tmp_path / "doc.txt"
+    caminho.write_text("abc" * 1000, encoding="utf-8")
+
+    razao = gemini_api.calibrar_estimador_tokens(str(caminho))
+    assert razao == 3.0
+    assert mod.estimar_tokens("x" * 300, razao) == 101
+    assert mod.estimar_tokens("x" * 300) == 76  # sem razão do documento: padrão
+
+    # Falha no count_tokens: razão padrão
+    monkeypatch.setattr(gemini_api, "client", NS(models=NS(count_tokens=None)))
+    assert gemini_api.calibrar_estimador_tokens(str(caminho)) == mod.CHARS_POR_TOKEN_ESTIMADO
@@ -55,3 +55,20 @@ def test_fallback_markdown_simples():
 def test_vazio_retorna_lista_vazia():
     assert extrair_campos("[]") == []
     assert extrair_campos("sem nada útil aqui") == []
+
+
+def test_parser_incremental_emite_objetos_ao_fechar():
+    from src.controlador import ParserJSONIncremental
+
+    resp = (
+        '[{"Trecho": "a {chave} \\"aspas\\"", "Referência": "Pág. 1"},'
+        '{"Trecho": "b", "Extra": {"aninhado": 1}},'
+        '{"Trecho": "c incompleto'
+    )
+    parser = ParserJSONIncremental()
+    emitidos = []
+    for ch in resp:  # um caractere por vez, como um stream bem fragmentado
+        emitidos.extend(parser.alimentar(ch))
+
+    assert [o["Trecho"] for o in emitidos] == ['a {chave} "aspas"', "b"]
+    assert emitidos[1]["Extra"] == {"aninhado": 1}
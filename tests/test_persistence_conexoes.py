@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from src import controlador, persistence, planilha
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+
+
+def test_conexao_por_thread_reaproveitada(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    con = persistence._conexao()
+    assert persistence._conexao() is con
+    assert con.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    outra = []
+    t = threading.Thread(target=lambda: outra.append(persistence._conexao()))
+    t.start()
+    t.join()
+    assert outra[0] is not con
+
+
+def test_init_db_roda_uma_vez_por_banco(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    chamadas = []
+    monkeypatch.setattr(persistence, "_migrar_schema", lambda con: chamadas.append(con))
+    persistence.init_db()
+    persistence.init_db()
+    assert chamadas == []
+    persistence.init_db(forcar=True)
+    assert len(chamadas) == 1
+
+
+def test_transacao_agrupa_e_desfaz(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    run_id = persistence.criar_run(nome="Tx")
+
+    with pytest.raises(RuntimeError):
+        with persistence.transacao():
+            persistence.salvar_run_item(run_id, 0, persistence.ITEM_OK, 1)
+            persistence.atualizar_progresso_run(run_id, 3, 1, 1)
+            raise RuntimeError("falha no meio do checkpoint")
+
+    assert persistence.get_processed_block_ids(run_id) == set()
+    assert persistence.get_run(run_id)["blocos_processados"] == 0
+
+
+def test_checkpoint_de_bloco_em_um_unico_commit(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    run_id = persistence.criar_run(nome="Checkpoint")
+    planilha.inicializar_planilha(run_id)
+
+    comandos = []
+    persistence._conexao().set_trace_callback(comandos.append)
+    resposta = '[{"Tipo de Evidência": "Contrato", "Trecho": "t", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}]'
+    status, linhas = controlador._checkpoint_bloco(run_id, 0, resposta, "proc.txt", 2, 0, 0)
+    persistence._conexao().set_trace_callback(None)
+
+    assert (status, linhas) == ("ok", 1)
+    assert comandos.count("COMMIT") == 1
+    run = persistence.get_run(run_id)
+    assert (run["blocos_processados"], run["total_evidencias"]) == (1, 1)
@@ -52,3 +52,13 @@ def test_migracao_idempotente_em_banco_legado(tmp_path, monkeypatch):
     assert run is not None
     assert run["nome"] == "Legado"
     assert run["resumo_processo"] is None
+
+
+def test_resumo_por_hash_de_documento(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    persistence.init_db()
+
+    assert persistence.get_resumo_documento("abc") is None
+    persistence.salvar_resumo_documento("abc", "OBJETO: teste")
+    assert persistence.get_resumo_documento("abc") == "OBJETO: teste"
@@ -1,6 +1,6 @@
 from openpyxl import load_workbook
 
-from src import planilha
+from src import persistence, planilha
 
 
 RESUMO = """TIPO DE AÇÃO: Reclamação Trabalhista
@@ -14,6 +14,9 @@ VALORES EM DISPUTA: R$ 50.000,00"""
 def _setup_runs(tmp_path, monkeypatch):
     runs = tmp_path / "runs"
     monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(runs))
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    persistence.init_db()
 
 
 def test_resumo_e_primeira_aba_e_evidencias_intactas(tmp_path, monkeypatch):
@@ -27,7 +30,7 @@ def test_resumo_e_primeira_aba_e_evidencias_intactas(tmp_path, monkeypatch):
     ]
     planilha.adicionar_linhas_excel(evidencias, run_id=run_id, arquivo_origem="proc.txt")
 
-    planilha.escrever_resumo_primeira_aba(run_id, RESUMO)
+    planilha.exportar_excel(run_id, RESUMO)
 
     caminho = planilha.get_caminho_excel(run_id)
     wb = load_workbook(caminho)
@@ -50,7 +53,7 @@ def test_resumo_vazio_nao_cria_aba(tmp_path, monkeypatch):
     _setup_runs(tmp_path, monkeypatch)
     run_id = "vazio1"
     planilha.inicializar_planilha(run_id)
-    planilha.escrever_resumo_primeira_aba(run_id, "")
+    planilha.exportar_excel(run_id, "")
 
     wb = load_workbook(planilha.get_caminho_excel(run_id))
     assert planilha.NOME_ABA_RESUMO not in wb.sheetnames
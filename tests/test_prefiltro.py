@@ -0,0 +1,82 @@
+import csv
+
+from src import controlador, leitor_txt, persistence, planilha
+from src.prefiltro import pontuar_pagina, triar_paginas
+
+DELIM = "---Página---"
+
+NOTA = ("DANFE - Nota Fiscal Eletrônica\nChave 3519 0612 3456 7800 0190 5500 1000 0012 3410 0001 2345\n"
+        "Emitente ACME LTDA CNPJ 12.345.678/0001-90. Total R$ 1.234,56 em 12/03/2021.")
+PETICAO = ("EXCELENTÍSSIMO SENHOR DOUTOR JUIZ. Trata-se de ação de cobrança; conforme jurisprudência "
+           "pacífica, a ementa do acórdão se aplica. Nestes termos, pede deferimento.")
+TABELA = "Item    Quantidade    Valor\nParafuso    10    5,00\nPorca    20    3,50\n"
+
+
+def test_pontua_sinais_documentais_e_narrativa():
+    pontuacao_nota, sinais = pontuar_pagina(NOTA)
+    assert {"cnpj", "moeda", "chave_nfe", "termo_documental"} <= set(sinais)
+    assert pontuacao_nota > pontuar_pagina(TABELA)[0] > 0 > pontuar_pagina(PETICAO)[0]
+
+    mantidas, ignoradas = triar_paginas([(1, NOTA), (2, PETICAO), (3, "  \n"), (4, TABELA)], limiar=2.0)
+    assert mantidas == [0, 2, 3]  # página em branco não entra no relatório
+    assert [(p.numero, p.sinais) for p in ignoradas] == [(2, {"narrativa": 5})]
+
+
+def test_paginas_ignoradas_ficam_fora_dos_blocos(tmp_path, monkeypatch):
+    monkeypatch.setattr(leitor_txt, "PREFILTRO_ATIVO", True)
+    monkeypatch.setattr(leitor_txt, "PREFILTRO_LIMIAR", 2.0)
+    paginas = [NOTA, PETICAO, PETICAO, TABELA, PETICAO, NOTA] * 4
+    doc = "".join(f"{DELIM} {n}\n{texto}\n" for n, texto in enumerate(paginas, 1))
+    txt = tmp_path / "proc.txt"
+    txt.write_text(doc, encoding="utf-8")
+
+    for por_tokens in (True, False):
+        monkeypatch.setattr(leitor_txt, "EMPACOTAR_POR_TOKENS", por_tokens)
+        blocos = leitor_txt.carregar_blocos_arquivo(str(txt), DELIM)
+        do_texto = leitor_txt.dividir_texto_em_blocos(doc, DELIM)
+        assert list(blocos) == do_texto
+        assert "pede deferimento" not in " ".join(blocos)
+        assert [p.numero for p in blocos.paginas_ignoradas] == [n for n in range(1, 25) if n % 6 in (2, 3, 5)]
+        assert do_texto.paginas_ignoradas == blocos.paginas_ignoradas
+
+    monkeypatch.setattr(leitor_txt, "PREFILTRO_ATIVO", False)
+    assert "pede deferimento" in " ".join(leitor_txt.carregar_blocos_arquivo(str(txt), DELIM))
+
+
+def test_relatorio_de_paginas_ignoradas_na_pasta_da_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(leitor_txt, "PREFILTRO_ATIVO", True)
+    persistence.init_db()
+    run_id = persistence.criar_run(nome="Triagem", arquivo_origem="proc.txt")
+    txt = tmp_path / "proc.txt"
+    txt.write_text(f"{DELIM} 1\n{NOTA}\n{DELIM} 2\n{PETICAO}\n", encoding="utf-8")
+    enviados = []
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini",
+                        lambda texto, bloco_id=0, **kwargs: enviados.append(texto) or "[]")
+
+    controlador.processar_blocos_run(run_id=run_id, blocos=leitor_txt.carregar_blocos_arquivo(str(txt), DELIM))
+
+    assert len(enviados) == 1 and "DANFE" in enviados[0] and "EXCELENTÍSSIMO" not in enviados[0]
+    with open(planilha.get_caminho_relatorio_triagem(run_id), encoding="utf-8") as f:
+        linhas = list(csv.DictReader(f, delimiter=";"))
+    assert [(r["pagina"], r["sinais"]) for r in linhas] == [("2", "narrativa=5")]
+    assert linhas[0]["inicio"].startswith("2 EXCELENTÍSSIMO")
+
+
+def test_relatorio_gravado_com_blocos_do_texto(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(leitor_txt, "PREFILTRO_ATIVO", True)
+    persistence.init_db()
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", lambda texto, bloco_id=0, **kwargs: "[]")
+    doc = f"{DELIM} 1\n{NOTA}\n{DELIM} 2\n{PETICAO}\n"
+
+    # Blocos vindos do texto já lido (scripts, fallback sem índice) também levam o relatório
+    run_id = persistence.criar_run(nome="Texto", arquivo_origem="proc.txt")
+    controlador.processar_blocos_run(run_id=run_id, blocos=leitor_txt.dividir_texto_em_blocos(doc, DELIM))
+
+    with open(planilha.get_caminho_relatorio_triagem(run_id), encoding="utf-8") as f:
+        assert [r["pagina"] for r in csv.DictReader(f, delimiter=";")] == ["2"]
@@ -0,0 +1,64 @@
+import threading
+from types import SimpleNamespace
+
+from src import cache_respostas, gemini_api
+
+DELIM = "---Página---"
+
+
+def _setup(tmp_path, monkeypatch, prompts):
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    monkeypatch.setattr(gemini_api, "RESUMO_MAPREDUCE_ACIMA_DE", 200)
+    monkeypatch.setattr(gemini_api, "MAX_CHARS_RESUMO_PARCIAL", 120)
+    lock = threading.Lock()
+
+    def generate_content(model, contents, config):
+        with lock:
+            prompts.append(contents)
+            n = len(prompts)
+        texto = "TIPO DE AÇÃO: Final" if contents.startswith(gemini_api.PROMPT_REDUTOR) else f"parcial {n}"
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(finish_reason="STOP")], text=texto, usage_metadata=None,
+        )
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(models=SimpleNamespace(generate_content=generate_content)))
+
+
+def _documento(n_paginas: int) -> str:
+    return "".join(f"{DELIM} {i}\nConteúdo da página {i} com nota fiscal {i}.\n" for i in range(1, n_paginas + 1))
+
+
+def test_divide_por_grupos_de_paginas_sem_perder_texto(monkeypatch):
+    monkeypatch.setattr(gemini_api, "MAX_CHARS_RESUMO_PARCIAL", 120)
+    trechos = gemini_api._dividir_para_resumo(_documento(10), DELIM)
+    assert len(trechos) > 1
+    assert trechos[0].startswith("[Páginas 1–")
+    juntos = "".join(trechos)
+    for i in range(1, 11):
+        assert f"nota fiscal {i}." in juntos
+
+
+def test_documento_grande_usa_map_reduce(tmp_path, monkeypatch):
+    prompts = []
+    _setup(tmp_path, monkeypatch, prompts)
+
+    resumo = gemini_api.gerar_resumo_processo(_documento(10), delimitador=DELIM)
+
+    assert resumo == "TIPO DE AÇÃO: Final"
+    parciais = [p for p in prompts if p.startswith(gemini_api.PROMPT_RESUMO_PARCIAL)]
+    reducao = [p for p in prompts if p.startswith(gemini_api.PROMPT_REDUTOR)]
+    assert len(parciais) == len(gemini_api._dividir_para_resumo(_documento(10), DELIM))
+    assert len(reducao) == 1
+    # O redutor recebe todos os resumos parciais
+    assert reducao[0].count("[RESUMO PARCIAL ") == len(parciais)
+
+
+def test_documento_pequeno_usa_chamada_unica(tmp_path, monkeypatch):
+    prompts = []
+    _setup(tmp_path, monkeypatch, prompts)
+
+    gemini_api.gerar_resumo_processo(_documento(1), delimitador=DELIM)
+
+    assert len(prompts) == 1
+    assert prompts[0].startswith(gemini_api.PROMPT_RESUMIDOR)
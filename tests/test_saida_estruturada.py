@@ -0,0 +1,45 @@
+from src import controlador, gemini_api, persistence, planilha
+from src.controlador import extrair_campos_estruturado
+from src.planilha import COLUNAS_EVIDENCIA
+
+
+def test_schema_usa_colunas_de_evidencia():
+    schema = gemini_api.schema_evidencias()
+    assert schema.type == "ARRAY"
+    assert list(schema.items.properties) == COLUNAS_EVIDENCIA
+    assert schema.items.required == COLUNAS_EVIDENCIA
+
+
+def test_config_bloco_modo_json(monkeypatch):
+    monkeypatch.setattr(gemini_api, "SAIDA_JSON_ESTRUTURADA", True)
+    cfg = gemini_api._config_bloco()
+    assert cfg.response_mime_type == "application/json"
+    assert cfg.response_schema is not None
+
+    monkeypatch.setattr(gemini_api, "SAIDA_JSON_ESTRUTURADA", False)
+    assert gemini_api._config_bloco().response_schema is None
+
+
+def test_parse_estruturado_passada_unica():
+    resp = '[{"Tipo de Evidência": "Contrato", "Trecho": "t\\n", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"}]'
+    out = extrair_campos_estruturado(resp)
+    assert out == [{"Tipo de Evidência": "Contrato", "Trecho": "t", "Conteúdo": "c",
+                    "Resumo": "r", "Referência": "Pág. 1"}]
+    assert extrair_campos_estruturado("[]") == []
+    assert extrair_campos_estruturado("```json\n[]") is None
+    assert extrair_campos_estruturado('{"a": 1}') is None
+
+
+def test_array_vazio_nao_e_erro_de_parse(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(controlador, "SAIDA_JSON_ESTRUTURADA", True)
+    persistence.init_db()
+    run_id = persistence.criar_run(nome="Schema", arquivo_origem="proc.txt")
+
+    status, novas = controlador._registrar_resultado_bloco(run_id, 0, "[]")
+
+    assert (status, novas) == ("vazio", 0)
+    # Bloco sem evidências conta como processado: não é reenviado (pago) na retomada
+    assert persistence.get_processed_block_ids(run_id) == {0}
@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+from src import cache_respostas, controlador, gemini_api, persistence, planilha
+
+RESPOSTA = (
+    '[{"Tipo de Evidência": "Contrato", "Trecho": "t1", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 1"},'
+    '{"Tipo de Evidência": "Nota Fiscal", "Trecho": "t2", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 2"},'
+    '{"Tipo de Evidência": "Pagamento", "Trecho": "t3", "Conte'
+)
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+    return persistence.criar_run(nome="Stream")
+
+
+def _fake_stream(completo_por_bloco):
+    def fake(texto_bloco, bloco_id=0, contexto_global="", usar_cache=True, ao_receber=None, **kwargs):
+        texto = RESPOSTA if not completo_por_bloco[bloco_id] else RESPOSTA[:RESPOSTA.rfind(",")] + "]"
+        for k in range(0, len(texto), 7):
+            ao_receber(texto[k:k + 7])
+        return texto, completo_por_bloco[bloco_id]
+    return fake
+
+
+def test_evidencias_gravadas_progressivamente(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini_stream", _fake_stream({0: True}))
+
+    eventos = []
+    total, _ = controlador.processar_blocos_run(
+        run_id=run_id, blocos=["b0"], streaming=True,
+        progress_cb=lambda b, t, e, s: eventos.append((s, e)),
+    )
+
+    assert eventos == [("parcial", 1), ("parcial", 2), ("ok", 2)]
+    assert total == 2
+    assert persistence.get_processed_block_ids(run_id) == {0}
+
+
+def test_queda_do_stream_preserva_objetos_completos(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini_stream", _fake_stream({0: False}))
+
+    eventos = []
+    total, _ = controlador.processar_blocos_run(
+        run_id=run_id, blocos=["b0"], streaming=True,
+        progress_cb=lambda b, t, e, s: eventos.append(s),
+    )
+
+    # Os 2 objetos completos ficam gravados; o bloco fica pendente para retomada
+    assert total == 2
+    assert eventos[-1] == "erro"
+    assert persistence.get_processed_block_ids(run_id) == set()
+    assert len(planilha.ler_evidencias_df(planilha.get_caminho_excel(run_id))) == 2
+
+
+def test_stream_interrompido_na_api_nao_e_retentado(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    chamadas = [0]
+
+    def generate_content_stream(model, contents, config):
+        chamadas[0] += 1
+        yield SimpleNamespace(candidates=[], text='[{"Trecho": "a"},', usage_metadata=None)
+        raise ConnectionError("conexão perdida")
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(
+        models=SimpleNamespace(generate_content_stream=generate_content_stream)
+    ))
+
+    recebidos = []
+    texto, completo = gemini_api.enviar_bloco_para_gemini_stream("bloco", ao_receber=recebidos.append)
+
+    assert chamadas[0] == 1
+    assert completo is False
+    assert texto == '[{"Trecho": "a"},'
+    assert recebidos == ['[{"Trecho": "a"},']
+
+
+def test_stream_truncado_grava_evidencias_das_metades(tmp_path, monkeypatch):
+    run_id = _setup(tmp_path, monkeypatch)
+
+    def fake(texto_bloco, bloco_id=0, contexto_global="", usar_cache=True, ao_receber=None,
+             ao_subdividir=None, **kwargs):
+        ao_receber(RESPOSTA)  # truncada no 3º objeto: grava 2
+        mesclado = (
+            '[{"Tipo de Evidência": "Pagamento", "Trecho": "t3", "Conteúdo": "c", "Resumo": "r", "Referência": "Pág. 3"}]'
+        )
+        ao_subdividir(mesclado)
+        return mesclado, True
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini_stream", fake)
+
+    total, _ = controlador.processar_blocos_run(run_id=run_id, blocos=["b0"], streaming=True)
+
+    assert total == 3
+    assert persistence.get_processed_block_ids(run_id) == {0}
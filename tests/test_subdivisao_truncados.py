@@ -0,0 +1,203 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+from src import cache_respostas, gemini_api
+
+
+def _resposta(texto: str, finish_reason: str = "STOP"):
+    return SimpleNamespace(candidates=[SimpleNamespace(finish_reason=finish_reason)], text=texto, usage_metadata=None)
+
+
+def _setup(tmp_path, monkeypatch, limite_chars: int):
+    """Fake que trunca prompts de blocos maiores que `limite_chars`."""
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(gemini_api, "MIN_CHARS_SUBBLOCO", 10)
+    monkeypatch.setattr(gemini_api, "montar_prompt_bloco", lambda texto, contexto="": texto)
+    enviados = []
+    lock = threading.Lock()
+
+    def gerar(texto):
+        with lock:
+            enviados.append(texto)
+        if len(texto) > limite_chars:
+            return _resposta('[{"Trecho": "parcial"}, {"Tre', "MAX_TOKENS")
+        return _resposta(json.dumps([{"Trecho": texto.split(".")[0]}]))
+
+    async def gerar_async(model, contents, config):
+        return gerar(contents)
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(
+        models=SimpleNamespace(generate_content=lambda model, contents, config: gerar(contents)),
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=gerar_async)),
+    ))
+    return enviados
+
+
+BLOCO = "Frase um aqui. Frase dois aqui. Frase tres aqui. Frase quatro aqui."
+
+
+def test_dividir_ao_meio_prefere_fim_de_frase(monkeypatch):
+    monkeypatch.setattr(gemini_api, "MIN_CHARS_SUBBLOCO", 10)
+    assert gemini_api._dividir_ao_meio(BLOCO) == [
+        ("Frase um aqui. Frase dois aqui.", []), ("Frase tres aqui. Frase quatro aqui.", []),
+    ]
+    monkeypatch.setattr(gemini_api, "MIN_CHARS_SUBBLOCO", 1000)
+    assert gemini_api._dividir_ao_meio(BLOCO) == []
+
+
+def test_dividir_ao_meio_corta_na_divisa_de_paginas(monkeypatch):
+    monkeypatch.setattr(gemini_api, "MIN_CHARS_SUBBLOCO", 10)
+    paginas = ["1 Capa do processo.", "2 Contrato de locação. Cláusula primeira.", "3 Recibo. Nota.", "4 Fim."]
+    texto = " ".join(paginas)
+    cortes = [texto.index(p) for p in paginas[1:]]
+
+    # A divisa mais próxima do meio vence o fim de frase; cada metade leva os cortes dela
+    (esquerda, cortes_esq), (direita, cortes_dir) = gemini_api._dividir_ao_meio(texto, cortes)
+    assert (esquerda, direita) == (" ".join(paginas[:2]), " ".join(paginas[2:]))
+    assert [esquerda[c:c + 2] for c in cortes_esq] == ["2 "]
+    assert [direita[c:c + 2] for c in cortes_dir] == ["4 "]
+    # Divisas que deixariam uma metade pequena demais são ignoradas: cai para o fim de frase
+    assert gemini_api._dividir_ao_meio(texto, cortes[2:])[0][0] == "1 Capa do processo. 2 Contrato de locação."
+
+
+def test_bloco_truncado_e_reenviado_em_metades(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=40)
+
+    resposta = gemini_api.enviar_bloco_para_gemini(BLOCO, bloco_id=3, usar_cache=False)
+
+    # 1 envio truncado + 2 metades; a resposta parcial truncada é descartada
+    assert len(enviados) == 3
+    assert json.loads(resposta) == [{"Trecho": "Frase um aqui"}, {"Trecho": "Frase tres aqui"}]
+    assert (tmp_path / "logs" / "resposta_bloco_003_1.txt").exists()
+    assert json.loads((tmp_path / "logs" / "resposta_bloco_003.txt").read_text(encoding="utf-8")) == json.loads(resposta)
+
+
+def test_subdivisao_recursiva_respeita_profundidade(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=20)
+    monkeypatch.setattr(gemini_api, "MAX_PROFUNDIDADE_SUBDIVISAO", 1)
+
+    resposta = gemini_api.enviar_bloco_para_gemini(BLOCO, bloco_id=0, usar_cache=False)
+
+    # Profundidade 1: metades ainda truncadas ficam com os objetos recuperáveis
+    assert len(enviados) == 3
+    assert json.loads(resposta) == [{"Trecho": "parcial"}, {"Trecho": "parcial"}]
+
+
+def test_resultado_mesclado_vai_para_o_cache_do_bloco_original(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=40)
+
+    primeira = gemini_api.enviar_bloco_para_gemini(BLOCO, bloco_id=0)
+    segunda = gemini_api.enviar_bloco_para_gemini(BLOCO, bloco_id=0)
+
+    assert segunda == primeira
+    assert len(enviados) == 3
+
+
+def test_subdivisao_async(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=40)
+
+    resposta = asyncio.run(gemini_api.enviar_bloco_para_gemini_async(BLOCO, bloco_id=1, usar_cache=False))
+
+    assert len(enviados) == 3
+    assert len(json.loads(resposta)) == 2
+
+
+def test_sem_subdividir_mantem_resposta_truncada(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=40)
+
+    resposta = gemini_api.enviar_bloco_para_gemini(BLOCO, usar_cache=False, subdividir=False)
+
+    assert len(enviados) == 1
+    assert resposta.startswith('[{"Trecho": "parcial"}')
+
+
+def _falhar_segunda_metade(monkeypatch, gerar_original):
+    """Envolve o fake: a metade que começa em "Frase tres" levanta um erro 400."""
+    def gerar(contents):
+        if contents.startswith("Frase tres"):
+            raise RuntimeError("400 INVALID_ARGUMENT")
+        return gerar_original(model=None, contents=contents, config=None)
+
+    async def gerar_async(model, contents, config):
+        return gerar(contents)
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(
+        models=SimpleNamespace(
+            generate_content=lambda model, contents, config: gerar(contents),
+            generate_content_stream=lambda model, contents, config: iter([gerar(contents)]),
+        ),
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=gerar_async)),
+    ))
+
+
+def test_metade_com_erro_mantem_a_outra_e_marca_parcial(tmp_path, monkeypatch):
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=40)
+    _falhar_segunda_metade(monkeypatch, gemini_api.client.models.generate_content)
+    parciais = []
+
+    resposta = gemini_api.enviar_bloco_para_gemini(BLOCO, bloco_id=0, ao_parcial=lambda: parciais.append("sync"))
+    resposta_async = asyncio.run(gemini_api.enviar_bloco_para_gemini_async(
+        BLOCO, bloco_id=0, ao_parcial=lambda: parciais.append("async")))
+
+    # As evidências da metade boa são mantidas; o bloco é sinalizado como parcial
+    assert json.loads(resposta) == json.loads(resposta_async) == [{"Trecho": "Frase um aqui"}]
+    assert parciais == ["sync", "async"]
+    # A mescla parcial não foi para o cache do bloco original: a API volta a ser chamada
+    chave = cache_respostas.calcular_chave(gemini_api.MODEL_ID, gemini_api._config_bloco(), BLOCO)
+    assert cache_respostas.obter(chave) is None
+    assert enviados.count(BLOCO) == 2
+    # A metade boa foi respondida uma vez e depois servida do cache
+    assert enviados.count("Frase um aqui. Frase dois aqui.") == 1
+
+
+def test_bloco_parcial_grava_evidencias_e_volta_na_proxima_passada(tmp_path, monkeypatch):
+    from src import controlador, persistence, planilha
+    _setup(tmp_path, monkeypatch, limite_chars=40)
+    _falhar_segunda_metade(monkeypatch, gemini_api.client.models.generate_content)
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    persistence.init_db()
+
+    def _status(run_id):
+        with persistence.transacao() as con:
+            item = con.execute("SELECT status, evidencias_count FROM run_items WHERE run_id=?", (run_id,)).fetchone()
+        return item["status"], item["evidencias_count"]
+
+    run_id = persistence.criar_run(nome="Parcial", arquivo_origem="proc.txt")
+    for _ in range(2):
+        persistence.reabrir_blocos_com_erro(run_id)
+        controlador.processar_blocos_run(run_id=run_id, blocos=[BLOCO], usar_cache=False)
+        assert _status(run_id)[0] == persistence.ITEM_PARCIAL
+        assert persistence.get_processed_block_ids(run_id) == set()
+    assert persistence.contar_evidencias(run_id) == 1  # a segunda passada não duplica
+
+    # Streaming: as metades boas chegam por ao_subdividir e o bloco também fica parcial
+    run_stream = persistence.criar_run(nome="Parcial stream", arquivo_origem="proc.txt")
+    controlador.processar_blocos_run(run_id=run_stream, blocos=[BLOCO], usar_cache=False, streaming=True)
+    assert _status(run_stream)[0] == persistence.ITEM_PARCIAL
+
+
+def test_bloco_paginado_truncado_e_cortado_na_divisa_de_paginas(tmp_path, monkeypatch):
+    from src import controlador, leitor_txt, persistence, planilha
+    enviados = _setup(tmp_path, monkeypatch, limite_chars=60)
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(leitor_txt, "TOKENS_ENTRADA_POR_BLOCO", 1000)
+    persistence.init_db()
+    run_id = persistence.criar_run(nome="Divisa", arquivo_origem="proc.txt")
+    txt = tmp_path / "proc.txt"
+    # Página 1 curta: o fim de frase mais próximo do meio cairia dentro da página 2
+    txt.write_text("---Página--- 1\nCapa dos autos.\n---Página--- 2\n"
+                   "Contrato um. Aditivo dois. Recibo tres. Nota quatro.\n", encoding="utf-8")
+    blocos = leitor_txt.carregar_blocos_arquivo(str(txt), "---Página---")
+    assert len(blocos) == 1
+
+    controlador.processar_blocos_run(run_id=run_id, blocos=blocos, usar_cache=False)
+
+    # As metades vão em paralelo: a ordem de chegada ao fake varia
+    assert sorted(enviados[1:]) == ["1 Capa dos autos.", "2 Contrato um. Aditivo dois. Recibo tres. Nota quatro."]
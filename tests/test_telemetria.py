@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+from src import cache_respostas, gemini_api, persistence, telemetria
+
+
+def _uso(prompt, saida, raciocinio):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=saida,
+                           thoughts_token_count=raciocinio, cached_content_token_count=None)
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(gemini_api, "CAMINHO_LOGS", str(tmp_path / "logs"))
+    monkeypatch.setattr(cache_respostas, "CAMINHO_CACHE_LLM", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(gemini_api.time, "sleep", lambda s: None)
+    persistence.init_db()
+
+
+def test_cada_tentativa_e_registrada(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    chamadas = [0]
+
+    def gerar(model, contents, config):
+        chamadas[0] += 1
+        if chamadas[0] == 1:
+            erro = RuntimeError("quota")
+            erro.code = 429
+            raise erro
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(finish_reason="STOP")],
+            text='[{"Trecho": "x"}]',
+            usage_metadata=_uso(1000, 200, 300),
+        )
+
+    monkeypatch.setattr(gemini_api, "client", SimpleNamespace(models=SimpleNamespace(generate_content=gerar)))
+
+    with telemetria.contexto(run_id="r1"):
+        gemini_api.enviar_bloco_para_gemini("texto", bloco_id=4, usar_cache=False)
+
+    linhas = telemetria.tentativas("r1")
+    assert [(t["bloco_id"], t["tentativa"], t["classe_erro"]) for t in linhas] == [(4, 1, "429"), (4, 2, None)]
+    assert linhas[0]["codigo_http"] == 429 and linhas[0]["erro_msg"].startswith("RuntimeError")
+    assert linhas[1]["finish_reason"] == "STOP"
+    assert (linhas[1]["tokens_prompt"], linhas[1]["tokens_saida"], linhas[1]["tokens_raciocinio"]) == (1000, 200, 300)
+
+    resumo = telemetria.resumo_run("r1")
+    assert resumo["tentativas"] == 2 and resumo["retentativas"] == 1
+    assert resumo["erros_por_classe"] == {"429": 1}
+    assert resumo["taxa_429"] == 0.5
+    assert resumo["custo_usd"] == round(telemetria.custo_usd(1000, 500), 6)
+
+
+def test_consultas_por_bloco_minuto_e_projecao(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    for bloco_id, duracao in [(0, 1.0), (1, 5.0), (1, 2.0), (2, 0.5)]:
+        with telemetria.contexto(run_id="r2", bloco_id=bloco_id):
+            telemetria.registrar("Bloco", 1, "2026-01-01 10:00:30", duracao, modelo="m",
+                                 resposta=SimpleNamespace(usage_metadata=_uso(100, 10, 0)))
+    with telemetria.contexto(run_id="r2"):
+        telemetria.registrar("Resumo", 1, "2026-01-01 10:01:00", 3.0,
+                             resposta=SimpleNamespace(usage_metadata=_uso(1000, 0, 0)))
+
+    lentos = telemetria.blocos_mais_lentos("r2", limite=2)
+    assert [(b["bloco_id"], b["tempo_total_s"], b["tentativas"]) for b in lentos] == [(1, 7.0, 2), (0, 1.0, 1)]
+
+    serie = telemetria.serie_por_minuto("r2")
+    assert [(m["minuto"], m["tentativas"]) for m in serie] == [("2026-01-01 10:00", 4), ("2026-01-01 10:01", 1)]
+
+    projecao = telemetria.projetar_custo("r2", total_blocos=30)
+    custo_bloco = telemetria.custo_usd(100, 10)
+    assert projecao["blocos_medidos"] == 3
+    assert projecao["custo_projetado_usd"] == round(
+        (4 * custo_bloco / 3) * 30 + telemetria.custo_usd(1000, 0), 6
+    )
+
+
+def test_sem_init_db_nao_cria_banco(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "saida" / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path / "saida"))
+
+    telemetria.registrar("Bloco 0", 1, telemetria.agora_iso(), 0.1, 0.0, "m", exc=RuntimeError("x"), codigo=400)
+    assert telemetria.descarregar() == 0  # o mesmo caminho do atexit
+    assert not (tmp_path / "saida").exists()
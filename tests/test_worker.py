@@ -0,0 +1,195 @@
+import hashlib
+import os
+
+from src import controlador, entradas, leitor_txt, persistence, planilha, worker
+
+
+def _setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "CAMINHO_DB", str(tmp_path / "runs.db"))
+    monkeypatch.setattr(persistence, "CAMINHO_SAIDA", str(tmp_path))
+    monkeypatch.setattr(planilha, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(worker, "CAMINHO_RUNS", str(tmp_path / "runs"))
+    monkeypatch.setattr(entradas, "CAMINHO_ENTRADAS", str(tmp_path / "entradas"))
+    monkeypatch.setattr(worker, "calibrar_estimador_tokens", lambda caminho: 4.0)
+    persistence.init_db()
+
+
+def test_fila_reivindica_cada_job_uma_vez(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    run_a = persistence.criar_run(nome="A")
+    run_b = persistence.criar_run(nome="B")
+    job_a = persistence.enfileirar_job(run_a, {"usar_sac": True})
+    job_b = persistence.enfileirar_job(run_b)
+
+    # Reenfileirar a mesma run não duplica o job
+    assert persistence.enfileirar_job(run_a) == job_a
+
+    primeiro = persistence.reivindicar_job("w1")
+    segundo = persistence.reivindicar_job("w2")
+    assert (primeiro["job_id"], segundo["job_id"]) == (job_a, job_b)
+    assert primeiro["parametros"] == {"usar_sac": True}
+    assert primeiro["status"] == persistence.JOB_RUNNING and primeiro["worker"] == "w1"
+    assert persistence.reivindicar_job("w3") is None
+
+    # Run com job ativo não aparece como incompleta nem para retomada
+    runs = {r["run_id"]: r for r in persistence.listar_runs()}
+    assert runs[run_a]["status"] == persistence.RUN_RUNNING
+    assert runs[run_a]["job_status"] == persistence.JOB_RUNNING
+    assert persistence.listar_runs_incompletas() == []
+
+
+def test_job_orfao_volta_para_a_fila(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(persistence, "JOB_MAX_TENTATIVAS", 2)
+    job_id = persistence.enfileirar_job(persistence.criar_run(nome="A"))
+
+    persistence.reivindicar_job("w1")
+    assert persistence.reenfileirar_jobs_orfaos(timeout_s=60) == 0
+
+    with persistence.transacao() as con:
+        con.execute("UPDATE jobs SET heartbeat_em='2000-01-01 00:00:00'")
+    assert persistence.reenfileirar_jobs_orfaos(timeout_s=60) == 1
+    assert persistence.get_job(job_id)["status"] == persistence.JOB_QUEUED
+
+    # Segunda queda esgota as tentativas
+    persistence.reivindicar_job("w2")
+    with persistence.transacao() as con:
+        con.execute("UPDATE jobs SET heartbeat_em='2000-01-01 00:00:00'")
+    assert persistence.reenfileirar_jobs_orfaos(timeout_s=60) == 0
+    assert persistence.get_job(job_id)["status"] == persistence.JOB_FAILED
+
+
+def test_worker_processa_run_enfileirada(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    enviados = []
+
+    def fake_enviar(texto_bloco, bloco_id=0, contexto_global="", **kwargs):
+        enviados.append(bloco_id)
+        return (
+            f'[{{"Tipo de Evidência": "Contrato", "Trecho": "t{bloco_id}", "Conteúdo": "c", '
+            f'"Resumo": "r", "Referência": "Pág. {bloco_id + 1}"}}]'
+        )
+
+    monkeypatch.setattr(controlador, "enviar_bloco_para_gemini", fake_enviar)
+
+    txt = tmp_path / "processo.txt"
+    txt.write_text("---Página---\nPrimeira página.\n---Página---\nSegunda página.", encoding="utf-8")
+    run_id = persistence.criar_run(nome="Fila", arquivo_origem="processo.txt")
+    job_id = worker.enfileirar_run(run_id, str(txt), delimitador="---Página---", concorrencia=2)
+
+    # A run guarda sua própria cópia da entrada
+    assert open(worker.caminho_entrada_run(run_id), encoding="utf-8").read() == txt.read_text(encoding="utf-8")
+    assert persistence.get_run(run_id)["total_paginas"] == 2
+
+    assert worker.executar(worker="teste", uma_vez=True) == 1
+
+    job = persistence.get_job(job_id)
+    assert job["status"] == persistence.JOB_DONE
+    assert job["parametros"]["concorrencia"] == 2
+    run = persistence.get_run(run_id)
+    assert run["status"] == persistence.RUN_COMPLETED
+    assert run["total_evidencias"] == len(enviados) > 0
+    assert persistence.contar_evidencias(run_id) == len(enviados)
+
+
+def test_worker_marca_job_falho(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    run_id = persistence.criar_run(nome="Sem entrada")
+    job_id = persistence.enfileirar_job(run_id)
+
+    assert worker.processar_proximo_job("teste") is True
+
+    assert persistence.get_job(job_id)["status"] == persistence.JOB_FAILED
+    assert persistence.get_run(run_id)["status"] == persistence.RUN_INCOMPLETA
+    assert worker.processar_proximo_job("teste") is False
+
+
+def test_entrada_armazenada_pelo_hash_do_conteudo(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    conteudo = "---Página--- 1\nContrato.\n---Página--- 2\nRecibo.\n".encode("utf-8")
+    sha256 = entradas.armazenar_entrada(conteudo)
+    assert sha256 == hashlib.sha256(conteudo).hexdigest()
+    assert open(entradas.caminho_entrada(sha256), "rb").read() == conteudo
+
+    # Upload idêntico (por caminho) não regrava; conteúdo diferente ganha outro arquivo
+    txt = tmp_path / "processo.txt"
+    txt.write_bytes(conteudo)
+    mtime = os.stat(entradas.caminho_entrada(sha256)).st_mtime_ns
+    assert entradas.armazenar_entrada(str(txt)) == sha256
+    assert os.stat(entradas.caminho_entrada(sha256)).st_mtime_ns == mtime
+    txt.write_bytes(conteudo + b"Aditivo.")
+    assert entradas.armazenar_entrada(str(txt)) != sha256
+    assert sorted(os.listdir(tmp_path / "entradas")) == sorted(
+        [f"{sha256}.txt", f"{entradas.armazenar_entrada(str(txt))}.txt"])
+
+    # Runs registram hash e páginas; a retomada sem novo upload mantém a entrada original
+    run_a = persistence.criar_run(nome="A", entrada_sha256=sha256, total_paginas=2)
+    run_b = persistence.criar_run(nome="B")
+    worker.enfileirar_run(run_b, str(txt), delimitador="---Página---")
+    worker.enfileirar_run(run_a, delimitador="---Página---")
+    assert worker.caminho_entrada_run(run_a) == entradas.caminho_entrada(sha256)
+    assert [r["run_id"] for r in persistence.buscar_runs_por_entrada(sha256)] == [run_a]
+    assert persistence.get_run(run_b)["total_paginas"] == 2
+    assert os.path.exists(entradas.caminho_indice(sha256))
+
+
+def test_razao_chars_por_token_gravada_na_run(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(worker, "EMPACOTAR_POR_TOKENS", True)
+    calibracoes = []
+    monkeypatch.setattr(worker, "calibrar_estimador_tokens", lambda caminho: calibracoes.append(caminho) or 2.5)
+    txt = tmp_path / "processo.txt"
+    txt.write_text("---Página---\nPrimeira página.\n---Página---\nSegunda página.", encoding="utf-8")
+    run_id = persistence.criar_run(nome="Razão")
+    job_id = worker.enfileirar_run(run_id, str(txt), delimitador="---Página---")
+    job = persistence.get_job(job_id)
+
+    # Auxiliar não calibra: sem razão gravada, a run ainda não pode ser auxiliada
+    persistence.atualizar_progresso_run(run_id, 2, 0, 0)
+    assert worker.auxiliar_job(job, "ajudante") is False
+    assert calibracoes == []
+
+    worker._parametros_processamento(job, persistence.get_run(run_id))
+    assert calibracoes == [worker.caminho_entrada_run(run_id)]
+    assert persistence.get_run(run_id)["chars_por_token"] == 2.5
+
+    # Passadas seguintes (e auxiliares) reaproveitam a razão gravada
+    worker._parametros_processamento(job, persistence.get_run(run_id), calibrar=False)
+    assert len(calibracoes) == 1
+
+
+def test_sem_empacotar_por_tokens_nao_calibra(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    monkeypatch.setattr(worker, "EMPACOTAR_POR_TOKENS", False)
+    monkeypatch.setattr(leitor_txt, "EMPACOTAR_POR_TOKENS", False)
+    calibracoes = []
+    monkeypatch.setattr(worker, "calibrar_estimador_tokens", lambda caminho: calibracoes.append(caminho) or 2.5)
+    txt = tmp_path / "processo.txt"
+    txt.write_text("---Página---\nPrimeira página.\n---Página---\nSegunda página.", encoding="utf-8")
+    run_id = persistence.criar_run(nome="Sem tokens")
+    job_id = worker.enfileirar_run(run_id, str(txt), delimitador="---Página---")
+
+    argumentos = worker._parametros_processamento(persistence.get_job(job_id), persistence.get_run(run_id))
+
+    assert calibracoes == []
+    assert len(argumentos["blocos"]) == 1
+    assert persistence.get_run(run_id)["chars_por_token"] is None
+
+
+def test_auxilio_com_erro_nao_prende_o_laco(tmp_path, monkeypatch):
+    _setup(tmp_path, monkeypatch)
+    txt = tmp_path / "processo.txt"
+    txt.write_text("---Página---\nPrimeira página.\n---Página---\nSegunda página.", encoding="utf-8")
+    run_id = persistence.criar_run(nome="Alheia")
+    job_id = worker.enfileirar_run(run_id, str(txt), delimitador="---Página---")
+    job = persistence.reivindicar_job("dono")
+    persistence.registrar_chars_por_token(run_id, 4.0)
+    persistence.atualizar_progresso_run(run_id, 2, 0, 0)
+    persistence.semear_run_items(run_id, 2)
+    persistence.liberar_auxilio(run_id)
+    monkeypatch.setattr(worker, "_parametros_processamento", lambda *a, **k: 1 / 0)
+
+    assert worker.auxiliar_job(job, "ajudante") is False
+    # --uma-vez termina: o auxílio que falha não conta como trabalho feito
+    assert worker.executar(worker="ajudante", uma_vez=True) == 0
+    assert persistence.get_job(job_id)["status"] == persistence.JOB_RUNNING